@@ -2,7 +2,6 @@
 Puoribor ai example based on minimax tree search + alpha_beta prunning.
 """
 
-from collections import deque
 from math import sqrt
 
 import numpy as np
@@ -33,51 +32,8 @@ class AlphabetaAgent(BaseAgent):
                 actions.append([3, coordinate_x, coordinate_y])
         return actions
 
-    def _agent_pos(self, state: puoribor.PuoriborState, agent_id: int):
-        for c_x in range(puoribor.PuoriborEnv.board_size):
-            for c_y in range(puoribor.PuoriborEnv.board_size):
-                if state.board[agent_id][c_x][c_y] == 1:
-                    return c_x, c_y
-
     def _agent_dis_to_end(self, state: puoribor.PuoriborState, agent_id: int):
-        distance = puoribor.PuoriborEnv.board_size * puoribor.PuoriborEnv.board_size
-        visited = [
-            [0 for _ in range(puoribor.PuoriborEnv.board_size)]
-            for _ in range(puoribor.PuoriborEnv.board_size)
-        ]
-        queue = deque()
-
-        queue.append(self._agent_pos(state, agent_id))
-        visited[queue[0][0]][queue[0][1]] = 1
-
-        while len(queue) > 0:
-            now = queue.popleft()
-            if agent_id == 0 and now[1] == 8:
-                return visited[now[0]][now[1]] - 1
-            if agent_id == 1 and now[1] == 0:
-                return visited[now[0]][now[1]] - 1
-            if now[1] > 0:
-                if state.board[2][now[0]][now[1] - 1] == 0:
-                    if visited[now[0]][now[1] - 1] == 0:
-                        visited[now[0]][now[1] - 1] = visited[now[0]][now[1]] + 1
-                        queue.append((now[0], now[1] - 1))
-            if now[0] < puoribor.PuoriborEnv.board_size - 1:
-                if state.board[3][now[0]][now[1]] == 0:
-                    if visited[now[0] + 1][now[1]] == 0:
-                        visited[now[0] + 1][now[1]] = visited[now[0]][now[1]] + 1
-                        queue.append((now[0] + 1, now[1]))
-            if now[1] < puoribor.PuoriborEnv.board_size - 1:
-                if state.board[2][now[0]][now[1]] == 0:
-                    if visited[now[0]][now[1] + 1] == 0:
-                        visited[now[0]][now[1] + 1] = visited[now[0]][now[1]] + 1
-                        queue.append((now[0], now[1] + 1))
-            if now[0] > 0:
-                if state.board[3][now[0] - 1][now[1]] == 0:
-                    if visited[now[0] - 1][now[1]] == 0:
-                        visited[now[0] - 1][now[1]] = visited[now[0]][now[1]] + 1
-                        queue.append((now[0] - 1, now[1]))
-
-        return distance
+        return state.distance_to_goal(agent_id)
 
     def _evaluation(self, state: puoribor.PuoriborState):
         mine, opps = self._agent_dis_to_end(
@@ -121,11 +77,8 @@ class AlphabetaAgent(BaseAgent):
             else:
                 best_score = 100000000
             for action in actions:
-                try:
-                    new_state = puoribor.PuoriborEnv().step(state, agent_id, action)
-                except:
-                    ...
-                else:
+                new_state = puoribor.PuoriborEnv().try_step(state, agent_id, action)
+                if new_state is not None:
                     if agent_id == self.agent_id:
                         score = search(
                             new_state, new_agent_id, new_depth, best_score, upper_bound
@@ -147,11 +100,8 @@ class AlphabetaAgent(BaseAgent):
         max_score = -100000001
         best_actions = []
         for action in actions:
-            try:
-                new_state = puoribor.PuoriborEnv().step(state, self.agent_id, action)
-            except:
-                ...
-            else:
+            new_state = puoribor.PuoriborEnv().try_step(state, self.agent_id, action)
+            if new_state is not None:
                 score = search(
                     new_state, 1 - self.agent_id, self.depth - 1, max_score, 100000001
                 )
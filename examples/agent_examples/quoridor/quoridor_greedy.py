@@ -3,7 +3,6 @@ Quoridor ai example based on greedy search.
 """
 
 import numpy as np
-from collections import deque
 from math import sqrt
 
 from fights.base import BaseAgent
@@ -28,51 +27,8 @@ class GreedyAgent(BaseAgent):
                 actions.append([2, coordinate_x, coordinate_y])
         return actions
 
-    def _agent_pos(self, state: quoridor.QuoridorState, agent_id: int):
-        for c_x in range(quoridor.QuoridorEnv.board_size):
-            for c_y in range(quoridor.QuoridorEnv.board_size):
-                if state.board[agent_id][c_x][c_y] == 1:
-                    return c_x, c_y
-
     def _agent_dis_to_end(self, state: quoridor.QuoridorState, agent_id: int):
-        distance = quoridor.QuoridorEnv.board_size * quoridor.QuoridorEnv.board_size
-        visited = [
-            [0 for _ in range(quoridor.QuoridorEnv.board_size)]
-            for _ in range(quoridor.QuoridorEnv.board_size)
-        ]
-        queue = deque()
-
-        queue.append(self._agent_pos(state, agent_id))
-        visited[queue[0][0]][queue[0][1]] = 1
-
-        while len(queue) > 0:
-            now = queue.popleft()
-            if agent_id == 0 and now[1] == 8:
-                return visited[now[0]][now[1]] - 1
-            if agent_id == 1 and now[1] == 0:
-                return visited[now[0]][now[1]] - 1
-            if now[1] > 0:
-                if state.board[2][now[0]][now[1] - 1] == 0:
-                    if visited[now[0]][now[1] - 1] == 0:
-                        visited[now[0]][now[1] - 1] = visited[now[0]][now[1]] + 1
-                        queue.append((now[0], now[1] - 1))
-            if now[0] < quoridor.QuoridorEnv.board_size - 1:
-                if state.board[3][now[0]][now[1]] == 0:
-                    if visited[now[0] + 1][now[1]] == 0:
-                        visited[now[0] + 1][now[1]] = visited[now[0]][now[1]] + 1
-                        queue.append((now[0] + 1, now[1]))
-            if now[1] < quoridor.QuoridorEnv.board_size - 1:
-                if state.board[2][now[0]][now[1]] == 0:
-                    if visited[now[0]][now[1] + 1] == 0:
-                        visited[now[0]][now[1] + 1] = visited[now[0]][now[1]] + 1
-                        queue.append((now[0], now[1] + 1))
-            if now[0] > 0:
-                if state.board[3][now[0] - 1][now[1]] == 0:
-                    if visited[now[0] - 1][now[1]] == 0:
-                        visited[now[0] - 1][now[1]] = visited[now[0]][now[1]] + 1
-                        queue.append((now[0] - 1, now[1]))
-
-        return distance
+        return state.distance_to_goal(agent_id)
 
     def _evaluation(self, state: quoridor.QuoridorState):
         mine, opps = self._agent_dis_to_end(
@@ -102,11 +58,8 @@ class GreedyAgent(BaseAgent):
         max_score = -100000001
         best_actions = []
         for action in actions:
-            try:
-                new_state = quoridor.QuoridorEnv().step(state, self.agent_id, action)
-            except:
-                ...
-            else:
+            new_state = quoridor.QuoridorEnv().try_step(state, self.agent_id, action)
+            if new_state is not None:
                 score = search(new_state, 1 - self.agent_id)
                 if score == max_score:
                     best_actions.append(action)
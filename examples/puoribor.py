@@ -35,11 +35,7 @@ class PuoriborAgent(BaseAgent):
             for coordinate_x in range(puoribor.PuoriborEnv.board_size):
                 for coordinate_y in range(puoribor.PuoriborEnv.board_size):
                     action = [action_type, coordinate_x, coordinate_y]
-                    try:
-                        puoribor.PuoriborEnv().step(state, self.agent_id, action)
-                    except:
-                        ...
-                    else:
+                    if puoribor.PuoriborEnv().is_legal(state, self.agent_id, action):
                         actions.append(action)
         return actions
 
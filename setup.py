@@ -1,9 +1,31 @@
+import sys
 from os.path import join
 
 import numpy as np
 from setuptools import Extension, setup
+from setuptools.command.build_ext import build_ext
 from Cython.Build import cythonize
 
+
+class BuildExt(build_ext):
+    """
+    Compile the batch kernels with OpenMP. Apple Clang ships without OpenMP, so
+    they run on a single thread on macOS.
+    """
+
+    def build_extensions(self):
+        if self.compiler.compiler_type == "msvc":
+            compile_args, link_args = ["/openmp"], []
+        elif sys.platform == "darwin":
+            compile_args, link_args = [], []
+        else:
+            compile_args, link_args = ["-fopenmp"], ["-fopenmp"]
+        for ext in self.extensions:
+            ext.extra_compile_args += compile_args
+            ext.extra_link_args += link_args
+        super().build_extensions()
+
+
 fights_envs_path = join("src", "fights", "envs")
 defs = [("NPY_NO_DEPRECATED_API", "NPY_1_7_API_VERSION")]
 puoribor = Extension(
@@ -24,5 +46,20 @@ othello = Extension(
     include_dirs=[np.get_include()],
     define_macros=defs,
 )
+othello_bitboard = Extension(
+    "fights.envs.othello_bitboard",
+    sources=[join(fights_envs_path, "othello_bitboard.pyx")],
+    include_dirs=[np.get_include()],
+    define_macros=defs,
+)
+mcts = Extension(
+    "fights.search.mcts_cython",
+    sources=[join("src", "fights", "search", "mcts_cython.pyx")],
+    include_dirs=[np.get_include()],
+    define_macros=defs,
+)
 
-setup(ext_modules=cythonize([puoribor, quoridor, othello]))
+setup(
+    ext_modules=cythonize([puoribor, quoridor, othello, othello_bitboard, mcts]),
+    cmdclass={"build_ext": BuildExt},
+)
@@ -5,6 +5,7 @@ from typing import Tuple, Type, cast
 from numpy.typing import ArrayLike
 
 from ..base import BaseEnv, BaseState
+from .othello import OthelloEnv, OthelloState
 from .puoribor import PuoriborEnv, PuoriborState
 from .quoridor import QuoridorEnv, QuoridorState
 
@@ -20,6 +21,7 @@ def resolve(name: str) -> Tuple[Type[BaseEnv[BaseState, ArrayLike]], Type[BaseSt
         A tuple of (env class, env state).
     """
     mappings = {
+        "othello": (OthelloEnv, OthelloState),
         "puoribor": (PuoriborEnv, PuoriborState),
         "quoridor": (QuoridorEnv, QuoridorState),
     }
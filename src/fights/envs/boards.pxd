@@ -0,0 +1,19 @@
+# cython: language_level=3
+
+"""
+Element types of the boards accepted by the kernels. Every value of a board fits
+in a byte, so ``int8`` and ``uint8`` boards take an eighth of the memory of the
+default ``np.int_`` ones. Kernels taking a ``board_t`` view are compiled once per
+type, and run on the board as is without converting it.
+"""
+
+ctypedef fused board_t:
+    signed char
+    unsigned char
+    long
+
+# Element types of legal action outputs. Boolean and other one byte arrays are
+# passed as ``unsigned char`` views by ``as_mask``.
+ctypedef fused mask_t:
+    unsigned char
+    long
@@ -14,11 +14,11 @@ from __future__ import annotations
 
 import sys
 from collections.abc import Callable
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
 
 import numpy as np
-from numpy.typing import ArrayLike, NDArray
+from numpy.typing import ArrayLike, DTypeLike, NDArray
 
 if sys.version_info < (3, 10):
     from typing_extensions import TypeAlias
@@ -27,17 +27,186 @@ else:
 
 from fights.base import BaseEnv, BaseState
 
-from . import othello_cythonfn
+from . import othello_bitboard, othello_cythonfn
 
 OthelloAction: TypeAlias = ArrayLike
 """
 Alias of :obj:'ArrayLike' to describe the action type.
 Encoded as an array of shape ''(2,)'',
-in the form of [ 'coordinate_r', 'coordinate_c' ].
+in the form of [ 'coordinate_r', 'coordinate_c' ], or as a flat action index
+(see :data:`ACTIONS`).
 * Note that the action [3, 3] is jumping action, not putting a stone on board (3, 3).
 """
 
 
+def _agent_frame_table(board_size: int) -> NDArray[np.intp]:
+    # Stones go to the rotated cell. The skip action [3, 3] and the cell it is
+    # swapped with, both always occupied, are kept in place so skipping looks the
+    # same to both agents.
+    actions = np.arange(board_size * board_size).reshape(board_size, board_size)
+    table = actions[::-1, ::-1].copy()
+    for r, c in ((3, 3), (board_size - 4, board_size - 4)):
+        table[r, c] = actions[r, c]
+    return table.reshape(-1)
+
+
+_ACTIONS_SHAPE = (8, 8)
+NUM_ACTIONS = int(np.prod(_ACTIONS_SHAPE))
+"""
+Number of flat action indices. The flat index of an action is the index of its
+cell in a legal actions array of shape ``(8, 8)`` flattened in C order.
+"""
+
+ACTIONS = np.stack(np.unravel_index(np.arange(NUM_ACTIONS), _ACTIONS_SHAPE), axis=1)
+"""
+Decode table of flat actions, of shape ``(NUM_ACTIONS, 2)``. Row ``i`` is the
+action with flat index ``i``.
+"""
+
+
+def encode_actions(actions: OthelloAction) -> NDArray[np.intp]:
+    """
+    Encode actions as flat indices.
+
+    :arg actions:
+        An action, or a batch of actions of shape ``(..., 2)``.
+
+    :returns:
+        The flat indices of the actions. A :obj:`ValueError` is raised if an action
+        is out of range.
+    """
+    actions = np.asarray(actions, dtype=np.int_)
+    return np.ravel_multi_index(np.moveaxis(actions, -1, 0), _ACTIONS_SHAPE)
+
+
+def decode_actions(indices: ArrayLike) -> NDArray[np.int_]:
+    """
+    Decode flat indices to actions with :data:`ACTIONS`.
+
+    :arg indices:
+        A flat index, or an array of them.
+
+    :returns:
+        The actions, of shape ``(..., 2)``. A :obj:`ValueError` is raised if an index is
+        out of range.
+    """
+    indices = np.asarray(indices, dtype=np.intp)
+    if indices.size and (indices.min() < 0 or indices.max() >= NUM_ACTIONS):
+        raise ValueError(f"action index out of range: {indices}")
+    return ACTIONS[indices]
+
+
+def _action_array(action: OthelloAction) -> NDArray[np.int_]:
+    # Flat indices are decoded. Out of range indices become an invalid action, which
+    # the kernels reject like any other illegal action.
+    action_np = np.asarray(action, dtype=np.int_)
+    if action_np.ndim:
+        return action_np
+    if 0 <= action_np < NUM_ACTIONS:
+        return ACTIONS[action_np]
+    return np.array([-1, 0])
+
+
+AGENT_FRAME_ACTIONS = _agent_frame_table(8)
+"""
+Remap table of actions between the absolute frame and the frame of agent 1, where
+actions are numbered by their cell in a legal actions array of shape ``(8, 8)``.
+Entry ``i`` is the number of action ``i`` in the other frame. The table is its
+own inverse, and the frame of agent 0 is the absolute one.
+"""
+
+
+def _for_agents(
+    rotated: NDArray[Any], original: NDArray[Any], agent_id: ArrayLike
+) -> NDArray[Any]:
+    agent_id = np.asarray(agent_id)
+    if agent_id.ndim == 0:
+        return rotated if agent_id == 1 else original
+    mask = (agent_id == 1).reshape(
+        agent_id.shape + (1,) * (rotated.ndim - agent_id.ndim)
+    )
+    return np.where(mask, rotated, original)
+
+
+def to_agent_frame(actions: OthelloAction, agent_id: ArrayLike) -> NDArray[np.int_]:
+    """
+    Translate actions from absolute coordinates to the frame of the board returned
+    by :meth:`OthelloState.perspective`, using :data:`AGENT_FRAME_ACTIONS`.
+
+    :arg actions:
+        An action, or a batch of actions of shape ``(..., 2)``.
+
+    :arg agent_id:
+        ID of the agent, or IDs of the agents of every action in the batch.
+
+    :returns:
+        The actions in the frame of the agents.
+    """
+    actions = np.asarray(actions, dtype=np.int_)
+    rotated = ACTIONS[AGENT_FRAME_ACTIONS[encode_actions(actions)]]
+    return _for_agents(rotated, actions, agent_id)
+
+
+def from_agent_frame(actions: OthelloAction, agent_id: ArrayLike) -> NDArray[np.int_]:
+    """
+    Translate actions from the frame of the agents back to absolute coordinates,
+    reversing :func:`to_agent_frame`.
+
+    :arg actions:
+        An action, or a batch of actions of shape ``(..., 2)``.
+
+    :arg agent_id:
+        ID of the agent, or IDs of the agents of every action in the batch.
+
+    :returns:
+        The actions in absolute coordinates.
+    """
+    return to_agent_frame(actions, agent_id)
+
+
+def legal_actions_to_agent_frame(
+    legal_actions: NDArray[np.generic], agent_id: ArrayLike
+) -> NDArray[np.generic]:
+    """
+    Translate legal action masks, or any per-action values like policies, to the
+    frame of the agents.
+
+    :arg legal_actions:
+        An array of shape ``(8, 8)``, or a batch of shape ``(..., 8, 8)``.
+
+    :arg agent_id:
+        ID of the agent, or IDs of the agents of every mask in the batch.
+
+    :returns:
+        The masks in the frame of the agents.
+    """
+    legal_actions = np.asarray(legal_actions)
+    batch_shape = legal_actions.shape[: -len(_ACTIONS_SHAPE)]
+    rotated = np.take(
+        legal_actions.reshape(*batch_shape, -1), AGENT_FRAME_ACTIONS, axis=-1
+    ).reshape(legal_actions.shape)
+    return _for_agents(rotated, legal_actions, agent_id)
+
+
+def legal_actions_from_agent_frame(
+    legal_actions: NDArray[np.generic], agent_id: ArrayLike
+) -> NDArray[np.generic]:
+    """
+    Translate masks from the frame of the agents back to absolute coordinates,
+    reversing :func:`legal_actions_to_agent_frame`.
+
+    :arg legal_actions:
+        An array of shape ``(8, 8)``, or a batch of shape ``(..., 8, 8)``.
+
+    :arg agent_id:
+        ID of the agent, or IDs of the agents of every mask in the batch.
+
+    :returns:
+        The masks in absolute coordinates.
+    """
+    return legal_actions_to_agent_frame(legal_actions, agent_id)
+
+
 @dataclass
 class OthelloState(BaseState):
     """
@@ -49,6 +218,8 @@ class OthelloState(BaseState):
     Array of shape ``(C, W, H)``,
     where C is channel index
     and W, H is board width, height.
+    Its data type is ``np.int_``, ``np.int8`` or ``np.uint8``,
+    and ``legal_actions`` has the same data type.
 
     Channels
         - ''C = 0'': one-hot encoded stones of agent 0. (black)
@@ -83,6 +254,42 @@ class OthelloState(BaseState):
     Boolean value indicating wheter the game is done.
     """
 
+    hash: int = field(default=None, repr=False)  # type: ignore
+    """
+    64-bit Zobrist hash of ''board''. Computed from scratch when not given, and
+    updated incrementally by :meth:'OthelloEnv.step'. Recompute it with
+    :meth:'rehash' after modifying the board in place.
+    """
+
+    def __post_init__(self) -> None:
+        if self.hash is None:
+            self.rehash()
+
+    def rehash(self) -> int:
+        """
+        Recompute :attr:'hash' from scratch.
+
+        :returns:
+            The recomputed hash.
+        """
+        board = othello_cythonfn.as_board(self.board)
+        self.hash = othello_cythonfn.zobrist_hash(board, board.shape[1])
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, OthelloState):
+            return NotImplemented
+        return (
+            self.hash == other.hash
+            and self.done == other.done
+            and np.array_equal(self.board, other.board)
+            and np.array_equal(self.legal_actions, other.legal_actions)
+            and np.array_equal(self.reward, other.reward)
+        )
+
+    def __hash__(self) -> int:
+        return self.hash
+
     def __str__(self) -> str:
         """
         Generate a human-readable string representation of the board.
@@ -134,13 +341,19 @@ class OthelloState(BaseState):
 
         return result
 
-    def perspective(self, agent_id: int) -> NDArray[np.int_]:
+    def perspective(
+        self, agent_id: int, out: Optional[NDArray[np.int_]] = None
+    ) -> NDArray[np.int_]:
         """
         Return board observed by the agent whose ID is agent_id.
 
         :arg agent_id:
             The ID of agent to use as base.
 
+        :arg out:
+            Optional array of the shape and data type of ``board`` to write the
+            result to.
+
         :returns:
             The ''board'' channel 0 will contain stones of ''agent_id'',
             and channel 1 will contain stones of opponent.
@@ -153,10 +366,13 @@ class OthelloState(BaseState):
             for ''legal_actions'' array.
         """
 
-        if agent_id == 0:
-            return self.board
+        if out is None:
+            if agent_id == 0:
+                return self.board
+            return np.flip(np.rot90(self.board, 2, axes=(1, 2)), axis=0)
 
-        return np.flip(np.rot90(self.board, 2, axes=(1, 2)), axis=0)
+        np.copyto(out, self.board if agent_id == 0 else self.board[::-1, ::-1, ::-1])
+        return out
 
     def to_dict(self) -> dict:
         """
@@ -171,6 +387,41 @@ class OthelloState(BaseState):
             "reward": self.reward.tolist(),
         }
 
+    def to_bitboard(self) -> Tuple[int, int]:
+        """
+        Convert ''board'' to bitboards.
+
+        :returns:
+            A tuple of two 64-bit masks, the stones of agent 0 and agent 1, where bit
+            ''r * 8 + c'' is the cell ''(r, c)''.
+        """
+        return othello_bitboard.to_bitboard(othello_cythonfn.as_board(self.board))
+
+    @staticmethod
+    def from_bitboard(black: int, white: int) -> OthelloState:
+        """
+        Create a state from bitboards, computing its legal actions, reward and
+        ''done''.
+
+        :arg black:
+            Mask of the stones of agent 0.
+
+        :arg white:
+            Mask of the stones of agent 1.
+
+        :returns:
+            Created ''OthelloState'' object.
+        """
+        legal0, legal1 = othello_bitboard.legal_actions(black, white)
+        done = legal0 == legal1 == 1 << othello_bitboard.SKIP_BIT
+        winner = othello_bitboard.score(black, white) if done else 0
+        return OthelloState(
+            board=othello_bitboard.to_planes(black, white),
+            legal_actions=othello_bitboard.to_planes(legal0, legal1),
+            reward=np.array([winner, -winner]),
+            done=done,
+        )
+
     @staticmethod
     def from_dict(serialized) -> OthelloState:
         """
@@ -188,6 +439,63 @@ class OthelloState(BaseState):
         )
 
 
+class OthelloChildren(NamedTuple):
+    """
+    ``OthelloChildren`` holds every legal child of a state, as generated by
+    :meth:`OthelloEnv.expand`. Child ``k`` is stored at index ``k`` of every array.
+    """
+
+    actions: NDArray[np.intp]
+    """
+    Sorted flat indices of the legal actions (see :data:`ACTIONS`), of shape
+    ``(K,)``. The skip action is the only child of a state without moves.
+    """
+
+    boards: NDArray[np.int_]
+    """
+    Child boards of shape ``(K, C, W, H)``, in the data type of the parent board.
+    """
+
+    legal_actions: NDArray[np.int_]
+    """
+    Legal actions of both agents in each child, of shape ``(K, C, W, H)``.
+    """
+
+    rewards: NDArray[np.int_]
+    """
+    Rewards of the children, of shape ``(K, 2)``.
+    """
+
+    dones: NDArray[np.bool_]
+    """
+    Whether each child is done, of shape ``(K,)``.
+    """
+
+    hashes: NDArray[np.uint64]
+    """
+    Zobrist hashes of the children, of shape ``(K,)``.
+    """
+
+    def state(self, index: int) -> OthelloState:
+        """
+        Return child ``index`` as a state. Its arrays are views into the stacked
+        arrays, so they must not be modified in place while both are in use.
+
+        :arg index:
+            Index of the child, not its flat action index.
+
+        :returns:
+            An :obj:`OthelloState` object.
+        """
+        return OthelloState(
+            board=self.boards[index],
+            legal_actions=self.legal_actions[index],
+            reward=self.rewards[index],
+            done=bool(self.dones[index]),
+            hash=int(self.hashes[index]),
+        )
+
+
 class OthelloEnv(BaseEnv[OthelloState, OthelloAction]):
     env_id = ("othello", 0)  # type: ignore
     """
@@ -199,6 +507,38 @@ class OthelloEnv(BaseEnv[OthelloState, OthelloAction]):
     Size (width and height) of the board.
     """
 
+    backend: str = "cython"
+    """
+    Engine used to step through the game. ``"cython"`` works on the ``(2, 8, 8)``
+    planes directly, and ``"bitboard"`` converts them to two 64-bit masks, which
+    is faster but requires ``board_size`` to be 8.
+    """
+
+    def __init__(self, backend: Optional[str] = None) -> None:
+        if backend is not None:
+            self.backend = backend
+        if self.backend not in ("cython", "bitboard"):
+            raise ValueError(f"invalid backend: {self.backend}")
+        if self.backend == "bitboard" and self.board_size != 8:
+            raise ValueError(
+                f"bitboard backend requires board_size=8, got {self.board_size}"
+            )
+        self._engine = (
+            othello_bitboard if self.backend == "bitboard" else othello_cythonfn
+        )
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Modules cannot be pickled, so the engine is looked up again on load.
+        state = self.__dict__.copy()
+        del state["_engine"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._engine = (
+            othello_bitboard if self.backend == "bitboard" else othello_cythonfn
+        )
+
     def step(
         self,
         state: OthelloState,
@@ -211,6 +551,7 @@ class OthelloEnv(BaseEnv[OthelloState, OthelloAction]):
         post_step_fn: Optional[
             Callable[[OthelloState, int, OthelloAction], None]
         ] = None,
+        out: Optional[Tuple[NDArray[np.int_], NDArray[np.int_]]] = None,
     ) -> OthelloState:
         """
         Step through the game,
@@ -233,6 +574,11 @@ class OthelloEnv(BaseEnv[OthelloState, OthelloAction]):
             Callback to run after executing action. The calculated state, ``agent_id``
             and ``action`` will be provided as arguments.
 
+        :arg out:
+            Optional ``(board, legal_actions)`` arrays to write the next state to,
+            instead of allocating new ones. They must not overlap the arrays of
+            ``state``, and become the arrays of the returned state.
+
         :returns:
             A copy of the object with the restored state.
         """
@@ -240,21 +586,36 @@ class OthelloEnv(BaseEnv[OthelloState, OthelloAction]):
         if pre_step_fn is not None:
             pre_step_fn(state, agent_id, action)
 
-        action = np.array(action, dtype=np.int_)
-        next_information = othello_cythonfn.fast_step(
+        action = _action_array(action)
+        (
+            code,
+            board,
+            legal_actions,
+            reward0,
+            reward1,
+            done,
+            hash,
+        ) = self._engine.try_step(
             state.board,
             state.legal_actions,
             agent_id,
             action[0],
             action[1],
             self.board_size,
+            state.hash,
+            out,
         )
+        if code:
+            raise ValueError(
+                othello_cythonfn.error_message(code, agent_id, action[0], action[1])
+            )
 
         next_state = OthelloState(
-            board=next_information[0],
-            legal_actions=next_information[1],
-            reward=np.array([next_information[2], next_information[3]]),
-            done=bool(next_information[4]),
+            board=board,
+            legal_actions=legal_actions,
+            reward=np.array([reward0, reward1]),
+            done=bool(done),
+            hash=hash,
         )
 
         if post_step_fn is not None:
@@ -262,6 +623,170 @@ class OthelloEnv(BaseEnv[OthelloState, OthelloAction]):
 
         return next_state
 
+    def try_step(
+        self,
+        state: OthelloState,
+        agent_id: int,
+        action: OthelloAction,
+        out: Optional[Tuple[NDArray[np.int_], NDArray[np.int_]]] = None,
+    ) -> Optional[OthelloState]:
+        """
+        Step through the game like :meth:`step`, but report an illegal action by
+        returning ``None`` instead of raising an exception. Callbacks are not
+        supported.
+
+        :arg state:
+            Current state of the environment.
+
+        :arg agent_id:
+            ID of the agent that takes the action. (''0'' or ''1'')
+
+        :arg action:
+            Agent action, encoded in the form described by :obj:'OthelloAction'.
+
+        :arg out:
+            Optional arrays to write the next state to, as in :meth:`step`.
+
+        :returns:
+            The next state, or ``None`` if the action is illegal.
+        """
+        action = _action_array(action)
+        (
+            code,
+            board,
+            legal_actions,
+            reward0,
+            reward1,
+            done,
+            hash,
+        ) = self._engine.try_step(
+            state.board,
+            state.legal_actions,
+            agent_id,
+            action[0],
+            action[1],
+            self.board_size,
+            state.hash,
+            out,
+        )
+        if code:
+            return None
+        return OthelloState(
+            board=board,
+            legal_actions=legal_actions,
+            reward=np.array([reward0, reward1]),
+            done=bool(done),
+            hash=hash,
+        )
+
+    def is_legal(
+        self, state: OthelloState, agent_id: int, action: OthelloAction
+    ) -> bool:
+        """
+        Check whether an action is legal without stepping through the game.
+
+        :arg state:
+            Current state of the environment.
+
+        :arg agent_id:
+            ID of the agent that takes the action. (''0'' or ''1'')
+
+        :arg action:
+            Agent action, encoded in the form described by :obj:'OthelloAction'.
+
+        :returns:
+            ``True`` if :meth:`step` would accept the action.
+        """
+        action = _action_array(action)
+        return not self._engine.is_legal(
+            state.board,
+            state.legal_actions,
+            agent_id,
+            action[0],
+            action[1],
+            self.board_size,
+        )
+
+    def legal_actions(
+        self, state: OthelloState, agent_id: int, encoding: str = "grid"
+    ) -> NDArray[Any]:
+        """
+        Find possible actions for the agent, which are kept in ``legal_actions`` of
+        the state.
+
+        :arg state:
+            Current state of the environment.
+
+        :arg agent_id:
+            ID of the agent.
+
+        :arg encoding:
+            ``"grid"`` for ``state.legal_actions[agent_id]`` itself, ``"mask"`` for a
+            boolean mask of shape ``(NUM_ACTIONS,)`` indexed by flat action index, or
+            ``"indices"`` for the sorted flat indices of the possible actions.
+
+        :returns:
+            A numpy array of possible actions in the requested encoding.
+        """
+        legal_actions = state.legal_actions[agent_id]
+        if encoding == "grid":
+            return legal_actions
+        if encoding == "mask":
+            return legal_actions.reshape(-1) != 0
+        if encoding == "indices":
+            return np.flatnonzero(legal_actions)
+        raise ValueError(f"invalid encoding: {encoding}")
+
+    def expand(self, state: OthelloState, agent_id: int) -> OthelloChildren:
+        """
+        Generate every legal child of a state in one call, which is much faster
+        than stepping through each legal action in turn.
+
+        :arg state:
+            Current state of the environment.
+
+        :arg agent_id:
+            ID of the agent that takes the actions. (''0'' or ''1'')
+
+        :returns:
+            An :obj:`OthelloChildren` object, holding the children in the order of
+            their flat action indices.
+        """
+        return OthelloChildren(
+            *self._engine.expand(
+                state.board, state.legal_actions, agent_id, self.board_size, state.hash
+            )
+        )
+
+    def search_state(self, state: OthelloState) -> Union[
+        othello_cythonfn.OthelloSearchState,
+        othello_bitboard.OthelloBitboardSearchState,
+    ]:
+        """
+        Create a mutable copy of the state for tree search. Actions are applied to
+        it with ``apply(agent_id, action_r, action_c)``, which returns a nonzero
+        error code for illegal actions instead of raising, and reverted with
+        ``undo()``.
+
+        :arg state:
+            State to copy.
+
+        :returns:
+            An ``OthelloSearchState`` object, or an ``OthelloBitboardSearchState``
+            object with the bitboard backend.
+        """
+        if self.backend == "bitboard":
+            return othello_bitboard.OthelloBitboardSearchState(
+                state.board,
+                state.legal_actions,
+                state.reward,
+                state.done,
+                self.board_size,
+            )
+        return othello_cythonfn.OthelloSearchState(
+            state.board, state.legal_actions, state.reward, state.done, self.board_size
+        )
+
     def _check_wins(self, board: NDArray[np.int_]) -> NDArray[np.int_]:
         agent0_cnt = np.count_nonzero(board[0])
         agent1_cnt = np.count_nonzero(board[1])
@@ -278,10 +803,15 @@ class OthelloEnv(BaseEnv[OthelloState, OthelloAction]):
             bottom_right = np.array([self.board_size, self.board_size])
         return np.all(np.logical_and(np.array([0, 0]) <= pos, pos < bottom_right))
 
-    def initialize_state(self) -> OthelloState:
+    def initialize_state(self, dtype: DTypeLike = np.int_) -> OthelloState:
         """
         Initialize a :obj:'OthelloState' object with correct environment parameters.
 
+        :arg dtype:
+            Data type of ``board`` and ``legal_actions``, one of ``np.int8``,
+            ``np.uint8`` and ``np.int_``. Steps keep the data type of the state they
+            are given.
+
         :returns:
             Created initial state object.
         """
@@ -290,6 +820,8 @@ class OthelloEnv(BaseEnv[OthelloState, OthelloAction]):
                 f"cannot center pieces with odd board_size={self.board_size}, please "
                 "initialize state manually"
             )
+        if np.dtype(dtype) not in othello_cythonfn.BOARD_DTYPES:
+            raise ValueError(f"unsupported board dtype: {np.dtype(dtype)}")
 
         board = np.array(
             [
@@ -313,7 +845,8 @@ class OthelloEnv(BaseEnv[OthelloState, OthelloAction]):
                     [0, 0, 0, 0, 0, 0, 0, 0],
                     [0, 0, 0, 0, 0, 0, 0, 0],
                 ],
-            ]
+            ],
+            dtype=dtype,
         )
 
         legal_actions = np.array(
@@ -338,7 +871,8 @@ class OthelloEnv(BaseEnv[OthelloState, OthelloAction]):
                     [0, 0, 0, 0, 0, 0, 0, 0],
                     [0, 0, 0, 0, 0, 0, 0, 0],
                 ],
-            ]
+            ],
+            dtype=dtype,
         )
 
         initial_state = OthelloState(
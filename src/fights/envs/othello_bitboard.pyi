@@ -0,0 +1,96 @@
+from typing import Any, Optional, Tuple
+
+import numpy as np
+from numpy.typing import DTypeLike
+
+from .othello import OthelloState
+
+ERROR_MESSAGES: Tuple[str, ...]
+SKIP_BIT: int
+
+def error_message(code: int, agent_id: int, action_r: int, action_c: int) -> str: ...
+def to_bitboard(planes: np.ndarray) -> Tuple[int, int]: ...
+def to_planes(mask0: int, mask1: int, dtype: DTypeLike = ...) -> np.ndarray: ...
+def legal_moves(own: int, opp: int) -> int: ...
+def flips(own: int, opp: int, cell: int) -> int: ...
+def legal_actions(black: int, white: int) -> Tuple[int, int]: ...
+def score(black: int, white: int) -> int: ...
+def zobrist_hash(black: int, white: int) -> int: ...
+def fast_step(
+    pre_board: np.ndarray,
+    pre_legal_actions: np.ndarray,
+    agent_id: int,
+    action_r: int,
+    action_c: int,
+    board_size: int,
+    out: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> Tuple[np.ndarray, np.ndarray, int, int, int]: ...
+def try_step(
+    pre_board: np.ndarray,
+    pre_legal_actions: np.ndarray,
+    agent_id: int,
+    action_r: int,
+    action_c: int,
+    board_size: int,
+    pre_hash: int = 0,
+    out: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> Tuple[int, Any, Any, int, int, int, int]: ...
+def is_legal(
+    board: np.ndarray,
+    legal_actions: np.ndarray,
+    agent_id: int,
+    action_r: int,
+    action_c: int,
+    board_size: int,
+) -> int: ...
+def expand(
+    board: np.ndarray,
+    legal_actions: np.ndarray,
+    agent_id: int,
+    board_size: int,
+    pre_hash: int = 0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]: ...
+def vector_step(
+    boards: np.ndarray,
+    legal_actions: np.ndarray,
+    agent_ids: np.ndarray,
+    actions: np.ndarray,
+    initial_board: np.ndarray,
+    codes: np.ndarray,
+    dones: np.ndarray,
+    rewards: np.ndarray,
+    num_threads: int = 0,
+) -> None: ...
+def rollout(
+    board: np.ndarray,
+    to_move: int,
+    n: int,
+    seed: int,
+    max_plies: int,
+    num_threads: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]: ...
+def perft(black: int, white: int, agent_id: int, depth: int) -> int: ...
+
+class OthelloBitboardSearchState:
+    board: np.ndarray
+    legal_actions: np.ndarray
+    reward: np.ndarray
+    bitboards: Tuple[int, int]
+    legal_masks: Tuple[int, int]
+    board_size: int
+    done: bool
+    ply: int
+    hash: int
+    winner: int
+    def __init__(
+        self,
+        board: np.ndarray,
+        legal_actions: np.ndarray,
+        reward: np.ndarray,
+        done: bool = False,
+        board_size: int = 8,
+        capacity: int = 64,
+    ) -> None: ...
+    def apply(self, agent_id: int, action_r: int, action_c: int) -> int: ...
+    def undo(self) -> None: ...
+    def to_state(self) -> OthelloState: ...
@@ -0,0 +1,796 @@
+#cython: language_level=3, boundscheck=False, wraparound=False, initializedcheck=False, cdivision=True
+
+"""
+Bitboard backend for Othello. A position is kept as two ``uint64`` masks, one per
+agent, where bit ``r * 8 + c`` is the cell ``(r, c)``. Moves and flips are
+computed with shift-and-mask operations over all 8 directions at once.
+
+The functions taking ``(2, 8, 8)`` planes have the same signatures and results as
+the ones in ``othello_cythonfn``, so ``OthelloEnv`` can use either module.
+"""
+
+import numpy as np
+
+cimport numpy as np
+from cython.parallel cimport prange
+
+from .boards cimport board_t
+from .prng cimport prng_below, prng_seed
+
+from .othello_cythonfn import ERROR_MESSAGES, ZOBRIST_KEYS, error_message
+
+
+cdef extern from *:
+    """
+    #if defined(_MSC_VER)
+    #include <intrin.h>
+    static inline int fights_popcount64(unsigned long long x) {
+        return (int)__popcnt64(x);
+    }
+    static inline int fights_ctz64(unsigned long long x) {
+        unsigned long index;
+        _BitScanForward64(&index, x);
+        return (int)index;
+    }
+    #else
+    static inline int fights_popcount64(unsigned long long x) {
+        return __builtin_popcountll(x);
+    }
+    static inline int fights_ctz64(unsigned long long x) {
+        return __builtin_ctzll(x);
+    }
+    #endif
+    """
+    int _popcount "fights_popcount64" (unsigned long long x) noexcept nogil
+    int _ctz "fights_ctz64" (unsigned long long x) noexcept nogil
+
+
+# Same codes as ``othello_cythonfn``.
+cdef enum:
+    OK
+    ERR_OUT_OF_BOARD
+    ERR_INVALID_AGENT_ID
+    ERR_CANNOT_SKIP
+    ERR_OPPONENT_STONE
+    ERR_OWN_STONE
+    ERR_NOTHING_TO_FLIP
+
+ctypedef unsigned long long u64
+
+cdef u64 NOT_FIRST_COL = 0xFEFEFEFEFEFEFEFEULL
+cdef u64 NOT_LAST_COL = 0x7F7F7F7F7F7F7F7FULL
+
+SKIP_BIT = 27
+"""
+Bit of the skip action ``(3, 3)`` in legal action masks. The cell is occupied from
+the start of the game, so it never collides with a move.
+"""
+cdef u64 SKIP = 1ULL << 27
+
+cdef const u64 [:,:,:] _keys = ZOBRIST_KEYS
+cdef u64 _flip_keys[64]
+cdef int _i
+for _i in range(64):
+    _flip_keys[_i] = _keys[0, _i // 8, _i % 8] ^ _keys[1, _i // 8, _i % 8]
+
+
+cdef inline u64 _shift(u64 x, int direction) noexcept nogil:
+    if direction == 0:
+        return (x << 9) & NOT_FIRST_COL
+    elif direction == 1:
+        return x << 8
+    elif direction == 2:
+        return (x << 7) & NOT_LAST_COL
+    elif direction == 3:
+        return (x >> 1) & NOT_LAST_COL
+    elif direction == 4:
+        return (x >> 9) & NOT_LAST_COL
+    elif direction == 5:
+        return x >> 8
+    elif direction == 6:
+        return (x >> 7) & NOT_FIRST_COL
+    return (x << 1) & NOT_FIRST_COL
+
+
+cdef inline u64 _moves(u64 own, u64 opp) noexcept nogil:
+    """
+    Return the cells where ``own`` can put a stone.
+    """
+    cdef u64 empty = ~(own | opp)
+    cdef u64 moves = 0
+    cdef u64 x
+    cdef int d
+    for d in range(8):
+        x = _shift(own, d) & opp
+        x |= _shift(x, d) & opp
+        x |= _shift(x, d) & opp
+        x |= _shift(x, d) & opp
+        x |= _shift(x, d) & opp
+        x |= _shift(x, d) & opp
+        moves |= _shift(x, d) & empty
+    return moves
+
+
+cdef inline u64 _flips(u64 own, u64 opp, u64 move) noexcept nogil:
+    """
+    Return the stones of ``opp`` flipped by putting a stone of ``own`` on ``move``.
+    """
+    cdef u64 flipped = 0
+    cdef u64 x, line
+    cdef int d
+    for d in range(8):
+        line = 0
+        x = _shift(move, d)
+        while x & opp:
+            line |= x
+            x = _shift(x, d)
+        if x & own:
+            flipped |= line
+    return flipped
+
+
+cdef inline u64 _update_hash(u64 hash, int agent_id, int cell, u64 flipped) noexcept nogil:
+    hash ^= _keys[agent_id, cell // 8, cell % 8]
+    while flipped:
+        hash ^= _flip_keys[_ctz(flipped)]
+        flipped &= flipped - 1
+    return hash
+
+
+cdef inline int _score(u64 black, u64 white) noexcept nogil:
+    cdef int diff = _popcount(black) - _popcount(white)
+    return (diff > 0) - (diff < 0)
+
+
+cdef int _check_action(
+    u64 own, u64 opp, u64 legal, int agent_id, int action_r, int action_c
+) noexcept nogil:
+    if not (0 <= action_r < 8 and 0 <= action_c < 8):
+        return ERR_OUT_OF_BOARD
+    if not 0 <= agent_id <= 1:
+        return ERR_INVALID_AGENT_ID
+
+    if action_r == 3 and action_c == 3:
+        if legal & SKIP:
+            return OK
+        return ERR_CANNOT_SKIP
+
+    cdef u64 move = 1ULL << (action_r * 8 + action_c)
+    if opp & move:
+        return ERR_OPPONENT_STONE
+    if own & move:
+        return ERR_OWN_STONE
+    if not _flips(own, opp, move):
+        return ERR_NOTHING_TO_FLIP
+    return OK
+
+
+cdef int _apply_action(u64 *masks, u64 *legal, int agent_id, int cell) noexcept nogil:
+    """
+    Put a stone which passed ``_check_action`` on ``cell``, flip the captured
+    stones and update the legal actions of both agents, in place. Returns whether
+    the game is done.
+    """
+    cdef u64 move = 1ULL << cell
+    cdef u64 flipped = _flips(masks[agent_id], masks[1 - agent_id], move)
+    masks[agent_id] |= move | flipped
+    masks[1 - agent_id] &= ~flipped
+    legal[0] = _moves(masks[0], masks[1])
+    legal[1] = _moves(masks[1], masks[0])
+    if not legal[0]:
+        legal[0] = SKIP
+    if not legal[1]:
+        legal[1] = SKIP
+    return legal[0] == SKIP and legal[1] == SKIP
+
+
+cdef u64 _plane_to_mask(board_t [:,:] plane_view) noexcept nogil:
+    cdef int i, j
+    cdef u64 mask = 0
+    for i in range(8):
+        for j in range(8):
+            if plane_view[i, j]:
+                mask |= 1ULL << (i * 8 + j)
+    return mask
+
+
+cdef void _mask_to_plane(u64 mask, board_t [:,:] plane_view) noexcept nogil:
+    cdef int i
+    for i in range(64):
+        plane_view[i // 8, i % 8] = (mask >> i) & 1
+
+
+def to_bitboard(board_t [:,:,:] planes):
+    """
+    Convert ``(2, 8, 8)`` planes to a tuple of two masks.
+    """
+    return (_plane_to_mask(planes[0]), _plane_to_mask(planes[1]))
+
+
+def to_planes(u64 mask0, u64 mask1, dtype=np.int_):
+    """
+    Convert two masks to ``(2, 8, 8)`` planes of ``dtype``.
+    """
+    planes = np.zeros((2, 8, 8), dtype=dtype)
+    _fill_planes(mask0, mask1, planes)
+    return planes
+
+
+def _fill_planes(u64 mask0, u64 mask1, board_t [:,:,:] planes_view):
+    _mask_to_plane(mask0, planes_view[0])
+    _mask_to_plane(mask1, planes_view[1])
+
+
+def legal_moves(u64 own, u64 opp):
+    """
+    Return the cells where the agent owning ``own`` can put a stone, as a mask.
+    """
+    return _moves(own, opp)
+
+
+def flips(u64 own, u64 opp, int cell):
+    """
+    Return the stones flipped by putting a stone on ``cell``, as a mask.
+    """
+    return _flips(own, opp, 1ULL << cell)
+
+
+def legal_actions(u64 black, u64 white):
+    """
+    Return the legal action masks of both agents, with ``SKIP_BIT`` set for an
+    agent without moves.
+    """
+    cdef u64 legal0 = _moves(black, white)
+    cdef u64 legal1 = _moves(white, black)
+    return (legal0 if legal0 else SKIP, legal1 if legal1 else SKIP)
+
+
+def score(u64 black, u64 white):
+    """
+    Return ``1`` if agent 0 has more stones, ``-1`` if agent 1 has, and ``0`` on a
+    draw.
+    """
+    return _score(black, white)
+
+
+def zobrist_hash(u64 black, u64 white):
+    """
+    Return the same hash as ``othello_cythonfn.zobrist_hash`` for the planes of
+    ``black`` and ``white``.
+    """
+    cdef u64 hash = 0
+    cdef u64 mask
+    cdef int agent_id
+    for agent_id, mask in enumerate((black, white)):
+        while mask:
+            hash ^= _keys[agent_id, _ctz(mask) // 8, _ctz(mask) % 8]
+            mask &= mask - 1
+    return hash
+
+
+def fast_step(
+    pre_board,
+    pre_legal_actions,
+    int agent_id,
+    int action_r,
+    int action_c,
+    int board_size,
+    out=None,
+):
+    code, board, legal_actions, reward0, reward1, done, _ = try_step(
+        pre_board, pre_legal_actions, agent_id, action_r, action_c, board_size, out=out
+    )
+    if code != OK:
+        raise ValueError(error_message(code, agent_id, action_r, action_c))
+    return (board, legal_actions, reward0, reward1, done)
+
+
+def try_step(
+    board_t [:,:,:] pre_board,
+    board_t [:,:,:] pre_legal_actions,
+    int agent_id,
+    int action_r,
+    int action_c,
+    int board_size,
+    u64 pre_hash = 0,
+    out=None,
+):
+    """
+    Step the board and legal actions. New arrays are returned, unless ``out`` is
+    given, in which case they are written to its ``(board, legal_actions)``
+    arrays.
+    """
+    cdef u64 masks[2]
+    cdef u64 legal[2]
+    cdef int code = OK
+    with nogil:
+        masks[0] = _plane_to_mask(pre_board[0])
+        masks[1] = _plane_to_mask(pre_board[1])
+        if 0 <= agent_id <= 1:
+            code = _check_action(
+                masks[agent_id],
+                masks[1 - agent_id],
+                SKIP if pre_legal_actions[agent_id, 3, 3] else 0,
+                agent_id,
+                action_r,
+                action_c,
+            )
+        else:
+            code = _check_action(0, 0, 0, agent_id, action_r, action_c)
+    if code != OK:
+        return (code, None, None, 0, 0, False, 0)
+
+    cdef board_t [:,:,:] board_view
+    cdef board_t [:,:,:] legal_actions_view
+    if action_r == 3 and action_c == 3:
+        if out is None:
+            return (OK, np.copy(pre_board), np.copy(pre_legal_actions), 0, 0, False, pre_hash)
+        board_view, legal_actions_view = out
+        board_view[...] = pre_board
+        legal_actions_view[...] = pre_legal_actions
+        return (OK, out[0], out[1], 0, 0, False, pre_hash)
+
+    cdef int cell = action_r * 8 + action_c
+    cdef u64 flipped = _flips(masks[agent_id], masks[1 - agent_id], 1ULL << cell)
+    cdef int done = _apply_action(masks, legal, agent_id, cell)
+    cdef int reward = _score(masks[0], masks[1]) if done else 0
+    if out is None:
+        dtype = np.asarray(pre_board).dtype
+        board = np.empty((2, 8, 8), dtype=dtype)
+        legal_actions = np.empty((2, 8, 8), dtype=dtype)
+    else:
+        board, legal_actions = out
+    board_view = board
+    legal_actions_view = legal_actions
+    with nogil:
+        _mask_to_plane(masks[0], board_view[0])
+        _mask_to_plane(masks[1], board_view[1])
+        _mask_to_plane(legal[0], legal_actions_view[0])
+        _mask_to_plane(legal[1], legal_actions_view[1])
+    return (
+        OK,
+        board,
+        legal_actions,
+        reward,
+        -reward,
+        done,
+        _update_hash(pre_hash, agent_id, cell, flipped),
+    )
+
+
+def is_legal(
+    board_t [:,:,:] board,
+    board_t [:,:,:] legal_actions,
+    int agent_id,
+    int action_r,
+    int action_c,
+    int board_size
+):
+    if not 0 <= agent_id <= 1:
+        return _check_action(0, 0, 0, agent_id, action_r, action_c)
+    cdef int code
+    with nogil:
+        code = _check_action(
+            _plane_to_mask(board[agent_id]),
+            _plane_to_mask(board[1 - agent_id]),
+            SKIP if legal_actions[agent_id, 3, 3] else 0,
+            agent_id,
+            action_r,
+            action_c,
+        )
+    return code
+
+
+def expand(
+    board_t [:,:,:] board,
+    board_t [:,:,:] legal_actions,
+    int agent_id,
+    int board_size,
+    u64 pre_hash = 0,
+):
+    """
+    Generate every legal child of a position in one pass, walking the move mask
+    of ``agent_id`` once and writing each child straight into stacked arrays.
+
+    Returns ``(actions, boards, legal_actions, rewards, dones, hashes)``: the sorted
+    flat indices of the ``K`` legal actions, the child boards and legal actions of
+    shape ``(K, 2, 8, 8)`` in the dtype of ``board``, the rewards of shape
+    ``(K, 2)``, whether each child is done, and their Zobrist hashes updated from
+    ``pre_hash``. Without moves, the only child is the skip action, a copy of the
+    position.
+    """
+    cdef u64 black = _plane_to_mask(board[0])
+    cdef u64 white = _plane_to_mask(board[1])
+    cdef u64 moves = _moves(black, white) if agent_id == 0 else _moves(white, black)
+    parent = np.asarray(board)
+    cdef Py_ssize_t k, n = _popcount(moves) if moves else 1
+    actions = np.empty(n, dtype=np.intp)
+    boards = np.empty((n, 2, 8, 8), dtype=parent.dtype)
+    children_legal = np.empty((n, 2, 8, 8), dtype=parent.dtype)
+    rewards = np.zeros((n, 2), dtype=np.int_)
+    dones = np.zeros(n, dtype=np.bool_)
+    hashes = np.empty(n, dtype=np.uint64)
+    if not moves:
+        actions[0] = 27
+        boards[0] = parent
+        children_legal[0] = legal_actions
+        hashes[0] = pre_hash
+        return actions, boards, children_legal, rewards, dones, hashes
+
+    cdef np.intp_t [:] actions_view = actions
+    cdef board_t [:,:,:,:] boards_view = boards
+    cdef board_t [:,:,:,:] legal_view = children_legal
+    cdef long [:,:] rewards_view = rewards
+    cdef unsigned char [:] dones_view = dones.view(np.uint8)
+    cdef u64 [:] hashes_view = hashes
+    cdef u64 masks[2]
+    cdef u64 legal[2]
+    cdef u64 flipped
+    cdef int cell, reward
+    with nogil:
+        for k in range(n):
+            cell = _ctz(moves)
+            moves &= moves - 1
+            masks[0] = black
+            masks[1] = white
+            flipped = _flips(masks[agent_id], masks[1 - agent_id], 1ULL << cell)
+            actions_view[k] = cell
+            if _apply_action(masks, legal, agent_id, cell):
+                dones_view[k] = 1
+                reward = _score(masks[0], masks[1])
+                rewards_view[k, 0] = reward
+                rewards_view[k, 1] = -reward
+            _mask_to_plane(masks[0], boards_view[k, 0])
+            _mask_to_plane(masks[1], boards_view[k, 1])
+            _mask_to_plane(legal[0], legal_view[k, 0])
+            _mask_to_plane(legal[1], legal_view[k, 1])
+            hashes_view[k] = _update_hash(pre_hash, agent_id, cell, flipped)
+    return actions, boards, children_legal, rewards, dones, hashes
+
+
+def vector_step(
+    board_t [:,:,:,:] boards,
+    board_t [:,:,:,:] legal_actions,
+    long [:] agent_ids,
+    long [:,:] actions,
+    board_t [:,:,:] initial_board,
+    long [:] codes,
+    long [:] dones,
+    long [:,:] rewards,
+    int num_threads = 0,
+):
+    """
+    Step every game of a batch in place, with ``agent_ids[i]`` taking
+    ``actions[i]`` in game ``i``. The error code of each action is written to
+    ``codes``, and a game with an illegal action is left unchanged. Finished games
+    are reset to ``initial_board`` with agent ``0`` to move.
+
+    Games are stepped in parallel without the GIL, on ``num_threads`` threads or
+    the OpenMP default if it is ``0``.
+    """
+    cdef Py_ssize_t i, n = boards.shape[0]
+    cdef u64 initial[2]
+    initial[0] = _plane_to_mask(initial_board[0])
+    initial[1] = _plane_to_mask(initial_board[1])
+    if num_threads > 0:
+        for i in prange(n, nogil=True, num_threads=num_threads):
+            _vector_step(
+                boards[i], legal_actions[i], agent_ids, actions, i, initial, codes,
+                dones, rewards,
+            )
+    else:
+        for i in prange(n, nogil=True):
+            _vector_step(
+                boards[i], legal_actions[i], agent_ids, actions, i, initial, codes,
+                dones, rewards,
+            )
+
+
+cdef void _vector_step(
+    board_t [:,:,:] board_view,
+    board_t [:,:,:] legal_actions_view,
+    long [:] agent_ids,
+    long [:,:] actions,
+    Py_ssize_t i,
+    u64 *initial,
+    long [:] codes,
+    long [:] dones,
+    long [:,:] rewards,
+) noexcept nogil:
+    cdef int cell
+    cdef int agent_id = agent_ids[i]
+    cdef u64 masks[2]
+    cdef u64 legal[2]
+    if not 0 <= agent_id <= 1:
+        codes[i] = _check_action(0, 0, 0, agent_id, actions[i, 0], actions[i, 1])
+        return
+    masks[0] = _plane_to_mask(board_view[0])
+    masks[1] = _plane_to_mask(board_view[1])
+    codes[i] = _check_action(
+        masks[agent_id],
+        masks[1 - agent_id],
+        SKIP if legal_actions_view[agent_id, 3, 3] else 0,
+        agent_id,
+        actions[i, 0],
+        actions[i, 1],
+    )
+    if codes[i] != OK:
+        return
+    agent_ids[i] = 1 - agent_id
+    if actions[i, 0] == 3 and actions[i, 1] == 3:
+        return
+
+    cell = actions[i, 0] * 8 + actions[i, 1]
+    if _apply_action(masks, legal, agent_id, cell):
+        dones[i] = 1
+        rewards[i, 0] = _score(masks[0], masks[1])
+        rewards[i, 1] = -rewards[i, 0]
+        masks[0] = initial[0]
+        masks[1] = initial[1]
+        legal[0] = _moves(masks[0], masks[1])
+        legal[1] = _moves(masks[1], masks[0])
+        agent_ids[i] = 0
+    _mask_to_plane(masks[0], board_view[0])
+    _mask_to_plane(masks[1], board_view[1])
+    _mask_to_plane(legal[0], legal_actions_view[0])
+    _mask_to_plane(legal[1], legal_actions_view[1])
+
+
+cdef class OthelloBitboardSearchState:
+    """
+    Mutable game state for tree search, kept as bitboards. Actions are applied in
+    place and recorded on an undo stack. ``board`` and ``legal_actions`` are
+    converted to planes when accessed.
+    """
+
+    cdef readonly int board_size
+    cdef readonly bint done
+    cdef readonly int ply
+    cdef readonly u64 hash
+    cdef readonly int winner
+    cdef u64 masks[2]
+    cdef u64 legal[2]
+    cdef object history
+    cdef u64 [:,:] history_view
+
+    def __init__(self, board, legal_actions, reward, bint done=False, int board_size=8, int capacity=64):
+        if board_size != 8:
+            raise ValueError(f"bitboard backend requires board_size=8, got {board_size}")
+        cdef long [:,:,:] board_view = np.asarray(board, dtype=np.int_)
+        cdef long [:,:,:] legal_actions_view = np.asarray(legal_actions, dtype=np.int_)
+        self.masks[0] = _plane_to_mask(board_view[0])
+        self.masks[1] = _plane_to_mask(board_view[1])
+        self.legal[0] = _plane_to_mask(legal_actions_view[0])
+        self.legal[1] = _plane_to_mask(legal_actions_view[1])
+        self.board_size = board_size
+        self.done = done
+        self.winner = reward[0]
+        self.ply = 0
+        self.hash = zobrist_hash(self.masks[0], self.masks[1])
+        self.history = np.zeros((capacity, 7), dtype=np.uint64)
+        self.history_view = self.history
+
+    @property
+    def bitboards(self):
+        """
+        Stones of both agents as a tuple of two masks.
+        """
+        return (self.masks[0], self.masks[1])
+
+    @property
+    def legal_masks(self):
+        """
+        Legal actions of both agents as a tuple of two masks.
+        """
+        return (self.legal[0], self.legal[1])
+
+    @property
+    def board(self):
+        return to_planes(self.masks[0], self.masks[1])
+
+    @property
+    def legal_actions(self):
+        return to_planes(self.legal[0], self.legal[1])
+
+    @property
+    def reward(self):
+        return np.array([self.winner, -self.winner])
+
+    cdef void _reserve(self):
+        if self.ply < self.history_view.shape[0]:
+            return
+        self.history = np.concatenate([self.history, np.zeros_like(self.history)])
+        self.history_view = self.history
+
+    cpdef int apply(self, int agent_id, int action_r, int action_c):
+        """
+        Apply an action in place. Returns ``0`` if the action was applied, or the
+        error code from ``ERROR_MESSAGES`` if it is illegal, in which case the state
+        is left untouched.
+        """
+        cdef int code
+        if 0 <= agent_id <= 1:
+            code = _check_action(
+                self.masks[agent_id],
+                self.masks[1 - agent_id],
+                self.legal[agent_id],
+                agent_id,
+                action_r,
+                action_c,
+            )
+        else:
+            code = _check_action(0, 0, 0, agent_id, action_r, action_c)
+        if code != OK:
+            return code
+
+        self._reserve()
+        cdef u64 [:] entry = self.history_view[self.ply]
+        self.ply += 1
+        entry[0] = self.masks[0]
+        entry[1] = self.masks[1]
+        entry[2] = self.legal[0]
+        entry[3] = self.legal[1]
+        entry[4] = self.hash
+        entry[5] = self.done
+        entry[6] = self.winner + 1
+        self.done = False
+        self.winner = 0
+        if action_r == 3 and action_c == 3:
+            return OK
+
+        cdef int cell = action_r * 8 + action_c
+        cdef u64 flipped = _flips(self.masks[agent_id], self.masks[1 - agent_id], 1ULL << cell)
+        self.hash = _update_hash(self.hash, agent_id, cell, flipped)
+        self.done = _apply_action(self.masks, self.legal, agent_id, cell)
+        if self.done:
+            self.winner = _score(self.masks[0], self.masks[1])
+        return OK
+
+    cpdef void undo(self) except *:
+        """
+        Revert the most recently applied action.
+        """
+        if self.ply == 0:
+            raise IndexError("no action to undo")
+        self.ply -= 1
+        cdef u64 [:] entry = self.history_view[self.ply]
+        self.masks[0] = entry[0]
+        self.masks[1] = entry[1]
+        self.legal[0] = entry[2]
+        self.legal[1] = entry[3]
+        self.hash = entry[4]
+        self.done = entry[5]
+        self.winner = <int>entry[6] - 1
+
+    def to_state(self):
+        """
+        Copy the current position into a new ``OthelloState``.
+        """
+        from .othello import OthelloState
+
+        return OthelloState(
+            board=self.board,
+            legal_actions=self.legal_actions,
+            reward=self.reward,
+            done=bool(self.done),
+            hash=self.hash,
+        )
+
+
+def rollout(
+    board_t [:,:,:] board,
+    int to_move,
+    Py_ssize_t n,
+    u64 seed,
+    int max_plies,
+    int num_threads = 0,
+):
+    """
+    Play ``n`` games from ``board`` with uniformly random legal actions, starting
+    with ``to_move``, without leaving C. An agent without moves skips, which counts
+    as an action like in ``OthelloEnv``. Every game has its own random stream
+    derived from ``seed`` and its index, and games are played in parallel like
+    ``vector_step``, so results only depend on ``seed``.
+
+    Returns ``(winners, lengths)``, arrays of shape ``(n,)`` holding the winner of
+    each game, or ``-1`` if it was drawn or cut off after ``max_plies`` actions,
+    and the number of actions taken.
+    """
+    winners = np.empty(n, dtype=np.int_)
+    lengths = np.empty(n, dtype=np.int_)
+    cdef long [:] winners_view = winners
+    cdef long [:] lengths_view = lengths
+    cdef u64 black = _plane_to_mask(board[0])
+    cdef u64 white = _plane_to_mask(board[1])
+    cdef Py_ssize_t i
+    if num_threads > 0:
+        for i in prange(n, nogil=True, schedule="dynamic", num_threads=num_threads):
+            _rollout(
+                black, white, to_move, seed, i, max_plies, winners_view, lengths_view
+            )
+    else:
+        for i in prange(n, nogil=True, schedule="dynamic"):
+            _rollout(
+                black, white, to_move, seed, i, max_plies, winners_view, lengths_view
+            )
+    return winners, lengths
+
+
+cdef void _rollout(
+    u64 black,
+    u64 white,
+    int agent_id,
+    u64 seed,
+    Py_ssize_t i,
+    int max_plies,
+    long [:] winners,
+    long [:] lengths,
+) noexcept nogil:
+    cdef u64 state = prng_seed(seed, i)
+    cdef u64 masks[2]
+    cdef u64 legal[2]
+    cdef u64 moves
+    cdef int ply, k, reward
+    cdef int done = 0
+    masks[0] = black
+    masks[1] = white
+    legal[0] = _moves(black, white)
+    legal[1] = _moves(white, black)
+    ply = 0
+    if legal[0] or legal[1]:
+        while ply < max_plies:
+            # Cell 27 starts occupied, so the skip bit never marks a move.
+            moves = legal[agent_id] & ~SKIP
+            ply += 1
+            if moves:
+                # Pick one of the moves uniformly by dropping the k lowest ones.
+                k = prng_below(&state, _popcount(moves))
+                while k:
+                    moves &= moves - 1
+                    k -= 1
+                if _apply_action(masks, legal, agent_id, _ctz(moves)):
+                    done = 1
+                    break
+            agent_id = 1 - agent_id
+    else:
+        done = 1
+
+    lengths[i] = ply
+    reward = _score(masks[0], masks[1]) if done else 0
+    winners[i] = 0 if reward > 0 else (1 if reward < 0 else -1)
+
+
+def perft(u64 black, u64 white, int agent_id, int depth):
+    """
+    Count the leaf nodes of the game tree ``depth`` plies below a position, with
+    skips counted as moves. Used to verify and benchmark move generation.
+    """
+    cdef u64 masks[2]
+    masks[0] = black
+    masks[1] = white
+    return _perft(masks, agent_id, depth, 0)
+
+
+cdef long long _perft(u64 *masks, int agent_id, int depth, int skipped) noexcept nogil:
+    if depth == 0:
+        return 1
+    cdef u64 moves = _moves(masks[agent_id], masks[1 - agent_id])
+    cdef u64 saved[2]
+    cdef u64 move, flipped
+    cdef long long nodes = 0
+    if not moves:
+        if skipped:
+            return 1
+        return _perft(masks, 1 - agent_id, depth - 1, 1)
+    saved[0] = masks[0]
+    saved[1] = masks[1]
+    while moves:
+        move = moves & (~moves + 1)
+        moves &= moves - 1
+        flipped = _flips(masks[agent_id], masks[1 - agent_id], move)
+        masks[agent_id] |= move | flipped
+        masks[1 - agent_id] &= ~flipped
+        nodes += _perft(masks, 1 - agent_id, depth - 1, 0)
+        masks[0] = saved[0]
+        masks[1] = saved[1]
+    return nodes
@@ -1,7 +1,17 @@
-from typing import Tuple
+from typing import Any, Optional, Tuple
 
 import numpy as np
+from numpy.typing import ArrayLike
 
+from .othello import OthelloState
+
+ERROR_MESSAGES: Tuple[str, ...]
+ZOBRIST_KEYS: np.ndarray
+BOARD_DTYPES: Tuple[np.dtype, ...]
+
+def as_board(board: ArrayLike) -> np.ndarray: ...
+def zobrist_hash(board: np.ndarray, board_size: int) -> int: ...
+def error_message(code: int, agent_id: int, action_r: int, action_c: int) -> str: ...
 def fast_step(
     pre_board: np.ndarray,
     pre_legal_actions: np.ndarray,
@@ -9,4 +19,51 @@ def fast_step(
     action_r: int,
     action_c: int,
     board_size: int,
+    out: Optional[Tuple[np.ndarray, np.ndarray]] = None,
 ) -> Tuple[np.ndarray, np.ndarray, int, int, int]: ...
+def try_step(
+    pre_board: np.ndarray,
+    pre_legal_actions: np.ndarray,
+    agent_id: int,
+    action_r: int,
+    action_c: int,
+    board_size: int,
+    pre_hash: int = 0,
+    out: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> Tuple[int, Any, Any, int, int, int, int]: ...
+def is_legal(
+    board: np.ndarray,
+    legal_actions: np.ndarray,
+    agent_id: int,
+    action_r: int,
+    action_c: int,
+    board_size: int,
+) -> int: ...
+def expand(
+    board: np.ndarray,
+    legal_actions: np.ndarray,
+    agent_id: int,
+    board_size: int,
+    pre_hash: int = 0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]: ...
+
+class OthelloSearchState:
+    board: np.ndarray
+    legal_actions: np.ndarray
+    reward: np.ndarray
+    board_size: int
+    done: bool
+    ply: int
+    hash: int
+    def __init__(
+        self,
+        board: np.ndarray,
+        legal_actions: np.ndarray,
+        reward: np.ndarray,
+        done: bool = False,
+        board_size: int = 8,
+        capacity: int = 64,
+    ) -> None: ...
+    def apply(self, agent_id: int, action_r: int, action_c: int) -> int: ...
+    def undo(self) -> None: ...
+    def to_state(self) -> OthelloState: ...
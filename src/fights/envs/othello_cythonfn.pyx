@@ -4,6 +4,74 @@ import numpy as np
 
 cimport numpy as np
 
+from .boards cimport board_t
+
+
+cdef enum:
+    OK
+    ERR_OUT_OF_BOARD
+    ERR_INVALID_AGENT_ID
+    ERR_CANNOT_SKIP
+    ERR_OPPONENT_STONE
+    ERR_OWN_STONE
+    ERR_NOTHING_TO_FLIP
+
+ERROR_MESSAGES = (
+    "",
+    "out of board: ({r}, {c})",
+    "invalid agent_id: {agent_id}",
+    "cannot skip if there is possible action",
+    "cannot put a stone on opponent's stone",
+    "cannot put a stone on another stone",
+    "There is no stone to flip",
+)
+"""
+Messages for the error codes returned by ``try_step`` and ``is_legal``, indexed by
+code. Code ``0`` means the action is legal.
+"""
+
+BOARD_DTYPES = (np.dtype(np.int8), np.dtype(np.uint8), np.dtype(np.int_))
+"""
+Board dtypes the kernels of both backends run on as is. ``legal_actions`` must
+have the same dtype as ``board``. Any other board is converted to ``np.int_`` by
+``as_board``.
+"""
+
+
+def as_board(board):
+    """
+    Return ``board`` as an array, converted to ``np.int_`` unless its dtype is one
+    of ``BOARD_DTYPES``.
+    """
+    board = np.asarray(board)
+    if board.dtype in BOARD_DTYPES:
+        return board
+    return board.astype(np.int_)
+
+
+cdef int DIRECTIONS[8][2]
+DIRECTIONS[:] = [[1, 1], [1, 0], [1, -1], [0, -1], [-1, -1], [-1, 0], [-1, 1], [0, 1]]
+
+ZOBRIST_KEYS = np.random.default_rng(0x6F74686C).integers(
+    0, 2**64, size=(2, 8, 8), dtype=np.uint64, endpoint=False
+)
+"""
+Zobrist keys of the stones, indexed by ``[agent_id, r, c]``.
+"""
+ZOBRIST_KEYS.flags.writeable = False
+cdef const unsigned long long [:,:,:] _keys = ZOBRIST_KEYS
+
+
+def zobrist_hash(board_t [:,:,:] board, int board_size):
+    cdef unsigned long long hash
+    with nogil:
+        hash = _zobrist_hash(board, board_size)
+    return hash
+
+
+def error_message(int code, int agent_id, int action_r, int action_c):
+    return ERROR_MESSAGES[code].format(agent_id=agent_id, r=action_r, c=action_c)
+
 
 def fast_step(
     pre_board,
@@ -11,84 +79,246 @@ def fast_step(
     int agent_id,
     int action_r,
     int action_c,
-    int board_size
+    int board_size,
+    out=None,
+):
+    code, board, legal_actions, reward0, reward1, done, _ = try_step(
+        pre_board, pre_legal_actions, agent_id, action_r, action_c, board_size, out=out
+    )
+    if code != OK:
+        raise ValueError(error_message(code, agent_id, action_r, action_c))
+    return (board, legal_actions, reward0, reward1, done)
+
+
+def try_step(
+    board_t [:,:,:] pre_board,
+    board_t [:,:,:] pre_legal_actions,
+    int agent_id,
+    int action_r,
+    int action_c,
+    int board_size,
+    unsigned long long pre_hash = 0,
+    out=None,
 ):
+    """
+    Step a copy of the board and legal actions. If ``out`` is given, the copy is
+    written to its ``(board, legal_actions)`` arrays instead of new ones, which
+    must not overlap the inputs.
+    """
+    cdef int code
+    with nogil:
+        code = _check_action(
+            pre_board, pre_legal_actions, agent_id, action_r, action_c, board_size
+        )
+    if code != OK:
+        return (code, None, None, 0, 0, False, 0)
 
-    board = np.copy(pre_board)
-    cdef long [:,:,:] board_view = board
-    legal_actions = np.copy(pre_legal_actions)
-    cdef long [:,:,:] pre_legal_actions_view = pre_legal_actions
-    cdef long [:,:,:] legal_actions_view = legal_actions
+    if out is None:
+        board = np.copy(pre_board)
+        legal_actions = np.copy(pre_legal_actions)
+    else:
+        board, legal_actions = out
+    cdef board_t [:,:,:] board_view = board
+    cdef board_t [:,:,:] legal_actions_view = legal_actions
+    if out is not None:
+        board_view[...] = pre_board
+        legal_actions_view[...] = pre_legal_actions
+    if action_r == 3 and action_c == 3:
+        return (OK, board, legal_actions, 0, 0, False, pre_hash)
 
     cdef int reward[2]
     cdef int done
+    cdef unsigned long long flipped, hash
 
-    cdef int i, j, k
-    cdef int directions[8][2]
-    cdef int flag, flipped_something
-    cdef int now_r, now_c
-    cdef int has_action0, has_action1
+    with nogil:
+        flipped = _apply_action(board_view, agent_id, action_r, action_c, board_size)
+        hash = _update_hash(pre_hash, agent_id, action_r, action_c, flipped, board_size)
+        done = _update_legal_actions(board_view, legal_actions_view, board_size)
+        reward[0] = 0
+        reward[1] = 0
+        if done:
+            reward[0] = _check_wins(board_view, board_size)
+            reward[1] = -reward[0]
+    return (OK, board, legal_actions, reward[0], reward[1], done, hash)
+
+
+def is_legal(
+    board_t [:,:,:] board_view,
+    board_t [:,:,:] legal_actions_view,
+    int agent_id,
+    int action_r,
+    int action_c,
+    int board_size
+):
+    cdef int code
+    with nogil:
+        code = _check_action(
+            board_view, legal_actions_view, agent_id, action_r, action_c, board_size
+        )
+    return code
+
+
+def expand(
+    board_t [:,:,:] board,
+    board_t [:,:,:] legal_actions,
+    int agent_id,
+    int board_size,
+    unsigned long long pre_hash = 0,
+):
+    """
+    Generate every legal child of a position in one pass. The children are
+    written straight into stacked arrays, without checking their actions again.
+
+    Returns ``(actions, boards, legal_actions, rewards, dones, hashes)``: the sorted
+    flat indices of the ``K`` legal actions, the child boards and legal actions of
+    shape ``(K, 2, W, H)`` in the dtype of ``board``, the rewards of shape
+    ``(K, 2)``, whether each child is done, and their Zobrist hashes updated from
+    ``pre_hash``.
+    """
+    parent = np.asarray(board)
+    actions = np.flatnonzero(np.asarray(legal_actions[agent_id]))
+    cdef Py_ssize_t k, n = len(actions)
+    boards = np.empty((n, *parent.shape), dtype=parent.dtype)
+    boards[...] = parent
+    children_legal = np.empty((n, *parent.shape), dtype=parent.dtype)
+    children_legal[...] = legal_actions
+    rewards = np.zeros((n, 2), dtype=np.int_)
+    dones = np.zeros(n, dtype=np.bool_)
+    hashes = np.empty(n, dtype=np.uint64)
+    cdef const np.intp_t [:] actions_view = actions
+    cdef board_t [:,:,:,:] boards_view = boards
+    cdef board_t [:,:,:,:] legal_view = children_legal
+    cdef long [:,:] rewards_view = rewards
+    cdef unsigned char [:] dones_view = dones.view(np.uint8)
+    cdef unsigned long long [:] hashes_view = hashes
+    cdef unsigned long long flipped
+    cdef int r, c
+    with nogil:
+        for k in range(n):
+            r = actions_view[k] // board_size
+            c = actions_view[k] % board_size
+            if r == 3 and c == 3:
+                # Skipping leaves the position as it is.
+                hashes_view[k] = pre_hash
+                continue
+            flipped = _apply_action(boards_view[k], agent_id, r, c, board_size)
+            hashes_view[k] = _update_hash(pre_hash, agent_id, r, c, flipped, board_size)
+            if _update_legal_actions(boards_view[k], legal_view[k], board_size):
+                dones_view[k] = 1
+                rewards_view[k, 0] = _check_wins(boards_view[k], board_size)
+                rewards_view[k, 1] = -rewards_view[k, 0]
+    return actions, boards, children_legal, rewards, dones, hashes
 
-    reward[0] = 0
-    reward[1] = 0
-    done = False
 
+cdef int _check_action(
+    board_t [:,:,:] board_view,
+    board_t [:,:,:] legal_actions_view,
+    int agent_id,
+    int action_r,
+    int action_c,
+    int board_size
+) noexcept nogil:
     if not _check_in_range(action_r, action_c, board_size):
-        raise ValueError(f"out of board: {(action_r, action_c)}")
+        return ERR_OUT_OF_BOARD
     if not 0 <= agent_id <= 1:
-        raise ValueError(f"invalid agent_id: {agent_id}")
+        return ERR_INVALID_AGENT_ID
 
     if action_r == 3 and action_c == 3:
         if legal_actions_view[agent_id, 3, 3]:
-            return (board, legal_actions, reward[0], reward[1], done)
-        else:
-            raise ValueError("cannot skip if there is possible action")
+            return OK
+        return ERR_CANNOT_SKIP
 
     if board_view[1-agent_id, action_r, action_c]:
-        raise ValueError("cannot put a stone on opponent's stone")
+        return ERR_OPPONENT_STONE
     if board_view[agent_id, action_r, action_c]:
-        raise ValueError("cannot put a stone on another stone")
+        return ERR_OWN_STONE
+    if not is_flippable(board_view, agent_id, action_r, action_c, board_size, DIRECTIONS):
+        return ERR_NOTHING_TO_FLIP
+    return OK
+
 
-    directions[0][:] = [1, 1]
-    directions[1][:] = [1, 0]
-    directions[2][:] = [1, -1]
-    directions[3][:] = [0, -1]
-    directions[4][:] = [-1, -1]
-    directions[5][:] = [-1, 0]
-    directions[6][:] = [-1, 1]
-    directions[7][:] = [0, 1]
+cdef unsigned long long _apply_action(
+    board_t [:,:,:] board_view, int agent_id, int action_r, int action_c, int board_size
+) noexcept nogil:
+    """
+    Put a stone which passed ``is_legal`` and flip the captured stones, in place.
+    Returns the flipped cells as a bitmask indexed by ``r * board_size + c``.
+    """
+    cdef int i, j, k
+    cdef int flag
+    cdef int now_r, now_c
+    cdef unsigned long long flipped = 0
 
     board_view[agent_id, action_r, action_c] = 1
 
-    flipped_something = 0
     for i in range(8):
         flag = 0
         now_r = action_r
         now_c = action_c
         for j in range(board_size):
-            now_r += directions[i][0]
-            now_c += directions[i][1]
+            now_r += DIRECTIONS[i][0]
+            now_c += DIRECTIONS[i][1]
             if not _check_in_range(now_r, now_c, board_size):
                 break
             if board_view[1-agent_id, now_r, now_c]:
                 flag = 1
             elif board_view[agent_id, now_r, now_c]:
                 if flag:
-                    flipped_something = 1
                     now_r = action_r
                     now_c = action_c
                     for k in range(j):
-                        now_r += directions[i][0]
-                        now_c += directions[i][1]
+                        now_r += DIRECTIONS[i][0]
+                        now_c += DIRECTIONS[i][1]
                         board_view[agent_id, now_r, now_c] = 1
                         board_view[1-agent_id, now_r, now_c] = 0
+                        flipped |= 1ULL << (now_r * board_size + now_c)
                     break
                 else:
                     break
             else:
                 break
-    if not flipped_something:
-        raise ValueError("There is no stone to flip")
+    return flipped
+
+
+cdef unsigned long long _update_hash(
+    unsigned long long hash,
+    int agent_id,
+    int action_r,
+    int action_c,
+    unsigned long long flipped,
+    int board_size,
+) noexcept nogil:
+    """
+    Update ``hash`` with a stone put by ``_apply_action`` and the cells it flipped.
+    """
+    cdef int i
+    hash ^= _keys[agent_id, action_r, action_c]
+    for i in range(board_size * board_size):
+        if (flipped >> i) & 1:
+            hash ^= _keys[0, i // board_size, i % board_size]
+            hash ^= _keys[1, i // board_size, i % board_size]
+    return hash
+
+
+cdef unsigned long long _zobrist_hash(board_t [:,:,:] board_view, int board_size) noexcept nogil:
+    cdef int agent_id, i, j
+    cdef unsigned long long hash = 0
+    for agent_id in range(2):
+        for i in range(board_size):
+            for j in range(board_size):
+                if board_view[agent_id, i, j]:
+                    hash ^= _keys[agent_id, i, j]
+    return hash
+
+
+cdef int _update_legal_actions(
+    board_t [:,:,:] board_view, board_t [:,:,:] legal_actions_view, int board_size
+) noexcept nogil:
+    """
+    Recompute legal actions of both agents. Returns whether the game is done.
+    """
+    cdef int i, j
+    cdef int has_action0, has_action1
 
     for i in range(board_size):
         for j in range(board_size):
@@ -96,8 +326,8 @@ def fast_step(
                 legal_actions_view[0, i, j] = 0
                 legal_actions_view[1, i, j] = 0
             else:
-                legal_actions_view[0, i, j] = is_flippable(board_view, 0, i, j, board_size, directions)
-                legal_actions_view[1, i, j] = is_flippable(board_view, 1, i, j, board_size, directions)
+                legal_actions_view[0, i, j] = is_flippable(board_view, 0, i, j, board_size, DIRECTIONS)
+                legal_actions_view[1, i, j] = is_flippable(board_view, 1, i, j, board_size, DIRECTIONS)
 
     has_action0 = 0
     has_action1 = 0
@@ -113,14 +343,9 @@ def fast_step(
     if has_action1 == 0:
         legal_actions_view[1, 3, 3] = 1
 
-    if has_action0 == 0 and has_action1 == 0:
-        done = True
-        reward[0] = _check_wins(board_view, board_size)
-        reward[1] = -reward[0]
+    return has_action0 == 0 and has_action1 == 0
 
-    return (board, legal_actions, reward[0], reward[1], done)
-
-cdef int is_flippable(long [:,:,:] board_view, int agent_id, int r, int c, int board_size, int [8][2] directions):
+cdef int is_flippable(board_t [:,:,:] board_view, int agent_id, int r, int c, int board_size, int [8][2] directions) noexcept nogil:
     cdef int i, j
     cdef int flag
     cdef int now_r, now_c
@@ -145,10 +370,10 @@ cdef int is_flippable(long [:,:,:] board_view, int agent_id, int r, int c, int b
                 break
     return 0
 
-cdef int _check_in_range(int pos_r, int pos_c, int bottom_right = 8):
+cdef int _check_in_range(int pos_r, int pos_c, int bottom_right = 8) noexcept nogil:
     return (0 <= pos_r < bottom_right and 0 <= pos_c < bottom_right)
 
-cdef int _check_wins(long [:,:,:] board_view, int board_size):
+cdef int _check_wins(board_t [:,:,:] board_view, int board_size) noexcept nogil:
     cdef int i, j
     cdef int agent0_cnt = 0, agent1_cnt = 0
     for i in range(board_size):
@@ -162,3 +387,139 @@ cdef int _check_wins(long [:,:,:] board_view, int board_size):
     elif agent0_cnt < agent1_cnt:
         return -1
     return 0
+
+
+cdef unsigned long long _plane_to_mask(board_t [:,:] plane_view, int board_size) noexcept nogil:
+    cdef int i, j
+    cdef unsigned long long mask = 0
+    for i in range(board_size):
+        for j in range(board_size):
+            if plane_view[i, j]:
+                mask |= 1ULL << (i * board_size + j)
+    return mask
+
+cdef void _mask_to_plane(unsigned long long mask, board_t [:,:] plane_view, int board_size) noexcept nogil:
+    cdef int i, j
+    for i in range(board_size):
+        for j in range(board_size):
+            plane_view[i, j] = (mask >> (i * board_size + j)) & 1
+
+
+cdef class OthelloSearchState:
+    """
+    Mutable game state for tree search. Actions are applied to ``board``,
+    ``legal_actions`` and ``reward`` in place and recorded on an undo stack, so
+    searching does not allocate a new state for every node.
+    """
+
+    cdef readonly object board
+    cdef readonly object legal_actions
+    cdef readonly object reward
+    cdef readonly int board_size
+    cdef readonly bint done
+    cdef readonly int ply
+    cdef readonly unsigned long long hash
+    cdef long [:,:,:] board_view
+    cdef long [:,:,:] legal_actions_view
+    cdef long [:] reward_view
+    cdef object history
+    cdef unsigned long long [:,:] history_view
+
+    def __init__(self, board, legal_actions, reward, bint done=False, int board_size=8, int capacity=64):
+        self.board = np.array(board, dtype=np.int_)
+        self.legal_actions = np.array(legal_actions, dtype=np.int_)
+        self.reward = np.array(reward, dtype=np.int_)
+        self.board_view = self.board
+        self.legal_actions_view = self.legal_actions
+        self.reward_view = self.reward
+        self.board_size = board_size
+        self.done = done
+        self.ply = 0
+        self.hash = _zobrist_hash(self.board_view, board_size)
+        self.history = np.zeros((capacity, 7), dtype=np.uint64)
+        self.history_view = self.history
+
+    cdef void _reserve(self):
+        if self.ply < self.history_view.shape[0]:
+            return
+        self.history = np.concatenate([self.history, np.zeros_like(self.history)])
+        self.history_view = self.history
+
+    cpdef int apply(self, int agent_id, int action_r, int action_c):
+        """
+        Apply an action in place. Returns ``0`` if the action was applied, or the
+        error code from ``ERROR_MESSAGES`` if it is illegal, in which case the state
+        is left untouched.
+        """
+        cdef int code = _check_action(
+            self.board_view, self.legal_actions_view, agent_id, action_r, action_c, self.board_size
+        )
+        if code != OK:
+            return code
+
+        self._reserve()
+        cdef unsigned long long [:] entry = self.history_view[self.ply]
+        self.ply += 1
+        entry[0] = agent_id
+        entry[1] = action_r * self.board_size + action_c
+        entry[2] = 0
+        entry[5] = self.done
+        entry[6] = self.reward_view[0] + 1
+        self.done = False
+        self.reward_view[0] = 0
+        self.reward_view[1] = 0
+        if action_r == 3 and action_c == 3:
+            return OK
+
+        entry[3] = _plane_to_mask(self.legal_actions_view[0], self.board_size)
+        entry[4] = _plane_to_mask(self.legal_actions_view[1], self.board_size)
+        entry[2] = _apply_action(self.board_view, agent_id, action_r, action_c, self.board_size)
+        self.hash = _update_hash(self.hash, agent_id, action_r, action_c, entry[2], self.board_size)
+        self.done = _update_legal_actions(self.board_view, self.legal_actions_view, self.board_size)
+        if self.done:
+            self.reward_view[0] = _check_wins(self.board_view, self.board_size)
+            self.reward_view[1] = -self.reward_view[0]
+        return OK
+
+    cpdef void undo(self) except *:
+        """
+        Revert the most recently applied action.
+        """
+        if self.ply == 0:
+            raise IndexError("no action to undo")
+        self.ply -= 1
+        cdef unsigned long long [:] entry = self.history_view[self.ply]
+        cdef int agent_id = entry[0]
+        cdef int action_r = entry[1] // self.board_size
+        cdef int action_c = entry[1] % self.board_size
+        cdef unsigned long long flipped = entry[2]
+        cdef int i, j
+        self.done = entry[5]
+        self.reward_view[0] = <long>entry[6] - 1
+        self.reward_view[1] = -self.reward_view[0]
+        if flipped == 0:  # Skipped turn
+            return
+
+        self.hash = _update_hash(self.hash, agent_id, action_r, action_c, flipped, self.board_size)
+        self.board_view[agent_id, action_r, action_c] = 0
+        for i in range(self.board_size):
+            for j in range(self.board_size):
+                if (flipped >> (i * self.board_size + j)) & 1:
+                    self.board_view[agent_id, i, j] = 0
+                    self.board_view[1 - agent_id, i, j] = 1
+        _mask_to_plane(entry[3], self.legal_actions_view[0], self.board_size)
+        _mask_to_plane(entry[4], self.legal_actions_view[1], self.board_size)
+
+    def to_state(self):
+        """
+        Copy the current position into a new ``OthelloState``.
+        """
+        from .othello import OthelloState
+
+        return OthelloState(
+            board=np.copy(self.board),
+            legal_actions=np.copy(self.legal_actions),
+            reward=np.copy(self.reward),
+            done=bool(self.done),
+            hash=self.hash,
+        )
@@ -0,0 +1,37 @@
+# cython: language_level=3
+
+"""
+Pseudo random numbers for the rollout kernels. Every game gets its own
+xorshift64* stream, seeded through splitmix64 from the seed of the batch and the
+index of the game, so results do not depend on which thread plays the game.
+"""
+
+
+cdef inline unsigned long long prng_seed(
+    unsigned long long seed, unsigned long long stream
+) noexcept nogil:
+    cdef unsigned long long z = seed + (stream + 1) * 0x9E3779B97F4A7C15ULL
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL
+    z = z ^ (z >> 31)
+    # xorshift never leaves the all zero state.
+    if z == 0:
+        return 0x9E3779B97F4A7C15ULL
+    return z
+
+
+cdef inline unsigned long long prng_next(unsigned long long *state) noexcept nogil:
+    cdef unsigned long long x = state[0]
+    x ^= x >> 12
+    x ^= x << 25
+    x ^= x >> 27
+    state[0] = x
+    return x * 0x2545F4914F6CDD1DULL
+
+
+cdef inline int prng_below(unsigned long long *state, int bound) noexcept nogil:
+    """
+    Draw an integer in ``[0, bound)`` from the high 32 bits of the next number.
+    The bias is below ``bound / 2**32``.
+    """
+    return <int>(((prng_next(state) >> 32) * <unsigned long long>bound) >> 32)
@@ -3,212 +3,580 @@
 import numpy as np
 
 cimport numpy as np
+from cython.parallel cimport prange
+
+from .boards cimport board_t, mask_t
+from .prng cimport prng_below, prng_seed
+from .wallgraph cimport (
+    Bits,
+    PathEdges,
+    WallGraph,
+    bits_or,
+    bits_test,
+    wall_graph,
+    wall_graph_block,
+    wall_graph_distances,
+    wall_graph_on_path,
+    wall_graph_paths_exist,
+    wall_graph_shortest_paths,
+    wall_graph_update_distances,
+)
+
+
+cdef enum:
+    OK
+    ERR_OUT_OF_BOARD
+    ERR_INVALID_AGENT_ID
+    ERR_OPPONENT_POSITION
+    ERR_ZERO_BLOCKS
+    ERR_TOO_FAR
+    ERR_JUMP_OVER_NOTHING
+    ERR_DIAGONAL
+    ERR_JUMP_OVER_WALLS
+    ERR_LINEAR_JUMP_POSSIBLE
+    ERR_NO_WALLS_LEFT
+    ERR_WALL_ON_EDGE
+    ERR_WALL_OUT_OF_BOARD
+    ERR_WALL_ALREADY_PLACED
+    ERR_INTERSECTING_WALLS
+    ERR_ROTATION_OUT_OF_BOARD
+    ERR_NOT_ENOUGH_WALLS
+    ERR_INVALID_ACTION_TYPE
+    ERR_ROTATION_BLOCKS_PATH
+    ERR_WALL_BLOCKS_PATH
+
+ERROR_MESSAGES = (
+    "",
+    "out of board: ({x}, {y})",
+    "invalid agent_id: {agent_id}",
+    "cannot move to opponent's position",
+    "cannot move zero blocks",
+    "cannot move more than two blocks",
+    "cannot jump over nothing",
+    "cannot move diagonally",
+    "cannot jump over walls",
+    "cannot diagonally jump if linear jump is possible",
+    "no walls left for agent {agent_id}",
+    "cannot place wall on the edge",
+    "right section out of board",
+    "wall already placed",
+    "cannot create intersecting walls",
+    "rotation region out of board",
+    "less than two walls left for agent {agent_id}",
+    "invalid action_type: {action_type}",
+    "cannot rotate to block all paths",
+    "cannot place wall blocking all paths",
+)
+"""
+Messages for the error codes returned by ``try_step`` and ``is_legal``, indexed by
+code. Code ``0`` means the action is legal.
+"""
+
+
+BOARD_DTYPES = (np.dtype(np.int8), np.dtype(np.uint8), np.dtype(np.int_))
+"""
+Board dtypes the kernels run on as is. Any other board is converted to ``np.int_``
+by ``as_board``.
+"""
+
+
+def as_board(board):
+    """
+    Return ``board`` as an array, converted to ``np.int_`` unless its dtype is one
+    of ``BOARD_DTYPES``.
+    """
+    board = np.asarray(board)
+    if board.dtype in BOARD_DTYPES:
+        return board
+    return board.astype(np.int_)
+
+
+
+def as_mask(out):
+    """
+    Return ``out`` as an array the legal action kernels can write to. One byte
+    arrays, such as boolean ones, are viewed as ``np.uint8``.
+    """
+    if out.dtype.itemsize == 1:
+        return out.view(np.uint8)
+    return out
+
+
+ZOBRIST_CELL_KEYS = np.random.default_rng(0x70756F72).integers(
+    0, 2**64, size=(6, 3, 9, 9), dtype=np.uint64, endpoint=False
+)
+ZOBRIST_CELL_KEYS[:, 0] = 0
+ZOBRIST_WALLS_KEYS = np.random.default_rng(0x69626F72).integers(
+    0, 2**64, size=(2, 64), dtype=np.uint64, endpoint=False
+)
+"""
+Zobrist keys, indexed by ``[channel, value, x, y]`` for board cells and by
+``[agent_id, walls_remaining]`` for the wall budget.
+"""
+ZOBRIST_CELL_KEYS.flags.writeable = False
+ZOBRIST_WALLS_KEYS.flags.writeable = False
+cdef const unsigned long long [:,:,:,:] _cell_keys = ZOBRIST_CELL_KEYS
+cdef const unsigned long long [:,:] _walls_keys = ZOBRIST_WALLS_KEYS
+
+
+def zobrist_hash(board_t[:, :, :] board, long[:] walls_remaining, int board_size):
+    cdef unsigned long long hash
+    with nogil:
+        hash = _zobrist_hash(board, walls_remaining, board_size)
+    return hash
+
+
+def distance_fields(board_t[:, :, :] board, int board_size):
+    """
+    Compute the distance from every cell to the goal row of each agent, ignoring
+    pawns. Returns an array of shape ``(2, board_size, board_size)``, where cells
+    which cannot reach the goal hold ``board_size * board_size``.
+    """
+    fields = np.empty((2, board_size, board_size), dtype=np.int_)
+    cdef long [:,:,:] fields_view = fields
+    cdef WallGraph graph
+    with nogil:
+        graph = wall_graph(board, board_size)
+        wall_graph_distances(&graph, graph.goal0, fields_view[0])
+        wall_graph_distances(&graph, graph.goal1, fields_view[1])
+    return fields
+
+
+def update_distance_fields(
+    board_t[:, :, :] pre_board, board_t[:, :, :] board, long[:, :, :] pre_fields, int board_size
+):
+    """
+    Update the result of ``distance_fields`` for ``pre_board`` to ``board``. Only
+    the cells whose shortest path crosses a changed wall are recomputed.
+    """
+    fields = np.copy(pre_fields)
+    cdef long [:,:,:] fields_view = fields
+    cdef WallGraph old, new
+    with nogil:
+        old = wall_graph(pre_board, board_size)
+        new = wall_graph(board, board_size)
+        wall_graph_update_distances(&old, &new, fields_view[0])
+        wall_graph_update_distances(&old, &new, fields_view[1])
+    return fields
+
+
+def error_message(int code, int agent_id, long[:] action):
+    return ERROR_MESSAGES[code].format(
+        agent_id=agent_id, action_type=action[0], x=action[1], y=action[2]
+    )
 
 
 def fast_step(
-    long[:, :, :] pre_board,
+    board_t[:, :, :] pre_board,
     long[:] pre_walls_remaining,
     int agent_id,
     long[:] action,
-    int board_size
+    int board_size,
+    out=None,
 ):
-    cdef long action_type = action[0]
-    cdef long x = action[1]
-    cdef long y = action[2]
+    code, board, walls_remaining, win, _ = try_step(
+        pre_board, pre_walls_remaining, agent_id, action, board_size, out=out
+    )
+    if code != OK:
+        raise ValueError(error_message(code, agent_id, action))
+    return (board, walls_remaining, win)
 
-    board = np.copy(pre_board)
-    walls_remaining = np.copy(pre_walls_remaining)
 
-    cdef long [:,:,:] board_view = board
+def try_step(
+    board_t[:, :, :] pre_board,
+    long[:] pre_walls_remaining,
+    int agent_id,
+    long[:] action,
+    int board_size,
+    unsigned long long pre_hash = 0,
+    out=None,
+):
+    """
+    Step a copy of the board and walls. If ``out`` is given, the copy is written
+    to its ``(board, walls_remaining)`` arrays instead of new ones, which must not
+    overlap the inputs. The action is fully checked first, so ``out`` is left
+    untouched if it is illegal.
+    """
+    cdef int code, win
+    cdef board_t [:,:,:] scratch_view = None
+    if action[0] == 3:
+        scratch_view = np.empty_like(pre_board)
+    with nogil:
+        code = _check_action(
+            pre_board, pre_walls_remaining, agent_id, action[0], action[1], action[2], board_size
+        )
+        if code == OK:
+            code = _check_action_paths(
+                pre_board, action[0], action[1], action[2], board_size, scratch_view
+            )
+    if code != OK:
+        return (code, None, None, 0, 0)
+
+    if out is None:
+        board = np.copy(pre_board)
+        walls_remaining = np.copy(pre_walls_remaining)
+    else:
+        board, walls_remaining = out
+    cdef board_t [:,:,:] board_view = board
     cdef long [:] walls_remaining_view = walls_remaining
+    if out is not None:
+        board_view[...] = pre_board
+        walls_remaining_view[...] = pre_walls_remaining
+
+    cdef unsigned long long hash
+    with nogil:
+        hash = _apply_action(
+            board_view, walls_remaining_view, agent_id, action[0], action[1], action[2], board_size, pre_hash
+        )
+        win = _check_wins(board_view, board_size)
+    return (OK, board, walls_remaining, win, hash)
 
-    cdef int curpos_x, curpos_y, newpos_x, newpos_y, opppos_x, opppos_y, delpos_x, delpos_y
-    cdef int taxicab_dist, original_jump_pos_x, original_jump_pos_y
 
+def is_legal(
+    board_t[:, :, :] board,
+    long[:] walls_remaining,
+    int agent_id,
+    long[:] action,
+    int board_size
+):
+    cdef int code
+    with nogil:
+        code = _check_action(
+            board, walls_remaining, agent_id, action[0], action[1], action[2], board_size
+        )
+    if code != OK or action[0] == 0:
+        return code
+
+    cdef board_t [:,:,:] scratch = np.copy(board)
+    cdef long [:] scratch_walls = np.copy(walls_remaining)
+    with nogil:
+        _apply_action(scratch, scratch_walls, agent_id, action[0], action[1], action[2], board_size, 0)
+        code = _check_paths(scratch, action[0], board_size)
+    return code
+
+
+cdef int _check_action(
+    board_t [:,:,:] board_view,
+    long [:] walls_remaining_view,
+    int agent_id,
+    long action_type,
+    long x,
+    long y,
+    int board_size,
+) noexcept nogil:
+    """
+    Run every legality check which does not need the action to be applied.
+    """
     if not _check_in_range(x, y, board_size):
-        raise ValueError(f"out of board: {(x, y)}")
+        return ERR_OUT_OF_BOARD
     if not 0 <= agent_id <= 1:
-        raise ValueError(f"invalid agent_id: {agent_id}")
+        return ERR_INVALID_AGENT_ID
 
     if action_type == 0:  # Move piece
-        (curpos_x, curpos_y) = _agent_pos(board_view, agent_id, board_size)
-        (opppos_x, opppos_y) = _agent_pos(board_view, 1-agent_id, board_size)
-        newpos_x = x
-        newpos_y = y
-
-        if newpos_x == opppos_x and newpos_y == opppos_y:
-            raise ValueError("cannot move to opponent's position")
-
-        delpos_x = newpos_x - curpos_x
-        delpos_y = newpos_y - curpos_y
-        taxicab_dist = abs(delpos_x) + abs(delpos_y)
-        if taxicab_dist == 0:
-            raise ValueError("cannot move zero blocks")
-        elif taxicab_dist > 2:
-            raise ValueError("cannot move more than two blocks")
-        elif (
-            taxicab_dist == 2
-            and (delpos_x == 0 or delpos_y == 0)
-            and not (curpos_x + delpos_x / 2 == opppos_x and curpos_y + delpos_y / 2 == opppos_y)
-        ):
-            raise ValueError("cannot jump over nothing")
-
-        if delpos_x and delpos_y:  # If moving diagonally
-            if (curpos_x + delpos_x != opppos_x or curpos_y != opppos_y) and (
-                curpos_x != opppos_x or curpos_y + delpos_y != opppos_y
-            ):
-                # Only diagonal jumps are permitted.
-                # Agents cannot simply move in diagonal direction.
-                raise ValueError("cannot move diagonally")
-            elif _check_wall_blocked(board_view, curpos_x, curpos_y, opppos_x, opppos_y):
-                raise ValueError("cannot jump over walls")
-
-            original_jump_pos_x = curpos_x + 2 * (opppos_x - curpos_x)
-            original_jump_pos_y = curpos_y + 2 * (opppos_y - curpos_y)
-            if _check_in_range(original_jump_pos_x, original_jump_pos_y, board_size) and not _check_wall_blocked(
-                board_view, curpos_x, curpos_y, original_jump_pos_x, original_jump_pos_y
-            ):
-                raise ValueError(
-                    "cannot diagonally jump if linear jump is possible"
-                )
-            elif _check_wall_blocked(board_view, opppos_x, opppos_y, newpos_x, newpos_y):
-                raise ValueError("cannot jump over walls")
-        elif _check_wall_blocked(board_view, curpos_x, curpos_y, newpos_x, newpos_y):
-            raise ValueError("cannot jump over walls")
-
-        board_view[agent_id, curpos_x, curpos_y] = 0
-        board_view[agent_id, newpos_x, newpos_y] = 1
+        return _check_move(board_view, x, y, agent_id, board_size)
 
     elif action_type == 1:  # Place wall horizontally
         if walls_remaining_view[agent_id] == 0:
-            raise ValueError(f"no walls left for agent {agent_id}")
+            return ERR_NO_WALLS_LEFT
         if y == board_size-1:
-            raise ValueError("cannot place wall on the edge")
+            return ERR_WALL_ON_EDGE
         elif x == board_size-1:
-            raise ValueError("right section out of board")
+            return ERR_WALL_OUT_OF_BOARD
         elif board_view[2, x, y] or board_view[2, x+1, y]:
-            raise ValueError("wall already placed")
+            return ERR_WALL_ALREADY_PLACED
         elif board_view[5, x, y]:
-            raise ValueError("cannot create intersecting walls")
-        board_view[2, x, y] = 1 + agent_id
-        board_view[2, x + 1, y] = 1 + agent_id
-        walls_remaining_view[agent_id] -= 1
-        board_view[4, x, y] = 1
+            return ERR_INTERSECTING_WALLS
 
     elif action_type == 2:  # Place wall vertically
         if walls_remaining_view[agent_id] == 0:
-            raise ValueError(f"no walls left for agent {agent_id}")
+            return ERR_NO_WALLS_LEFT
         if x == board_size-1:
-            raise ValueError("cannot place wall on the edge")
+            return ERR_WALL_ON_EDGE
         elif y == board_size-1:
-            raise ValueError("right section out of board")
+            return ERR_WALL_OUT_OF_BOARD
         elif board_view[3, x, y] or board_view[3, x, y+1]:
-            raise ValueError("wall already placed")
+            return ERR_WALL_ALREADY_PLACED
         elif board_view[4, x, y]:
-            raise ValueError("cannot create intersecting walls")
+            return ERR_INTERSECTING_WALLS
+
+    elif action_type == 3:  # Rotate section
+        if not _check_in_range(x, y, bottom_right=board_size-3):
+            return ERR_ROTATION_OUT_OF_BOARD
+        elif walls_remaining_view[agent_id] < 2:
+            return ERR_NOT_ENOUGH_WALLS
+
+    else:
+        return ERR_INVALID_ACTION_TYPE
+
+    return OK
+
+cdef unsigned long long _apply_action(
+    board_t [:,:,:] board_view,
+    long [:] walls_remaining_view,
+    int agent_id,
+    long action_type,
+    long x,
+    long y,
+    int board_size,
+    unsigned long long hash,
+) noexcept nogil:
+    """
+    Apply an action which passed ``_check_action``, in place. Returns ``hash``
+    updated with the Zobrist keys of the changed cells.
+    """
+    cdef int curpos_x, curpos_y
+
+    if action_type == 0:
+        (curpos_x, curpos_y) = _agent_pos(board_view, agent_id, board_size)
+        board_view[agent_id, curpos_x, curpos_y] = 0
+        board_view[agent_id, x, y] = 1
+        return hash ^ _cell_keys[agent_id, 1, curpos_x, curpos_y] ^ _cell_keys[agent_id, 1, x, y]
+
+    hash ^= _walls_key(agent_id, walls_remaining_view[agent_id])
+    if action_type == 1:
+        board_view[2, x, y] = 1 + agent_id
+        board_view[2, x + 1, y] = 1 + agent_id
+        walls_remaining_view[agent_id] -= 1
+        board_view[4, x, y] = 1
+        hash ^= (
+            _cell_keys[2, 1 + agent_id, x, y]
+            ^ _cell_keys[2, 1 + agent_id, x + 1, y]
+            ^ _cell_keys[4, 1, x, y]
+        )
+
+    elif action_type == 2:
         board_view[3, x, y] = 1 + agent_id
         board_view[3, x, y + 1] = 1 + agent_id
         walls_remaining_view[agent_id] -= 1
         board_view[5, x, y] = 1
+        hash ^= (
+            _cell_keys[3, 1 + agent_id, x, y]
+            ^ _cell_keys[3, 1 + agent_id, x, y + 1]
+            ^ _cell_keys[5, 1, x, y]
+        )
 
-    elif action_type == 3:  # Rotate section
-        if not _check_in_range(x, y, bottom_right=board_size-3):
-            raise ValueError("rotation region out of board")
-        elif walls_remaining_view[agent_id] < 2:
-            raise ValueError(f"less than two walls left for agent {agent_id}")
+    else:
+        hash ^= _section_hash(board_view, x, y, board_size)
+        _rotate_section(board_view, x, y, board_size)
+        hash ^= _section_hash(board_view, x, y, board_size)
+        walls_remaining_view[agent_id] -= 2
+
+    return hash ^ _walls_key(agent_id, walls_remaining_view[agent_id])
+
+cdef inline unsigned long long _cell_key(int c, long value, int x, int y) noexcept nogil:
+    if 0 < value < 3:
+        return _cell_keys[c, value, x, y]
+    return 0
+
+cdef inline unsigned long long _walls_key(int agent_id, long walls_remaining) noexcept nogil:
+    if 0 <= walls_remaining < 64:
+        return _walls_keys[agent_id, walls_remaining]
+    return 0
+
+cdef unsigned long long _zobrist_hash(
+    board_t [:,:,:] board_view, long [:] walls_remaining_view, int board_size
+) noexcept nogil:
+    cdef int c, i, j
+    cdef unsigned long long hash = (
+        _walls_key(0, walls_remaining_view[0]) ^ _walls_key(1, walls_remaining_view[1])
+    )
+    for c in range(6):
+        for i in range(board_size):
+            for j in range(board_size):
+                hash ^= _cell_key(c, board_view[c, i, j], i, j)
+    return hash
+
+cdef unsigned long long _section_hash(board_t [:,:,:] board_view, int x, int y, int board_size) noexcept nogil:
+    """
+    Hash the wall cells which ``_rotate_section`` may change, which are the cells
+    copied by ``_restore_section``.
+    """
+    cdef int c, i, j
+    cdef unsigned long long hash = 0
+    for c in range(2, 6):
+        for i in range(max(x - 1, 0), min(x + 4, board_size)):
+            for j in range(max(y - 1, 0), min(y + 4, board_size)):
+                hash ^= _cell_key(c, board_view[c, i, j], i, j)
+    for i in range(board_size):
+        if not x - 1 <= i < x + 4 or y + 4 < board_size:
+            hash ^= _cell_key(2, board_view[2, i, board_size - 1], i, board_size - 1)
+            hash ^= _cell_key(4, board_view[4, i, board_size - 1], i, board_size - 1)
+        if not y - 1 <= i < y + 4 or x + 4 < board_size:
+            hash ^= _cell_key(3, board_view[3, board_size - 1, i], board_size - 1, i)
+            hash ^= _cell_key(5, board_view[5, board_size - 1, i], board_size - 1, i)
+    return hash
 
-        board_rotation(board, board_view, walls_remaining_view, agent_id, board_size, x, y)
+cdef int _check_paths(board_t [:,:,:] board_view, long action_type, int board_size) noexcept nogil:
+    """
+    Check that both agents can still reach their goal after applying an action.
+    """
+    if action_type == 0:
+        return OK
+    cdef int pos0_x, pos0_y, pos1_x, pos1_y
+    (pos0_x, pos0_y) = _agent_pos(board_view, 0, board_size)
+    (pos1_x, pos1_y) = _agent_pos(board_view, 1, board_size)
+    cdef WallGraph graph = wall_graph(board_view, board_size)
+    if wall_graph_paths_exist(&graph, pos0_x, pos0_y, pos1_x, pos1_y):
+        return OK
+    if action_type == 3:
+        return ERR_ROTATION_BLOCKS_PATH
+    return ERR_WALL_BLOCKS_PATH
 
+cdef int _check_action_paths(
+    board_t [:,:,:] board_view,
+    long action_type,
+    long x,
+    long y,
+    int board_size,
+    board_t [:,:,:] scratch_view,
+) noexcept nogil:
+    """
+    Run ``_check_paths`` for an action which passed ``_check_action``, without
+    applying it to ``board_view``. A wall is added to the wall graph of the board,
+    and a rotation is tried on ``scratch_view``, which is overwritten.
+    """
+    if action_type == 0:
+        return OK
+    cdef int c, i, j, pos0_x, pos0_y, pos1_x, pos1_y
+    cdef WallGraph graph
+    (pos0_x, pos0_y) = _agent_pos(board_view, 0, board_size)
+    (pos1_x, pos1_y) = _agent_pos(board_view, 1, board_size)
+    if action_type == 3:
+        for c in range(2, 6):
+            for i in range(board_size):
+                for j in range(board_size):
+                    scratch_view[c, i, j] = board_view[c, i, j]
+        _rotate_section(scratch_view, x, y, board_size)
+        graph = wall_graph(scratch_view, board_size)
+        if wall_graph_paths_exist(&graph, pos0_x, pos0_y, pos1_x, pos1_y):
+            return OK
+        return ERR_ROTATION_BLOCKS_PATH
+    graph = wall_graph(board_view, board_size)
+    if action_type == 1:
+        wall_graph_block(&graph, 2, x, y)
+        wall_graph_block(&graph, 2, x + 1, y)
     else:
-        raise ValueError(f"invalid action_type: {action_type}")
+        wall_graph_block(&graph, 3, x, y)
+        wall_graph_block(&graph, 3, x, y + 1)
+    if wall_graph_paths_exist(&graph, pos0_x, pos0_y, pos1_x, pos1_y):
+        return OK
+    return ERR_WALL_BLOCKS_PATH
+
+cdef void _rotate_section(board_t [:,:,:] board_view, int x, int y, int board_size) noexcept nogil:
+    """
+    Rotate the 4x4 section whose top left cell is ``(x, y)`` clockwise, in place.
+    Walls crossing the border of the section are cut off.
+    """
+    cdef int i, j, cx, cy
+    cdef long hwall[4][5]
+    cdef long vwall[5][4]
+    cdef long hmid[4][5]
+    cdef long vmid[5][4]
 
-    if action_type > 0:
+    # Midpoints on the border of the section lose one half of their wall.
+    for j in range(y - 1, y + 4):
+        if 0 <= j < board_size:
+            if x - 1 >= 0:
+                board_view[4, x - 1, j] = 0
+            if x + 3 < board_size:
+                board_view[4, x + 3, j] = 0
+    for i in range(x - 1, x + 4):
+        if 0 <= i < board_size:
+            if y - 1 >= 0:
+                board_view[5, i, y - 1] = 0
+            if y + 3 < board_size:
+                board_view[5, i, y + 3] = 0
 
-        if not _check_path_exists(board_view, 0, board_size) or not _check_path_exists(board_view, 1, board_size):
-            if action_type == 3:
-                raise ValueError("cannot rotate to block all paths")
+    for i in range(4):
+        for j in range(5):
+            cx = x + i
+            cy = y - 1 + j
+            if _check_in_range(cx, cy, board_size):
+                hwall[i][j] = board_view[2, cx, cy]
+                hmid[i][j] = board_view[4, cx, cy]
+            else:
+                hwall[i][j] = 0
+                hmid[i][j] = 0
+    for i in range(5):
+        for j in range(4):
+            cx = x - 1 + i
+            cy = y + j
+            if _check_in_range(cx, cy, board_size):
+                vwall[i][j] = board_view[3, cx, cy]
+                vmid[i][j] = board_view[5, cx, cy]
             else:
-                raise ValueError("cannot place wall blocking all paths")
+                vwall[i][j] = 0
+                vmid[i][j] = 0
 
-    return (board, walls_remaining, _check_wins(board_view, board_size))
+    for i in range(4):
+        for j in range(5):
+            cx = x + i
+            cy = y - 1 + j
+            if _check_in_range(cx, cy, board_size):
+                board_view[2, cx, cy] = vwall[j][3 - i]
+            cx = x - 1 + i
+            if _check_in_range(cx, cy, board_size):
+                board_view[4, cx, cy] = vmid[j][3 - i]
+    for i in range(5):
+        for j in range(4):
+            cx = x - 1 + i
+            cy = y + j
+            if _check_in_range(cx, cy, board_size):
+                board_view[3, cx, cy] = hwall[j][4 - i]
+                board_view[5, cx, cy] = hmid[j][4 - i]
 
-cdef void board_rotation(
-    board,
-    long [:,:,:] board_view,
-    long [:] walls_remaining_view,
-    int agent_id,
-    int board_size,
-    int x,
-    int y):
-
-    cdef int px, py
-
-    padded_horizontal = np.pad(board[2], 1, constant_values=0)
-    padded_vertical = np.pad(board[3], 1, constant_values=0)
-    padded_horizontal_midpoints = np.pad(board[4], 1, constant_values=0)
-    padded_vertical_midpoints = np.pad(board[5], 1, constant_values=0)
-    px, py = x + 1, y + 1
-    horizontal_region = np.copy(padded_horizontal[px : px + 4, py - 1 : py + 4])
-    vertical_region = np.copy(padded_vertical[px - 1 : px + 4, py : py + 4])
-    padded_horizontal_midpoints[px - 1, py - 1 : py + 4] = 0
-    padded_horizontal_midpoints[px + 3, py - 1 : py + 4] = 0
-    padded_vertical_midpoints[px - 1 : px + 4, py - 1] = 0
-    padded_vertical_midpoints[px - 1 : px + 4, py + 3] = 0
-    horizontal_region_midpoints = np.copy(
-        padded_horizontal_midpoints[px : px + 4, py - 1 : py + 4]
-    )
-    vertical_region_midpoints = np.copy(
-        padded_vertical_midpoints[px - 1 : px + 4, py : py + 4]
-    )
-    horizontal_region_new = np.rot90(vertical_region)
-    vertical_region_new = np.rot90(horizontal_region)
-    horizontal_region_midpoints_new = np.rot90(vertical_region_midpoints)
-    vertical_region_midpoints_new = np.rot90(horizontal_region_midpoints)
-    padded_horizontal[px : px + 4, py - 1 : py + 4] = horizontal_region_new
-    padded_vertical[px - 1 : px + 4, py : py + 4] = vertical_region_new
-    padded_horizontal_midpoints[
-        px - 1 : px + 3, py - 1 : py + 4
-    ] = horizontal_region_midpoints_new
-    padded_vertical_midpoints[
-        px - 1 : px + 4, py : py + 4
-    ] = vertical_region_midpoints_new
-    board[2] = padded_horizontal[1:-1, 1:-1]
-    board[3] = padded_vertical[1:-1, 1:-1]
-    board[4] = padded_horizontal_midpoints[1:-1, 1:-1]
-    board[5] = padded_vertical_midpoints[1:-1, 1:-1]
-    board_view[2, :, board_size-1] = 0
-    board_view[3, board_size-1, :] = 0
-    board_view[4, :, board_size-1] = 0
-    board_view[5, board_size-1, :] = 0
-
-    walls_remaining_view[agent_id] -= 2
-
-    return
-
-cdef int _is_moving_legal(long [:,:,:] board_view, int x, int y, int agent_id, int board_size):
+    for i in range(board_size):
+        board_view[2, i, board_size - 1] = 0
+        board_view[3, board_size - 1, i] = 0
+        board_view[4, i, board_size - 1] = 0
+        board_view[5, board_size - 1, i] = 0
+
+cdef void _restore_section(
+    board_t [:,:,:] src_view, board_t [:,:,:] dst_view, int x, int y, int board_size
+) noexcept nogil:
+    """
+    Undo ``_rotate_section`` on ``dst_view`` by copying every wall cell it may have
+    written back from ``src_view``.
+    """
+    cdef int c, i, j
+    for c in range(2, 6):
+        for i in range(max(x - 1, 0), min(x + 4, board_size)):
+            for j in range(max(y - 1, 0), min(y + 4, board_size)):
+                dst_view[c, i, j] = src_view[c, i, j]
+    for i in range(board_size):
+        dst_view[2, i, board_size - 1] = src_view[2, i, board_size - 1]
+        dst_view[3, board_size - 1, i] = src_view[3, board_size - 1, i]
+        dst_view[4, i, board_size - 1] = src_view[4, i, board_size - 1]
+        dst_view[5, board_size - 1, i] = src_view[5, board_size - 1, i]
+
+cdef int _is_moving_legal(board_t [:,:,:] board_view, int x, int y, int agent_id, int board_size) noexcept nogil:
+    return _check_in_range(x, y, board_size) and _check_move(board_view, x, y, agent_id, board_size) == OK
+
+cdef int _check_move(board_t [:,:,:] board_view, int x, int y, int agent_id, int board_size) noexcept nogil:
     cdef int curpos_x, curpos_y, newpos_x, newpos_y, opppos_x, opppos_y, delpos_x, delpos_y
     cdef int taxicab_dist, original_jump_pos_x, original_jump_pos_y
 
-    if not _check_in_range(x, y, board_size):
-        return 0
-
     (curpos_x, curpos_y) = _agent_pos(board_view, agent_id, board_size)
     (opppos_x, opppos_y) = _agent_pos(board_view, 1-agent_id, board_size)
     newpos_x = x
     newpos_y = y
 
     if newpos_x == opppos_x and newpos_y == opppos_y:
-        return 0
+        return ERR_OPPONENT_POSITION
 
     delpos_x = newpos_x - curpos_x
     delpos_y = newpos_y - curpos_y
     taxicab_dist = abs(delpos_x) + abs(delpos_y)
-    if (
+    if taxicab_dist == 0:
+        return ERR_ZERO_BLOCKS
+    elif taxicab_dist > 2:
+        return ERR_TOO_FAR
+    elif (
         taxicab_dist == 2
         and (delpos_x == 0 or delpos_y == 0)
         and not (curpos_x + delpos_x / 2 == opppos_x and curpos_y + delpos_y / 2 == opppos_y)
     ):
-        return 0
+        return ERR_JUMP_OVER_NOTHING
 
     if delpos_x and delpos_y:  # If moving diagonally
         if (curpos_x + delpos_x != opppos_x or curpos_y != opppos_y) and (
@@ -216,27 +584,511 @@ cdef int _is_moving_legal(long [:,:,:] board_view, int x, int y, int agent_id, i
         ):
             # Only diagonal jumps are permitted.
             # Agents cannot simply move in diagonal direction.
-            return 0
+            return ERR_DIAGONAL
         elif _check_wall_blocked(board_view, curpos_x, curpos_y, opppos_x, opppos_y):
-            return 0
+            return ERR_JUMP_OVER_WALLS
 
         original_jump_pos_x = curpos_x + 2 * (opppos_x - curpos_x)
         original_jump_pos_y = curpos_y + 2 * (opppos_y - curpos_y)
         if _check_in_range(original_jump_pos_x, original_jump_pos_y, board_size) and not _check_wall_blocked(
             board_view, curpos_x, curpos_y, original_jump_pos_x, original_jump_pos_y
         ):
-            return 0
+            return ERR_LINEAR_JUMP_POSSIBLE
         elif _check_wall_blocked(board_view, opppos_x, opppos_y, newpos_x, newpos_y):
-            return 0
+            return ERR_JUMP_OVER_WALLS
     elif _check_wall_blocked(board_view, curpos_x, curpos_y, newpos_x, newpos_y):
-        return 0
+        return ERR_JUMP_OVER_WALLS
 
-    return 1
+    return OK
 
-def legal_actions(state, int agent_id, int board_size):
+def legal_actions(state, int agent_id, int board_size, out=None):
+    """
+    Return the legal actions of ``agent_id``. They are written to ``out`` if it is
+    given, which may be an integer or a boolean array of shape ``(4, 9, 9)``.
+    """
+    if out is None:
+        out = np.zeros((4, 9, 9), dtype=np.int_)
+    _legal_actions(state.board, state.walls_remaining, agent_id, board_size, as_mask(out))
+    return out
+
+
+def _legal_actions(
+    board_t [:,:,:] board_view,
+    long [:] walls_remaining_view,
+    int agent_id,
+    int board_size,
+    mask_t [:,:,:] legal_actions_view,
+):
+    cdef board_t [:,:,:] scratch_view = np.empty_like(board_view)
+    with nogil:
+        legal_actions_view[...] = 0
+        _fill_legal_actions(
+            board_view,
+            walls_remaining_view,
+            agent_id,
+            board_size,
+            legal_actions_view,
+            scratch_view,
+        )
+
+
+def vector_step(
+    board_t [:,:,:,:] boards,
+    long [:,:] walls_remaining,
+    long [:] agent_ids,
+    long [:,:] actions,
+    board_t [:,:,:] initial_board,
+    long [:] initial_walls_remaining,
+    int board_size,
+    long [:] codes,
+    long [:] dones,
+    long [:,:] rewards,
+    long [:,:,:,:] legal_actions,
+    int num_threads = 0,
+):
+    """
+    Step every game of a batch in place, with ``agent_ids[i]`` taking
+    ``actions[i]`` in game ``i``. Every action is checked before any game is
+    changed: the error code of each action is written to ``codes``, and if any of
+    them is illegal, no game is stepped. Finished games are reset to the initial
+    board with agent ``0`` to move. ``legal_actions``, which must be zeroed, is
+    filled for the agent to move next.
+
+    Games are stepped in parallel without the GIL, on ``num_threads`` threads or
+    the OpenMP default if it is ``0``.
+    """
+    cdef Py_ssize_t i, n = boards.shape[0]
+    cdef board_t [:,:,:,:] scratch = np.empty_like(boards)
+    if num_threads > 0:
+        for i in prange(n, nogil=True, schedule="dynamic", num_threads=num_threads):
+            codes[i] = _vector_check(
+                boards[i], walls_remaining[i], agent_ids[i], actions[i], board_size, scratch[i],
+            )
+    else:
+        for i in prange(n, nogil=True, schedule="dynamic"):
+            codes[i] = _vector_check(
+                boards[i], walls_remaining[i], agent_ids[i], actions[i], board_size, scratch[i],
+            )
+    for i in range(n):
+        if codes[i] != OK:
+            return
+
+    if num_threads > 0:
+        for i in prange(n, nogil=True, schedule="dynamic", num_threads=num_threads):
+            _vector_step(
+                boards[i], walls_remaining[i], agent_ids, actions, i, initial_board,
+                initial_walls_remaining, board_size, dones, rewards,
+                legal_actions[i], scratch[i],
+            )
+    else:
+        for i in prange(n, nogil=True, schedule="dynamic"):
+            _vector_step(
+                boards[i], walls_remaining[i], agent_ids, actions, i, initial_board,
+                initial_walls_remaining, board_size, dones, rewards,
+                legal_actions[i], scratch[i],
+            )
+
+
+cdef int _vector_check(
+    board_t [:,:,:] board_view,
+    long [:] walls_remaining_view,
+    int agent_id,
+    long [:] action,
+    int board_size,
+    board_t [:,:,:] scratch_view,
+) noexcept nogil:
+    cdef int code = _check_action(
+        board_view, walls_remaining_view, agent_id, action[0], action[1], action[2], board_size
+    )
+    if code != OK:
+        return code
+    return _check_action_paths(
+        board_view, action[0], action[1], action[2], board_size, scratch_view
+    )
+
+
+cdef void _vector_step(
+    board_t [:,:,:] board_view,
+    long [:] walls_remaining_view,
+    long [:] agent_ids,
+    long [:,:] actions,
+    Py_ssize_t i,
+    board_t [:,:,:] initial_board,
+    long [:] initial_walls_remaining,
+    int board_size,
+    long [:] dones,
+    long [:,:] rewards,
+    long [:,:,:] legal_actions_view,
+    board_t [:,:,:] scratch_view,
+) noexcept nogil:
+    cdef int c, x, y
+    cdef int agent_id = agent_ids[i]
+    _apply_action(
+        board_view,
+        walls_remaining_view,
+        agent_id,
+        actions[i, 0],
+        actions[i, 1],
+        actions[i, 2],
+        board_size,
+        0,
+    )
+
+    if _check_wins(board_view, board_size):
+        dones[i] = 1
+        rewards[i, agent_id] = 1
+        rewards[i, 1 - agent_id] = -1
+        for c in range(board_view.shape[0]):
+            for x in range(board_size):
+                for y in range(board_size):
+                    board_view[c, x, y] = initial_board[c, x, y]
+        walls_remaining_view[0] = initial_walls_remaining[0]
+        walls_remaining_view[1] = initial_walls_remaining[1]
+        agent_ids[i] = 0
+    else:
+        agent_ids[i] = 1 - agent_id
+    _fill_legal_actions(
+        board_view,
+        walls_remaining_view,
+        agent_ids[i],
+        board_size,
+        legal_actions_view,
+        scratch_view,
+    )
+
+
+def batch_legal_actions(
+    board_t [:,:,:,:] boards,
+    long [:,:] walls_remaining,
+    long [:] agent_ids,
+    int board_size,
+    mask_t [:,:,:,:] legal_actions,
+    int num_threads = 0,
+):
+    """
+    Fill ``legal_actions[i]``, which must be zeroed, with the legal actions of
+    ``agent_ids[i]`` in game ``i``. Games are processed in parallel like
+    ``vector_step``.
+    """
+    cdef Py_ssize_t i, n = boards.shape[0]
+    cdef board_t [:,:,:,:] scratch = np.empty_like(boards)
+    if num_threads > 0:
+        for i in prange(n, nogil=True, schedule="dynamic", num_threads=num_threads):
+            _fill_legal_actions(
+                boards[i], walls_remaining[i], agent_ids[i], board_size,
+                legal_actions[i], scratch[i],
+            )
+    else:
+        for i in prange(n, nogil=True, schedule="dynamic"):
+            _fill_legal_actions(
+                boards[i], walls_remaining[i], agent_ids[i], board_size,
+                legal_actions[i], scratch[i],
+            )
+
+
+def batch_check_paths(
+    board_t [:,:,:,:] boards, int board_size, long [:] out, int num_threads = 0
+):
+    """
+    Set ``out[i]`` to ``1`` if both agents can reach their goal rows in game ``i``,
+    and to ``0`` otherwise. Games are processed in parallel like ``vector_step``.
+    """
+    cdef Py_ssize_t i, n = boards.shape[0]
+    if num_threads > 0:
+        for i in prange(n, nogil=True, num_threads=num_threads):
+            out[i] = _check_paths(boards[i], 1, board_size) == OK
+    else:
+        for i in prange(n, nogil=True):
+            out[i] = _check_paths(boards[i], 1, board_size) == OK
+
+
+def expand(
+    board_t [:,:,:] board,
+    long [:] walls_remaining,
+    int agent_id,
+    int board_size,
+    unsigned long long pre_hash = 0,
+):
+    """
+    Generate every legal child of a position in one pass. The legal actions are
+    found once, sharing the pawn lookup and the shortest paths between the wall
+    candidates, and each child is then written straight into a stacked array
+    without checking its action again.
+
+    Returns ``(actions, boards, walls_remaining, dones, hashes)``: the sorted flat
+    indices of the ``K`` legal actions, the child boards of shape ``(K, C, W, H)``
+    in the dtype of ``board``, their walls of shape ``(K, 2)``, whether each child
+    is won by ``agent_id``, and their Zobrist hashes updated from ``pre_hash``.
+    """
+    mask = np.zeros((4, 9, 9), dtype=np.uint8)
+    cdef unsigned char [:,:,:] mask_view = mask
+    cdef board_t [:,:,:] scratch_view = np.empty_like(board)
+    with nogil:
+        _fill_legal_actions(
+            board, walls_remaining, agent_id, board_size, mask_view, scratch_view
+        )
+    actions = np.flatnonzero(mask)
+    cdef Py_ssize_t k, n = len(actions)
+    parent = np.asarray(board)
+    boards = np.empty((n, *parent.shape), dtype=parent.dtype)
+    boards[...] = parent
+    children_walls = np.empty((n, 2), dtype=np.int_)
+    children_walls[...] = walls_remaining
+    dones = np.empty(n, dtype=np.bool_)
+    hashes = np.empty(n, dtype=np.uint64)
+    cdef board_t [:,:,:,:] boards_view = boards
+    cdef long [:,:] walls_view = children_walls
+    cdef unsigned char [:] dones_view = dones.view(np.uint8)
+    cdef unsigned long long [:] hashes_view = hashes
+    cdef const np.intp_t [:] actions_view = actions
+    cdef int action_type, x, y, pos_x, pos_y
+    with nogil:
+        (pos_x, pos_y) = _agent_pos(board, agent_id, board_size)
+        for k in range(n):
+            action_type = actions_view[k] // 81
+            x = actions_view[k] // 9 % 9
+            y = actions_view[k] % 9
+            if action_type == 0:
+                # Moves reuse the pawn position found above.
+                boards_view[k, agent_id, pos_x, pos_y] = 0
+                boards_view[k, agent_id, x, y] = 1
+                hashes_view[k] = (
+                    pre_hash
+                    ^ _cell_keys[agent_id, 1, pos_x, pos_y]
+                    ^ _cell_keys[agent_id, 1, x, y]
+                )
+            else:
+                hashes_view[k] = _apply_action(
+                    boards_view[k], walls_view[k], agent_id, action_type, x, y,
+                    board_size, pre_hash,
+                )
+            dones_view[k] = _check_wins(boards_view[k], board_size)
+    return actions, boards, children_walls, dones, hashes
+
+
+def rollout(
+    board_t [:,:,:] board,
+    long [:] walls_remaining,
+    int to_move,
+    Py_ssize_t n,
+    unsigned long long seed,
+    int max_plies,
+    int board_size = 9,
+    int num_threads = 0,
+):
+    """
+    Play ``n`` games from ``board`` with uniformly random legal actions, starting
+    with ``to_move``, without leaving C. Actions are drawn by rejection sampling:
+    a random candidate is checked with the legality checks of ``try_step`` until
+    one passes. Every game has its own random stream derived from ``seed`` and its
+    index, and games are played in parallel like ``vector_step``, so results only
+    depend on ``seed``.
+
+    Returns ``(winners, lengths)``, arrays of shape ``(n,)`` holding the winner of
+    each game, or ``-1`` if it was cut off after ``max_plies`` actions, and the
+    number of actions taken.
+    """
+    winners = np.empty(n, dtype=np.int_)
+    lengths = np.empty(n, dtype=np.int_)
+    cdef long [:] winners_view = winners
+    cdef long [:] lengths_view = lengths
+    # Each game is played on two int8 buffers, the current position and a scratch
+    # copy which walls are tried on.
+    cdef signed char [:,:,:,:,:] boards = np.empty(
+        (n, 2, board.shape[0], board_size, board_size), dtype=np.int8
+    )
+    cdef long [:,:,:] walls = np.empty((n, 2, 2), dtype=np.int_)
+    cdef Py_ssize_t i
+    if num_threads > 0:
+        for i in prange(n, nogil=True, schedule="dynamic", num_threads=num_threads):
+            _rollout(
+                board, walls_remaining, to_move, seed, i, max_plies, board_size,
+                boards[i], walls[i], winners_view, lengths_view,
+            )
+    else:
+        for i in prange(n, nogil=True, schedule="dynamic"):
+            _rollout(
+                board, walls_remaining, to_move, seed, i, max_plies, board_size,
+                boards[i], walls[i], winners_view, lengths_view,
+            )
+    return winners, lengths
+
+
+cdef void _rollout(
+    board_t [:,:,:] board_view,
+    long [:] walls_remaining_view,
+    int agent_id,
+    unsigned long long seed,
+    Py_ssize_t i,
+    int max_plies,
+    int board_size,
+    signed char [:,:,:,:] boards_view,
+    long [:,:] walls_view,
+    long [:] winners,
+    long [:] lengths,
+) noexcept nogil:
+    cdef unsigned long long state = prng_seed(seed, i)
+    cdef int c, x, y, ply
+    cdef int current = 0
+    for c in range(board_view.shape[0]):
+        for x in range(board_size):
+            for y in range(board_size):
+                boards_view[0, c, x, y] = <signed char>board_view[c, x, y]
+    walls_view[0, 0] = walls_remaining_view[0]
+    walls_view[0, 1] = walls_remaining_view[1]
+
+    winners[i] = -1
+    lengths[i] = 0
+    if _check_wins(boards_view[0], board_size):
+        winners[i] = 1 - agent_id
+        return
+    for ply in range(max_plies):
+        if not _random_action(boards_view, walls_view, &current, agent_id, board_size, &state):
+            lengths[i] = ply
+            return
+        if _check_wins(boards_view[current], board_size):
+            winners[i] = agent_id
+            lengths[i] = ply + 1
+            return
+        agent_id = 1 - agent_id
+    lengths[i] = max_plies
+
+
+cdef int _num_candidates(long walls_remaining, int board_size) noexcept nogil:
+    cdef int wall_cells = (board_size - 1) * (board_size - 1)
+    if walls_remaining < 1:
+        return 25
+    if walls_remaining < 2:
+        return 25 + 2 * wall_cells
+    return 25 + 2 * wall_cells + (board_size - 3) * (board_size - 3)
+
+
+cdef int _try_candidate(
+    signed char [:,:,:,:] boards_view,
+    long [:,:] walls_view,
+    int *current,
+    int agent_id,
+    int pos_x,
+    int pos_y,
+    int k,
+    int board_size,
+    bint commit,
+) noexcept nogil:
+    """
+    Check the legality of candidate action ``k`` on ``boards_view[current[0]]``.
+    If it is legal and ``commit`` is set, play it and point ``current`` to the
+    buffer holding the next position.
+
+    Candidates are numbered in order: the 25 moves within two cells of the agent,
+    horizontal and vertical walls if the agent has walls left, and rotations if it
+    has two.
+    """
+    cdef int action_type, x, y, code
+    cdef int wall_cells = (board_size - 1) * (board_size - 1)
+    cdef int cur = current[0], nxt = 1 - current[0]
+    if k < 25:
+        action_type = 0
+        x = pos_x + k // 5 - 2
+        y = pos_y + k % 5 - 2
+    else:
+        k -= 25
+        if k < 2 * wall_cells:
+            action_type = 1 + k // wall_cells
+            x = (k % wall_cells) // (board_size - 1)
+            y = (k % wall_cells) % (board_size - 1)
+        else:
+            k -= 2 * wall_cells
+            action_type = 3
+            x = k // (board_size - 3)
+            y = k % (board_size - 3)
+
+    code = _check_action(
+        boards_view[cur], walls_view[cur], agent_id, action_type, x, y, board_size
+    )
+    if code != OK:
+        return code
+    if action_type == 0:
+        # Moves passing ``_check_action`` are legal, and are played in place.
+        if commit:
+            _apply_action(
+                boards_view[cur], walls_view[cur], agent_id, action_type, x, y,
+                board_size, 0,
+            )
+        return OK
+
+    boards_view[nxt, :, :, :] = boards_view[cur]
+    walls_view[nxt, :] = walls_view[cur]
+    _apply_action(
+        boards_view[nxt], walls_view[nxt], agent_id, action_type, x, y, board_size, 0
+    )
+    code = _check_paths(boards_view[nxt], action_type, board_size)
+    if code == OK and commit:
+        current[0] = nxt
+    return code
+
+
+cdef bint _random_action(
+    signed char [:,:,:,:] boards_view,
+    long [:,:] walls_view,
+    int *current,
+    int agent_id,
+    int board_size,
+    unsigned long long *state,
+) noexcept nogil:
+    """
+    Play a uniformly random legal action of ``agent_id``. Candidates are drawn
+    uniformly from a superset of the legal actions and rejected until one is legal.
+    If that keeps failing, the legal candidates are counted and one of them is
+    picked directly. Returns ``False`` if there is no legal action.
+    """
+    cdef int pos_x, pos_y, k, count, tries
+    (pos_x, pos_y) = _agent_pos(boards_view[current[0]], agent_id, board_size)
+    cdef int size = _num_candidates(walls_view[current[0], agent_id], board_size)
+    for tries in range(4 * size):
+        k = prng_below(state, size)
+        if _try_candidate(
+            boards_view, walls_view, current, agent_id, pos_x, pos_y, k, board_size, 1
+        ) == OK:
+            return True
+
+    count = 0
+    for k in range(size):
+        if _try_candidate(
+            boards_view, walls_view, current, agent_id, pos_x, pos_y, k, board_size, 0
+        ) == OK:
+            count += 1
+    if count == 0:
+        return False
+    count = prng_below(state, count)
+    for k in range(size):
+        if _try_candidate(
+            boards_view, walls_view, current, agent_id, pos_x, pos_y, k, board_size, 0
+        ) == OK:
+            if count == 0:
+                _try_candidate(
+                    boards_view, walls_view, current, agent_id, pos_x, pos_y, k,
+                    board_size, 1,
+                )
+                return True
+            count -= 1
+    return False
+
+
+cdef void _fill_legal_actions(
+    board_t [:,:,:] board_view,
+    long [:] walls_remaining_view,
+    int agent_id,
+    int board_size,
+    mask_t [:,:,:] legal_actions_np_view,
+    board_t [:,:,:] scratch_view,
+) noexcept nogil:
+    """
+    Set the legal actions of ``agent_id`` in ``legal_actions_np_view``, which must
+    be zeroed. ``scratch_view`` is overwritten while trying rotations.
+    """
     cdef int dir_id, action_type, next_pos_x, next_pos_y, cx, cy, nowpos_x, nowpos_y
+    cdef int pos0_x, pos0_y, pos1_x, pos1_y, c
     cdef int directions[12][2]
-    cdef long [:,:,:] board_view = state.board
 
     directions[0][:] = [0, -2]
     directions[1][:] = [-1, -1]
@@ -251,8 +1103,6 @@ def legal_actions(state, int agent_id, int board_size):
     directions[10][:] = [1, 1]
     directions[11][:] = [0, 2]
 
-    legal_actions_np = np.zeros((4, 9, 9), dtype=np.int_)
-    cdef long [:,:,:] legal_actions_np_view = legal_actions_np
     (nowpos_x, nowpos_y) = _agent_pos(board_view, agent_id, board_size)
 
     for dir_id in range(12):
@@ -260,88 +1110,108 @@ def legal_actions(state, int agent_id, int board_size):
         next_pos_y = nowpos_y + directions[dir_id][1]
         if _is_moving_legal(board_view, next_pos_x, next_pos_y, agent_id, board_size):
             legal_actions_np_view[0, next_pos_x, next_pos_y] = 1
+
+    if walls_remaining_view[agent_id] == 0:
+        return
+
+    # Every wall candidate is tried on a copy of this graph, which takes a few word
+    # operations instead of touching the board.
+    cdef WallGraph graph = wall_graph(board_view, board_size)
+    (pos0_x, pos0_y) = _agent_pos(board_view, 0, board_size)
+    (pos1_x, pos1_y) = _agent_pos(board_view, 1, board_size)
+    # Only candidates cutting one of these paths need the path check.
+    cdef PathEdges path = wall_graph_shortest_paths(&graph, pos0_x, pos0_y, pos1_x, pos1_y)
+
     for action_type in range(1, 3):
         for cx in range(board_size-1):
             for cy in range(board_size-1):
-                try:
-                    fast_step(state.board, state.walls_remaining, agent_id,
-                              np.array([action_type, cx, cy], dtype=np.int_), board_size)
-                except:
-                    ...
-                else:
-                    legal_actions_np_view[action_type, cx, cy] = 1
+                legal_actions_np_view[action_type, cx, cy] = _is_wall_legal(
+                    board_view, &graph, &path, action_type, cx, cy,
+                    pos0_x, pos0_y, pos1_x, pos1_y,
+                )
+
+    if walls_remaining_view[agent_id] < 2:
+        return
+
+    # Every rotation candidate is tried on this single scratch board and reverted
+    # right after, instead of copying the board for each candidate.
+    for c in range(2, 6):
+        for cx in range(board_size):
+            for cy in range(board_size):
+                scratch_view[c, cx, cy] = board_view[c, cx, cy]
+    cdef Bits path_cells = bits_or(path.py, path.px)
+
     for cx in range(board_size-3):
         for cy in range(board_size-3):
-            try:
-                fast_step(state.board, state.walls_remaining, agent_id,
-                          np.array([3, cx, cy], dtype=np.int_), board_size)
-            except:
-                ...
-            else:
+            # A rotation only rewrites walls near its section. If neither path uses
+            # an edge there, both stay open.
+            if not _path_in_section(path_cells, cx, cy, board_size):
                 legal_actions_np_view[3, cx, cy] = 1
-    return legal_actions_np
-
-cdef int _check_in_range(int pos_x, int pos_y, int bottom_right = 9):
-    return (0 <= pos_x < bottom_right and 0 <= pos_y < bottom_right)
+                continue
+            _rotate_section(scratch_view, cx, cy, board_size)
+            graph = wall_graph(scratch_view, board_size)
+            legal_actions_np_view[3, cx, cy] = wall_graph_paths_exist(
+                &graph, pos0_x, pos0_y, pos1_x, pos1_y
+            )
+            _restore_section(board_view, scratch_view, cx, cy, board_size)
 
-cdef int _check_path_exists(long [:,:,:] board_view, int agent_id, int board_size):
-    cdef int pos_x, pos_y
+cdef bint _path_in_section(Bits path_cells, int x, int y, int board_size) noexcept nogil:
+    """
+    Check whether any of ``path_cells`` is a wall cell that ``_rotate_section`` may
+    write for the section whose top left cell is ``(x, y)``.
+    """
     cdef int i, j
-    cdef int cnt = 0, tail = 0
-    cdef int there_x, there_y
-    cdef int goal = (1-agent_id) * 8
-    cdef int queue_x[81]
-    cdef int queue_y[81]
-    cdef int visited[81][81]
-    cdef int directions[4][2]
-
-    for i in range(9):
-        for j in range(9):
-            visited[i][j] = 0
-
-    if agent_id:
-        directions[0][:] = [0, -1]
-        directions[1][:] = [1, 0]
-        directions[2][:] = [-1, 0]
-        directions[3][:] = [0, 1]
+    for i in range(max(x - 1, 0), min(x + 4, board_size)):
+        for j in range(max(y - 1, 0), min(y + 4, board_size)):
+            if bits_test(path_cells, i * board_size + j):
+                return True
+    return False
+
+cdef int _is_wall_legal(
+    board_t [:,:,:] board_view,
+    WallGraph *graph,
+    PathEdges *path,
+    int action_type,
+    int x,
+    int y,
+    int pos0_x,
+    int pos0_y,
+    int pos1_x,
+    int pos1_y,
+) noexcept nogil:
+    """
+    Check whether a wall can be placed at ``(x, y)``, assuming the wall budget is
+    already checked. The path check runs on a copy of ``graph`` with the wall
+    added.
+    """
+    cdef int plane, dx, dy
+    if action_type == 1:
+        plane, dx, dy = 2, 1, 0
+        if board_view[5, x, y]:
+            return 0
     else:
-        directions[0][:] = [0, 1]
-        directions[1][:] = [1, 0]
-        directions[2][:] = [-1, 0]
-        directions[3][:] = [0, -1]
-
-    (pos_x, pos_y) = _agent_pos(board_view, agent_id, board_size)
-    if pos_y == goal:   return 1
-
-    queue_x[tail] = pos_x
-    queue_y[tail] = pos_y
-    tail += 1
-    visited[pos_x][pos_y] = 1
-
-    for i in range(board_size * board_size):
-        if cnt == tail: break
-        pos_x = queue_x[cnt]
-        pos_y = queue_y[cnt]
-        cnt += 1
-        for j in range(4):
-            there_x = pos_x + directions[j][0]
-            there_y = pos_y + directions[j][1]
-            if not (0 <= there_x < board_size and 0 <= there_y < board_size):
-                continue
-            if visited[there_x][there_y]:
-                continue
-            if _check_wall_blocked(board_view, pos_x, pos_y, there_x, there_y):
-                continue
-            if there_y == goal:
-                return 1
-            visited[there_x][there_y] = 1
-            queue_x[tail] = there_x
-            queue_y[tail] = there_y
-            tail += 1
+        plane, dx, dy = 3, 0, 1
+        if board_view[4, x, y]:
+            return 0
+    if board_view[plane, x, y] or board_view[plane, x + dx, y + dy]:
+        return 0
 
-    return 0
+    # A wall which cuts neither shortest path leaves both of them open.
+    if not (
+        wall_graph_on_path(path, plane, x, y, graph.board_size)
+        or wall_graph_on_path(path, plane, x + dx, y + dy, graph.board_size)
+    ):
+        return 1
 
-cdef int _check_wall_blocked(long [:,:,:] board_view, int cx, int cy, int nx, int ny):
+    cdef WallGraph blocked = graph[0]
+    wall_graph_block(&blocked, plane, x, y)
+    wall_graph_block(&blocked, plane, x + dx, y + dy)
+    return wall_graph_paths_exist(&blocked, pos0_x, pos0_y, pos1_x, pos1_y)
+
+cdef int _check_in_range(int pos_x, int pos_y, int bottom_right = 9) noexcept nogil:
+    return (0 <= pos_x < bottom_right and 0 <= pos_y < bottom_right)
+
+cdef int _check_wall_blocked(board_t [:,:,:] board_view, int cx, int cy, int nx, int ny) noexcept nogil:
     cdef int i
     if nx > cx:
         for i in range(cx, nx):
@@ -365,7 +1235,7 @@ cdef int _check_wall_blocked(long [:,:,:] board_view, int cx, int cy, int nx, in
         return 0
     return 0
 
-cdef int _check_wins(long [:,:,:] board_view, int board_size):
+cdef int _check_wins(board_t [:,:,:] board_view, int board_size) noexcept nogil:
     cdef int i
     for i in range(board_size):
         if board_view[0, i, board_size-1]:
@@ -374,10 +1244,135 @@ cdef int _check_wins(long [:,:,:] board_view, int board_size):
             return 1
     return 0
 
-cdef (int, int) _agent_pos(long [:,:,:] board_view, int agent_id, int board_size):
+cdef (int, int) _agent_pos(board_t [:,:,:] board_view, int agent_id, int board_size) noexcept nogil:
     cdef int i, j
     for i in range(board_size):
         for j in range(board_size):
             if board_view[agent_id, i, j]:
                 return (i, j)
     return (-1, -1)
+
+cdef class PuoriborSearchState:
+    """
+    Mutable game state for tree search. Actions are applied to ``board`` and
+    ``walls_remaining`` in place and recorded on an undo stack, so searching does not
+    allocate a new state for every node.
+    """
+
+    cdef readonly object board
+    cdef readonly object walls_remaining
+    cdef readonly int board_size
+    cdef readonly bint done
+    cdef readonly int ply
+    cdef readonly unsigned long long hash
+    cdef long [:,:,:] board_view
+    cdef long [:] walls_remaining_view
+    cdef object history
+    cdef long [:,:] history_view
+    cdef object sections
+    cdef long [:,:,:,:] sections_view
+
+    def __init__(self, board, walls_remaining, bint done=False, int board_size=9, int capacity=64):
+        self.board = np.array(board, dtype=np.int_)
+        self.walls_remaining = np.array(walls_remaining, dtype=np.int_)
+        self.board_view = self.board
+        self.walls_remaining_view = self.walls_remaining
+        self.board_size = board_size
+        self.done = done
+        self.ply = 0
+        self.hash = _zobrist_hash(self.board_view, self.walls_remaining_view, board_size)
+        self.history = np.zeros((capacity, 7), dtype=np.int_)
+        self.history_view = self.history
+        self.sections = np.zeros((capacity, 6, board_size, board_size), dtype=np.int_)
+        self.sections_view = self.sections
+
+    cdef void _reserve(self):
+        if self.ply < self.history_view.shape[0]:
+            return
+        self.history = np.concatenate([self.history, np.zeros_like(self.history)])
+        self.history_view = self.history
+        self.sections = np.concatenate([self.sections, np.zeros_like(self.sections)])
+        self.sections_view = self.sections
+
+    cpdef int apply(self, int agent_id, long action_type, long x, long y):
+        """
+        Apply an action in place. Returns ``0`` if the action was applied, or the
+        error code from ``ERROR_MESSAGES`` if it is illegal, in which case the state
+        is left untouched.
+        """
+        cdef int code = _check_action(
+            self.board_view, self.walls_remaining_view, agent_id, action_type, x, y, self.board_size
+        )
+        if code != OK:
+            return code
+
+        cdef int curpos_x, curpos_y
+        self._reserve()
+        cdef long [:] entry = self.history_view[self.ply]
+        entry[0] = agent_id
+        entry[1] = action_type
+        entry[2] = x
+        entry[3] = y
+        entry[4] = self.done
+        entry[6] = <long>self.hash
+        if action_type == 0:
+            (curpos_x, curpos_y) = _agent_pos(self.board_view, agent_id, self.board_size)
+            entry[5] = curpos_x * self.board_size + curpos_y
+        elif action_type == 3:
+            _restore_section(self.board_view, self.sections_view[self.ply], x, y, self.board_size)
+        self.ply += 1
+
+        self.hash = _apply_action(
+            self.board_view, self.walls_remaining_view, agent_id, action_type, x, y, self.board_size, self.hash
+        )
+        code = _check_paths(self.board_view, action_type, self.board_size)
+        if code != OK:
+            self.undo()
+            return code
+        self.done = _check_wins(self.board_view, self.board_size)
+        return OK
+
+    cpdef void undo(self) except *:
+        """
+        Revert the most recently applied action.
+        """
+        if self.ply == 0:
+            raise IndexError("no action to undo")
+        self.ply -= 1
+        cdef long [:] entry = self.history_view[self.ply]
+        cdef int agent_id = entry[0]
+        cdef long action_type = entry[1]
+        cdef long x = entry[2]
+        cdef long y = entry[3]
+        self.done = entry[4]
+        self.hash = <unsigned long long>entry[6]
+
+        if action_type == 0:
+            self.board_view[agent_id, x, y] = 0
+            self.board_view[agent_id, entry[5] // self.board_size, entry[5] % self.board_size] = 1
+        elif action_type == 1:
+            self.board_view[2, x, y] = 0
+            self.board_view[2, x + 1, y] = 0
+            self.board_view[4, x, y] = 0
+            self.walls_remaining_view[agent_id] += 1
+        elif action_type == 2:
+            self.board_view[3, x, y] = 0
+            self.board_view[3, x, y + 1] = 0
+            self.board_view[5, x, y] = 0
+            self.walls_remaining_view[agent_id] += 1
+        else:
+            _restore_section(self.sections_view[self.ply], self.board_view, x, y, self.board_size)
+            self.walls_remaining_view[agent_id] += 2
+
+    def to_state(self):
+        """
+        Copy the current position into a new ``PuoriborState``.
+        """
+        from .puoribor import PuoriborState
+
+        return PuoriborState(
+            board=np.copy(self.board),
+            walls_remaining=np.copy(self.walls_remaining),
+            done=bool(self.done),
+            hash=self.hash,
+        )
@@ -12,11 +12,11 @@ Directions
 from __future__ import annotations
 
 import sys
-from dataclasses import dataclass
-from typing import Callable, Deque, Dict, Optional
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, NamedTuple, Optional, Tuple
 
 import numpy as np
-from numpy.typing import ArrayLike, NDArray
+from numpy.typing import ArrayLike, DTypeLike, NDArray
 
 if sys.version_info < (3, 10):
     from typing_extensions import TypeAlias
@@ -24,13 +24,26 @@ else:
     from typing import TypeAlias
 
 from fights.base import BaseEnv, BaseState
-from fights.envs.quoridor_cython import fast_legal_actions, fast_step
+from fights.envs.quoridor_cython import (
+    BOARD_DTYPES,
+    QuoridorSearchState,
+    as_board,
+    distance_fields,
+    error_message,
+    expand,
+    fast_legal_actions,
+    is_legal,
+    try_step,
+    update_distance_fields,
+    zobrist_hash,
+)
 
 QuoridorAction: TypeAlias = ArrayLike
 """
 Alias of :obj:`ArrayLike` to describe the action type.
 Encoded as an array of shape ``(3,)``, in the form of
-[ `action_type`, `coordinate_x`, `coordinate_y` ].
+[ `action_type`, `coordinate_x`, `coordinate_y` ], or as a flat action index
+(see :data:`ACTIONS`).
 `action_type`
     - 0 (move piece)
     - 1 (place wall horizontally)
@@ -41,6 +54,222 @@ Encoded as an array of shape ``(3,)``, in the form of
 """
 
 
+def _perspective_tables(board_size: int) -> Tuple[NDArray[np.intp], NDArray[np.intp]]:
+    # Rotate by 180 degrees. Wall cells are anchored at their top left end, so
+    # those planes also shift by one cell, leaving an empty row or column.
+    cells = np.arange(4 * board_size * board_size).reshape(4, board_size, board_size)
+    gather = np.full_like(cells, -1)
+    gather[0] = cells[1, ::-1, ::-1]
+    gather[1] = cells[0, ::-1, ::-1]
+    gather[2, :, :-1] = cells[2, ::-1, -2::-1]
+    gather[3, :-1] = cells[3, -2::-1, ::-1]
+    # Each cell looks up its new label in a row of ``_PERSPECTIVE_LABELS``: cleared,
+    # unchanged, or with the wall labels 1 and 2 swapped.
+    rows = np.ones_like(cells)
+    rows[2:4] = 2
+    rows[gather < 0] = 0
+    return np.maximum(gather, 0), rows * 3
+
+
+_PERSPECTIVE_INDEX, _PERSPECTIVE_ROWS = _perspective_tables(9)
+_PERSPECTIVE_LABELS = np.array([0, 0, 0, 0, 1, 2, 0, 2, 1])
+
+
+def rotate_boards(
+    boards: NDArray[np.int_], out: Optional[NDArray[np.int_]] = None
+) -> NDArray[np.int_]:
+    """
+    Rotate boards to the view of the other agent, as
+    :meth:`QuoridorState.perspective` does for agent 1. The transformation is a
+    precomputed gather of board cells followed by a relabelling of walls, so
+    batches are rotated in one call.
+
+    :arg boards:
+        A board of shape ``(4, 9, 9)``, or a batch of boards of shape
+        ``(..., 4, 9, 9)``.
+
+    :arg out:
+        Optional array of the shape and data type of ``boards`` to write the result
+        to. It must not overlap ``boards``.
+
+    :returns:
+        The rotated boards.
+    """
+    boards = np.asarray(boards)
+    cells = np.take(boards.reshape(*boards.shape[:-3], -1), _PERSPECTIVE_INDEX, axis=-1)
+    # Row offsets are below 9, so they fit any board data type.
+    np.add(cells, _PERSPECTIVE_ROWS, out=cells, casting="unsafe")
+    return np.take(_PERSPECTIVE_LABELS.astype(boards.dtype), cells, out=out)
+
+
+def _agent_frame_table(board_size: int) -> NDArray[np.intp]:
+    # Pieces move to the rotated cell. Walls span two cells, so they are anchored
+    # at the rotated cell of their other end. Actions which are never legal, like
+    # walls on the last row, are kept in place.
+    actions = np.arange(3 * board_size * board_size).reshape(3, board_size, board_size)
+    table = actions.copy()
+    table[0] = actions[0, ::-1, ::-1]
+    table[1:, :-1, :-1] = actions[1:, -2::-1, -2::-1]
+    return table.reshape(-1)
+
+
+_ACTIONS_SHAPE = (3, 9, 9)
+NUM_ACTIONS = int(np.prod(_ACTIONS_SHAPE))
+"""
+Number of flat action indices. The flat index of an action is the index of its
+cell in a legal actions array of shape ``(3, 9, 9)`` flattened in C order.
+"""
+
+ACTIONS = np.stack(np.unravel_index(np.arange(NUM_ACTIONS), _ACTIONS_SHAPE), axis=1)
+"""
+Decode table of flat actions, of shape ``(NUM_ACTIONS, 3)``. Row ``i`` is the
+action with flat index ``i``.
+"""
+
+
+def encode_actions(actions: QuoridorAction) -> NDArray[np.intp]:
+    """
+    Encode actions as flat indices.
+
+    :arg actions:
+        An action, or a batch of actions of shape ``(..., 3)``.
+
+    :returns:
+        The flat indices of the actions. A :obj:`ValueError` is raised if an action
+        is out of range.
+    """
+    actions = np.asarray(actions, dtype=np.int_)
+    return np.ravel_multi_index(np.moveaxis(actions, -1, 0), _ACTIONS_SHAPE)
+
+
+def decode_actions(indices: ArrayLike) -> NDArray[np.int_]:
+    """
+    Decode flat indices to actions with :data:`ACTIONS`.
+
+    :arg indices:
+        A flat index, or an array of them.
+
+    :returns:
+        The actions, of shape ``(..., 3)``. A :obj:`ValueError` is raised if an index is
+        out of range.
+    """
+    indices = np.asarray(indices, dtype=np.intp)
+    if indices.size and (indices.min() < 0 or indices.max() >= NUM_ACTIONS):
+        raise ValueError(f"action index out of range: {indices}")
+    return ACTIONS[indices]
+
+
+def _action_array(action: QuoridorAction) -> NDArray[np.int_]:
+    # Flat indices are decoded. Out of range indices become an invalid action, which
+    # the kernels reject like any other illegal action.
+    action_np = np.asarray(action, dtype=np.int_)
+    if action_np.ndim:
+        return action_np
+    if 0 <= action_np < NUM_ACTIONS:
+        return ACTIONS[action_np]
+    return np.array([-1, 0, 0])
+
+
+AGENT_FRAME_ACTIONS = _agent_frame_table(9)
+"""
+Remap table of actions between the absolute frame and the frame of agent 1, where
+actions are numbered by their cell in a legal actions array of shape ``(3, 9, 9)``.
+Entry ``i`` is the number of action ``i`` in the other frame. The table is its
+own inverse, and the frame of agent 0 is the absolute one.
+"""
+
+
+def _for_agents(
+    rotated: NDArray[Any], original: NDArray[Any], agent_id: ArrayLike
+) -> NDArray[Any]:
+    agent_id = np.asarray(agent_id)
+    if agent_id.ndim == 0:
+        return rotated if agent_id == 1 else original
+    mask = (agent_id == 1).reshape(
+        agent_id.shape + (1,) * (rotated.ndim - agent_id.ndim)
+    )
+    return np.where(mask, rotated, original)
+
+
+def to_agent_frame(actions: QuoridorAction, agent_id: ArrayLike) -> NDArray[np.int_]:
+    """
+    Translate actions from absolute coordinates to the frame of the board returned
+    by :meth:`QuoridorState.perspective`, using :data:`AGENT_FRAME_ACTIONS`.
+
+    :arg actions:
+        An action, or a batch of actions of shape ``(..., 3)``.
+
+    :arg agent_id:
+        ID of the agent, or IDs of the agents of every action in the batch.
+
+    :returns:
+        The actions in the frame of the agents.
+    """
+    actions = np.asarray(actions, dtype=np.int_)
+    rotated = ACTIONS[AGENT_FRAME_ACTIONS[encode_actions(actions)]]
+    return _for_agents(rotated, actions, agent_id)
+
+
+def from_agent_frame(actions: QuoridorAction, agent_id: ArrayLike) -> NDArray[np.int_]:
+    """
+    Translate actions from the frame of the agents back to absolute coordinates,
+    reversing :func:`to_agent_frame`.
+
+    :arg actions:
+        An action, or a batch of actions of shape ``(..., 3)``.
+
+    :arg agent_id:
+        ID of the agent, or IDs of the agents of every action in the batch.
+
+    :returns:
+        The actions in absolute coordinates.
+    """
+    return to_agent_frame(actions, agent_id)
+
+
+def legal_actions_to_agent_frame(
+    legal_actions: NDArray[np.generic], agent_id: ArrayLike
+) -> NDArray[np.generic]:
+    """
+    Translate legal action masks, or any per-action values like policies, to the
+    frame of the agents.
+
+    :arg legal_actions:
+        An array of shape ``(3, 9, 9)``, or a batch of shape ``(..., 3, 9, 9)``.
+
+    :arg agent_id:
+        ID of the agent, or IDs of the agents of every mask in the batch.
+
+    :returns:
+        The masks in the frame of the agents.
+    """
+    legal_actions = np.asarray(legal_actions)
+    batch_shape = legal_actions.shape[: -len(_ACTIONS_SHAPE)]
+    rotated = np.take(
+        legal_actions.reshape(*batch_shape, -1), AGENT_FRAME_ACTIONS, axis=-1
+    ).reshape(legal_actions.shape)
+    return _for_agents(rotated, legal_actions, agent_id)
+
+
+def legal_actions_from_agent_frame(
+    legal_actions: NDArray[np.generic], agent_id: ArrayLike
+) -> NDArray[np.generic]:
+    """
+    Translate masks from the frame of the agents back to absolute coordinates,
+    reversing :func:`legal_actions_to_agent_frame`.
+
+    :arg legal_actions:
+        An array of shape ``(3, 9, 9)``, or a batch of shape ``(..., 3, 9, 9)``.
+
+    :arg agent_id:
+        ID of the agent, or IDs of the agents of every mask in the batch.
+
+    :returns:
+        The masks in absolute coordinates.
+    """
+    return legal_actions_to_agent_frame(legal_actions, agent_id)
+
+
 @dataclass
 class QuoridorState(BaseState):
     """
@@ -50,7 +279,7 @@ class QuoridorState(BaseState):
     board: NDArray[np.int_]
     """
     Array of shape ``(C, W, H)``, where C is channel index and W, H is board width,
-    height.
+    height. Its data type is ``np.int_``, ``np.int8`` or ``np.uint8``.
     Channels
         - ``C = 0``: one-hot encoded position of agent 0. (starts from top)
         - ``C = 1``: one-hot encoded position of agent 1. (starts from bottom)
@@ -71,6 +300,71 @@ class QuoridorState(BaseState):
     Boolean value indicating whether the game is done.
     """
 
+    hash: int = field(default=None, repr=False)  # type: ignore
+    """
+    64-bit Zobrist hash of ``board`` and ``walls_remaining``. Computed from scratch
+    when not given, and updated incrementally by :meth:`QuoridorEnv.step`.
+    Recompute it with :meth:`rehash` after modifying the arrays in place.
+    """
+
+    distances: Optional[NDArray[np.int_]] = field(
+        default=None, repr=False, compare=False
+    )
+    """
+    Optional array of shape ``(2, W, H)``, where ``distances[agent_id, x, y]`` is
+    the number of steps from ``(x, y)`` to the goal of ``agent_id``, ignoring
+    pawns. Cells which cannot reach the goal hold ``W * H``. Computed by
+    :meth:`distance_to_goal` on first use, and then updated incrementally by
+    :meth:`QuoridorEnv.step`.
+    """
+
+    def __post_init__(self) -> None:
+        if self.hash is None:
+            self.rehash()
+
+    def rehash(self) -> int:
+        """
+        Recompute :attr:`hash` from scratch.
+
+        :returns:
+            The recomputed hash.
+        """
+        board = as_board(self.board)
+        self.hash = zobrist_hash(
+            board, np.asarray(self.walls_remaining, dtype=np.int_), board.shape[1]
+        )
+        return self.hash
+
+    def distance_to_goal(self, agent_id: int) -> int:
+        """
+        Return the length of the shortest path of an agent to its goal, ignoring
+        the opponent pawn.
+
+        :arg agent_id:
+            ID of the agent. (``0`` or ``1``)
+
+        :returns:
+            The number of steps, looked up in :attr:`distances`.
+        """
+        if self.distances is None:
+            board = as_board(self.board)
+            self.distances = distance_fields(board, board.shape[1])
+        x, y = divmod(int(np.argmax(self.board[agent_id])), self.board.shape[2])
+        return int(self.distances[agent_id, x, y])
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, QuoridorState):
+            return NotImplemented
+        return (
+            self.hash == other.hash
+            and self.done == other.done
+            and np.array_equal(self.board, other.board)
+            and np.array_equal(self.walls_remaining, other.walls_remaining)
+        )
+
+    def __hash__(self) -> int:
+        return self.hash
+
     def __str__(self) -> str:
         """
         Generate a human-readable string representation of the board.
@@ -130,39 +424,29 @@ class QuoridorState(BaseState):
 
         return result
 
-    def perspective(self, agent_id: int) -> NDArray[np.int_]:
+    def perspective(
+        self, agent_id: int, out: Optional[NDArray[np.int_]] = None
+    ) -> NDArray[np.int_]:
         """
         Return board where specified agent with ``agent_id`` is on top.
         :arg agent_id:
             The ID of agent to use as base.
+        :arg out:
+            Optional array of the shape and data type of ``board`` to write the
+            result to.
         :returns:
             A rotated ``board`` array. The board's channel 0 will contain position of
             agent of id ``agent_id``, and channel 1 will contain the opponent's
             position. In channel 2 and 3, walles labeled with 1 are set by agent of id
-            ``agent_id``, and the others are set by the opponent.
+            ``agent_id``, and the others are set by the opponent. This is ``board``
+            itself for agent 0 if ``out`` is not given.
         """
-        if agent_id == 0:
+        if agent_id != 0:
+            return rotate_boards(self.board, out=out)
+        if out is None:
             return self.board
-        inverted_walls = (self.board[2:4] == 2).astype(np.int_) + (
-            self.board[2:4] == 1
-        ).astype(np.int_) * 2
-        rotated = np.stack(
-            [
-                np.rot90(self.board[1], 2),
-                np.rot90(self.board[0], 2),
-                np.pad(
-                    np.rot90(inverted_walls[0], 2)[:, 1:],
-                    ((0, 0), (0, 1)),
-                    constant_values=0,
-                ),
-                np.pad(
-                    np.rot90(inverted_walls[1], 2)[1:],
-                    ((0, 1), (0, 0)),  # type: ignore
-                    constant_values=0,
-                ),
-            ]
-        )
-        return rotated
+        out[...] = self.board
+        return out
 
     def to_dict(self) -> Dict:
         """
@@ -192,6 +476,56 @@ class QuoridorState(BaseState):
         )
 
 
+class QuoridorChildren(NamedTuple):
+    """
+    ``QuoridorChildren`` holds every legal child of a state, as generated by
+    :meth:`QuoridorEnv.expand`. Child ``k`` is stored at index ``k`` of every array.
+    """
+
+    actions: NDArray[np.intp]
+    """
+    Sorted flat indices of the legal actions (see :data:`ACTIONS`), of shape
+    ``(K,)``.
+    """
+
+    boards: NDArray[np.int_]
+    """
+    Child boards of shape ``(K, C, W, H)``, in the data type of the parent board.
+    """
+
+    walls_remaining: NDArray[np.int_]
+    """
+    Remaining walls of the children, of shape ``(K, 2)``.
+    """
+
+    dones: NDArray[np.bool_]
+    """
+    Whether each child is won by the agent who expanded it, of shape ``(K,)``.
+    """
+
+    hashes: NDArray[np.uint64]
+    """
+    Zobrist hashes of the children, of shape ``(K,)``.
+    """
+
+    def state(self, index: int) -> QuoridorState:
+        """
+        Return child ``index`` as a state. Its arrays are views into the stacked
+        arrays, so they must not be modified in place while both are in use.
+
+        :arg index:
+            Index of the child, not its flat action index.
+        :returns:
+            A :obj:`QuoridorState` object.
+        """
+        return QuoridorState(
+            board=self.boards[index],
+            walls_remaining=self.walls_remaining[index],
+            done=bool(self.dones[index]),
+            hash=int(self.hashes[index]),
+        )
+
+
 class QuoridorEnv(BaseEnv[QuoridorState, QuoridorAction]):
     env_id = ("quoridor", 0)  # type: ignore
     """
@@ -220,6 +554,7 @@ class QuoridorEnv(BaseEnv[QuoridorState, QuoridorAction]):
         post_step_fn: Optional[
             Callable[[QuoridorState, int, QuoridorAction], None]
         ] = None,
+        out: Optional[Tuple[NDArray[np.int_], NDArray[np.int_]]] = None,
     ) -> QuoridorState:
         """
         Step through the game, calculating the next state given the current state and
@@ -236,6 +571,12 @@ class QuoridorEnv(BaseEnv[QuoridorState, QuoridorAction]):
         :arg post_step_fn:
             Callback to run after executing action. The calculated state, ``agent_id``
             and ``action`` will be provided as arguments.
+        :arg out:
+            Optional ``(board, walls_remaining)`` arrays to write the next state to,
+            instead of allocating new ones. They must not overlap the arrays of
+            ``state``, and become the arrays of the returned state. Alternating
+            between two pairs of buffers steps through a game without allocating
+            arrays. They are left untouched if the action is illegal.
         :returns:
             A copy of the object with the restored state.
         """
@@ -243,25 +584,153 @@ class QuoridorEnv(BaseEnv[QuoridorState, QuoridorAction]):
         if pre_step_fn is not None:
             pre_step_fn(state, agent_id, action)
 
-        next_information = fast_step(
+        action_np = _action_array(action)
+        code, board, walls_remaining, win, hash = try_step(
             state.board,
             state.walls_remaining,
             agent_id,
-            np.array(action, np.int_),
+            action_np,
             self.board_size,
+            state.hash,
+            out,
         )
+        if code:
+            raise ValueError(error_message(code, agent_id, action_np))
 
         next_state = QuoridorState(
-            board=next_information[0],
-            walls_remaining=next_information[1],
-            done=bool(next_information[2]),
+            board=board,
+            walls_remaining=walls_remaining,
+            done=bool(win),
+            hash=hash,
+            distances=self._next_distances(state, board, action_np[0]),
         )
 
         if post_step_fn is not None:
             post_step_fn(next_state, agent_id, action)
         return next_state
 
-    def legal_actions(self, state: QuoridorState, agent_id: int) -> NDArray[np.int_]:
+    def try_step(
+        self,
+        state: QuoridorState,
+        agent_id: int,
+        action: QuoridorAction,
+        out: Optional[Tuple[NDArray[np.int_], NDArray[np.int_]]] = None,
+    ) -> Optional[QuoridorState]:
+        """
+        Step through the game like :meth:`step`, but report an illegal action by
+        returning ``None`` instead of raising an exception. Callbacks are not
+        supported.
+
+        :arg state:
+            Current state of the environment.
+        :arg agent_id:
+            ID of the agent that takes the action. (``0`` or ``1``)
+        :arg action:
+            Agent action, encoded in the form described by :obj:`QuoridorAction`.
+        :arg out:
+            Optional ``(board, walls_remaining)`` arrays, used like in :meth:`step`.
+        :returns:
+            The next state, or ``None`` if the action is illegal.
+        """
+        action_np = _action_array(action)
+        code, board, walls_remaining, win, hash = try_step(
+            state.board,
+            state.walls_remaining,
+            agent_id,
+            action_np,
+            self.board_size,
+            state.hash,
+            out,
+        )
+        if code:
+            return None
+        return QuoridorState(
+            board=board,
+            walls_remaining=walls_remaining,
+            done=bool(win),
+            hash=hash,
+            distances=self._next_distances(state, board, action_np[0]),
+        )
+
+    def _next_distances(
+        self, state: QuoridorState, board: NDArray[np.int_], action_type: int
+    ) -> Optional[NDArray[np.int_]]:
+        if state.distances is None:
+            return None
+        if action_type == 0:
+            return state.distances
+        return update_distance_fields(
+            state.board, board, state.distances, self.board_size
+        )
+
+    def is_legal(
+        self, state: QuoridorState, agent_id: int, action: QuoridorAction
+    ) -> bool:
+        """
+        Check whether an action is legal without stepping through the game.
+
+        :arg state:
+            Current state of the environment.
+        :arg agent_id:
+            ID of the agent that takes the action. (``0`` or ``1``)
+        :arg action:
+            Agent action, encoded in the form described by :obj:`QuoridorAction`.
+        :returns:
+            ``True`` if :meth:`step` would accept the action.
+        """
+        return not is_legal(
+            state.board,
+            state.walls_remaining,
+            agent_id,
+            _action_array(action),
+            self.board_size,
+        )
+
+    def expand(self, state: QuoridorState, agent_id: int) -> QuoridorChildren:
+        """
+        Generate every legal child of a state in one call, which is much faster
+        than stepping through each legal action in turn.
+
+        :arg state:
+            Current state of the environment.
+        :arg agent_id:
+            ID of the agent that takes the actions. (``0`` or ``1``)
+        :returns:
+            A :obj:`QuoridorChildren` object, holding the children in the order of
+            their flat action indices.
+        """
+        return QuoridorChildren(
+            *expand(
+                state.board,
+                state.walls_remaining,
+                agent_id,
+                self.board_size,
+                state.hash,
+            )
+        )
+
+    def search_state(self, state: QuoridorState) -> QuoridorSearchState:
+        """
+        Create a mutable copy of the state for tree search. Actions are applied to
+        it with ``apply(agent_id, action_type, x, y)``, which returns a nonzero error
+        code for illegal actions instead of raising, and reverted with ``undo()``.
+
+        :arg state:
+            State to copy.
+        :returns:
+            A :obj:`QuoridorSearchState` object.
+        """
+        return QuoridorSearchState(
+            state.board, state.walls_remaining, state.done, self.board_size
+        )
+
+    def legal_actions(
+        self,
+        state: QuoridorState,
+        agent_id: int,
+        out: Optional[NDArray[np.generic]] = None,
+        encoding: str = "grid",
+    ) -> NDArray[Any]:
         """
         Find possible actions for the agent.
 
@@ -269,11 +738,35 @@ class QuoridorEnv(BaseEnv[QuoridorState, QuoridorAction]):
             Current state of the environment.
         :arg agent_id:
             Agent_id of the agent.
+        :arg out:
+            Optional contiguous array to write the result to, of the shape of the
+            result. It may hold integers or booleans, and is overwritten entirely.
+            Not supported for ``"indices"``.
+        :arg encoding:
+            ``"grid"`` for a one-hot array of shape (3, 9, 9), ``"mask"`` for a
+            boolean mask of shape ``(NUM_ACTIONS,)`` indexed by flat action index,
+            or ``"indices"`` for the sorted flat indices of the possible actions.
 
         :returns:
-            A numpy array of shape (4, 9, 9) which is one-hot encoding of possible actions.
+            A numpy array of possible actions in the requested encoding, which is
+            ``out`` if given.
         """
-        return fast_legal_actions(state, agent_id, self.board_size)
+        if encoding == "grid":
+            return fast_legal_actions(state, agent_id, self.board_size, out)
+        if encoding == "mask":
+            if out is None:
+                out = np.empty(NUM_ACTIONS, dtype=np.bool_)
+            fast_legal_actions(
+                state, agent_id, self.board_size, out.reshape(_ACTIONS_SHAPE)
+            )
+            return out
+        if encoding == "indices":
+            if out is not None:
+                raise ValueError("out is not supported for indices")
+            mask = np.empty(_ACTIONS_SHAPE, dtype=np.bool_)
+            fast_legal_actions(state, agent_id, self.board_size, mask)
+            return np.flatnonzero(mask)
+        raise ValueError(f"invalid encoding: {encoding}")
 
     def _check_in_range(self, pos: NDArray[np.int_], bottom_right=None) -> np.bool_:
         if bottom_right is None:
@@ -327,27 +820,34 @@ class QuoridorEnv(BaseEnv[QuoridorState, QuoridorAction]):
     def _check_wins(self, board: NDArray[np.int_]) -> bool:
         return bool(board[0, :, -1].sum() or board[1, :, 0].sum())
 
-    def initialize_state(self) -> QuoridorState:
+    def initialize_state(self, dtype: DTypeLike = np.int_) -> QuoridorState:
         """
         Initialize a :obj:`QuoridorState` object with correct environment parameters.
+        :arg dtype:
+            Data type of the board, one of ``np.int8``, ``np.uint8`` and
+            ``np.int_``. Steps keep the data type of the board they are given, so
+            the whole game is played on compact boards when this is ``np.int8`` or
+            ``np.uint8``.
         :returns:
             Created initial state object.
         """
+        if np.dtype(dtype) not in BOARD_DTYPES:
+            raise ValueError(f"unsupported board dtype: {np.dtype(dtype)}")
         if self.board_size % 2 == 0:
             raise ValueError(
                 f"cannot center pieces with even board_size={self.board_size}, please "
                 "initialize state manually"
             )
 
-        starting_pos_0 = np.zeros((self.board_size, self.board_size), dtype=np.int_)
+        starting_pos_0 = np.zeros((self.board_size, self.board_size), dtype=dtype)
         starting_pos_0[(self.board_size - 1) // 2, 0] = 1
 
         starting_board = np.stack(
             [
                 np.copy(starting_pos_0),
                 np.fliplr(starting_pos_0),
-                np.zeros((self.board_size, self.board_size), dtype=np.int_),
-                np.zeros((self.board_size, self.board_size), dtype=np.int_),
+                np.zeros((self.board_size, self.board_size), dtype=dtype),
+                np.zeros((self.board_size, self.board_size), dtype=dtype),
             ]
         )
 
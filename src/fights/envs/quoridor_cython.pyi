@@ -1,16 +1,116 @@
-from typing import Tuple
+from typing import Any, Optional, Tuple
 
 import numpy as np
+from numpy.typing import ArrayLike
 
 from .quoridor import QuoridorState
 
+ERROR_MESSAGES: Tuple[str, ...]
+BOARD_DTYPES: Tuple[np.dtype, ...]
+ZOBRIST_CELL_KEYS: np.ndarray
+ZOBRIST_WALLS_KEYS: np.ndarray
+
+def as_board(board: ArrayLike) -> np.ndarray: ...
+def as_mask(out: np.ndarray) -> np.ndarray: ...
+def zobrist_hash(
+    board: np.ndarray, walls_remaining: np.ndarray, board_size: int
+) -> int: ...
+def distance_fields(board: np.ndarray, board_size: int) -> np.ndarray: ...
+def update_distance_fields(
+    pre_board: np.ndarray,
+    board: np.ndarray,
+    pre_fields: np.ndarray,
+    board_size: int,
+) -> np.ndarray: ...
+def error_message(code: int, agent_id: int, action: np.ndarray) -> str: ...
 def fast_step(
     pre_board: np.ndarray,
     pre_walls_remaining: np.ndarray,
     agent_id: int,
     action: np.ndarray,
     board_size: int,
+    out: Optional[Tuple[np.ndarray, np.ndarray]] = None,
 ) -> Tuple[np.ndarray, np.ndarray, int]: ...
+def try_step(
+    pre_board: np.ndarray,
+    pre_walls_remaining: np.ndarray,
+    agent_id: int,
+    action: np.ndarray,
+    board_size: int,
+    pre_hash: int = 0,
+    out: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> Tuple[int, Any, Any, int, int]: ...
+def is_legal(
+    board: np.ndarray,
+    walls_remaining: np.ndarray,
+    agent_id: int,
+    action: np.ndarray,
+    board_size: int,
+) -> int: ...
 def fast_legal_actions(
-    state: QuoridorState, agent_id: int, board_size: int
+    state: QuoridorState,
+    agent_id: int,
+    board_size: int,
+    out: Optional[np.ndarray] = None,
 ) -> np.ndarray: ...
+def vector_step(
+    boards: np.ndarray,
+    walls_remaining: np.ndarray,
+    agent_ids: np.ndarray,
+    actions: np.ndarray,
+    initial_board: np.ndarray,
+    initial_walls_remaining: np.ndarray,
+    board_size: int,
+    codes: np.ndarray,
+    dones: np.ndarray,
+    rewards: np.ndarray,
+    legal_actions: np.ndarray,
+    num_threads: int = 0,
+) -> None: ...
+def batch_legal_actions(
+    boards: np.ndarray,
+    walls_remaining: np.ndarray,
+    agent_ids: np.ndarray,
+    board_size: int,
+    legal_actions: np.ndarray,
+    num_threads: int = 0,
+) -> None: ...
+def batch_check_paths(
+    boards: np.ndarray, board_size: int, out: np.ndarray, num_threads: int = 0
+) -> None: ...
+def expand(
+    board: np.ndarray,
+    walls_remaining: np.ndarray,
+    agent_id: int,
+    board_size: int,
+    pre_hash: int = 0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]: ...
+def rollout(
+    board: np.ndarray,
+    walls_remaining: np.ndarray,
+    to_move: int,
+    n: int,
+    seed: int,
+    max_plies: int,
+    board_size: int = 9,
+    num_threads: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]: ...
+
+class QuoridorSearchState:
+    board: np.ndarray
+    walls_remaining: np.ndarray
+    board_size: int
+    done: bool
+    ply: int
+    hash: int
+    def __init__(
+        self,
+        board: np.ndarray,
+        walls_remaining: np.ndarray,
+        done: bool = False,
+        board_size: int = 9,
+        capacity: int = 64,
+    ) -> None: ...
+    def apply(self, agent_id: int, action_type: int, x: int, y: int) -> int: ...
+    def undo(self) -> None: ...
+    def to_state(self) -> QuoridorState: ...
@@ -0,0 +1,435 @@
+# cython: language_level=3
+
+"""
+Bitboard wall graph shared by the Quoridor and Puoribor kernels.
+
+Cells are numbered ``x * board_size + y`` and a set of cells is kept in two 64-bit
+words, which is enough for boards up to 11x11. For each of the four directions,
+``WallGraph`` holds the cells from which a pawn can step that way, without
+leaving the board or crossing a wall. Reachability is computed by flood fill over
+the whole set at once: expand by one step in every direction, repeat until
+nothing changes.
+"""
+
+from .boards cimport board_t
+
+ctypedef unsigned long long u64
+
+cdef extern from *:
+    """
+    #if defined(_MSC_VER)
+    #include <intrin.h>
+    static inline int fights_wallgraph_ctz64(unsigned long long x) {
+        unsigned long index;
+        _BitScanForward64(&index, x);
+        return (int)index;
+    }
+    #else
+    static inline int fights_wallgraph_ctz64(unsigned long long x) {
+        return __builtin_ctzll(x);
+    }
+    #endif
+    """
+    int _ctz "fights_wallgraph_ctz64" (u64 x) noexcept nogil
+
+ctypedef struct Bits:
+    u64 lo
+    u64 hi
+
+ctypedef struct WallGraph:
+    Bits open_py  # Cells whose ``(x, y + 1)`` neighbor is reachable
+    Bits open_my  # Cells whose ``(x, y - 1)`` neighbor is reachable
+    Bits open_px  # Cells whose ``(x + 1, y)`` neighbor is reachable
+    Bits open_mx  # Cells whose ``(x - 1, y)`` neighbor is reachable
+    Bits goal0  # Goal row of agent 0, ``y = board_size - 1``
+    Bits goal1  # Goal row of agent 1, ``y = 0``
+    int board_size
+
+
+cdef inline Bits bits_or(Bits a, Bits b) noexcept nogil:
+    a.lo |= b.lo
+    a.hi |= b.hi
+    return a
+
+cdef inline Bits bits_and(Bits a, Bits b) noexcept nogil:
+    a.lo &= b.lo
+    a.hi &= b.hi
+    return a
+
+cdef inline Bits bits_andnot(Bits a, Bits b) noexcept nogil:
+    a.lo &= ~b.lo
+    a.hi &= ~b.hi
+    return a
+
+cdef inline bint bits_any(Bits a) noexcept nogil:
+    return a.lo != 0 or a.hi != 0
+
+cdef inline int bits_pop(Bits *a) noexcept nogil:
+    """
+    Remove the lowest cell from a nonempty set and return it.
+    """
+    cdef int i
+    if a.lo:
+        i = _ctz(a.lo)
+        a.lo &= a.lo - 1
+        return i
+    i = _ctz(a.hi)
+    a.hi &= a.hi - 1
+    return i + 64
+
+cdef inline bint bits_test(Bits a, int i) noexcept nogil:
+    if i < 64:
+        return (a.lo >> i) & 1
+    return (a.hi >> (i - 64)) & 1
+
+cdef inline void bits_set(Bits *a, int i) noexcept nogil:
+    if i < 64:
+        a.lo |= 1ULL << i
+    else:
+        a.hi |= 1ULL << (i - 64)
+
+cdef inline void bits_clear(Bits *a, int i) noexcept nogil:
+    if i < 64:
+        a.lo &= ~(1ULL << i)
+    else:
+        a.hi &= ~(1ULL << (i - 64))
+
+cdef inline Bits bits_shl(Bits a, int n) noexcept nogil:
+    """
+    Shift towards higher cell numbers, ``0 < n < 64``.
+    """
+    a.hi = (a.hi << n) | (a.lo >> (64 - n))
+    a.lo <<= n
+    return a
+
+cdef inline Bits bits_shr(Bits a, int n) noexcept nogil:
+    """
+    Shift towards lower cell numbers, ``0 < n < 64``.
+    """
+    a.lo = (a.lo >> n) | (a.hi << (64 - n))
+    a.hi >>= n
+    return a
+
+cdef inline Bits bits_cell(int x, int y, int board_size) noexcept nogil:
+    cdef Bits a
+    a.lo = 0
+    a.hi = 0
+    bits_set(&a, x * board_size + y)
+    return a
+
+
+cdef inline WallGraph wall_graph(board_t [:,:,:] board_view, int board_size) noexcept nogil:
+    """
+    Build the graph from the wall planes ``2`` and ``3`` of a board. A nonzero
+    ``board_view[2, x, y]`` blocks ``(x, y)`` from ``(x, y + 1)``, and a nonzero
+    ``board_view[3, x, y]`` blocks ``(x, y)`` from ``(x + 1, y)``.
+    """
+    cdef WallGraph g
+    cdef int x, y, i
+    g.open_py.lo = g.open_py.hi = 0
+    g.open_my.lo = g.open_my.hi = 0
+    g.open_px.lo = g.open_px.hi = 0
+    g.open_mx.lo = g.open_mx.hi = 0
+    g.goal0.lo = g.goal0.hi = 0
+    g.goal1.lo = g.goal1.hi = 0
+    g.board_size = board_size
+    for x in range(board_size):
+        for y in range(board_size):
+            i = x * board_size + y
+            if y < board_size - 1 and not board_view[2, x, y]:
+                bits_set(&g.open_py, i)
+                bits_set(&g.open_my, i + 1)
+            if x < board_size - 1 and not board_view[3, x, y]:
+                bits_set(&g.open_px, i)
+                bits_set(&g.open_mx, i + board_size)
+        bits_set(&g.goal0, x * board_size + board_size - 1)
+        bits_set(&g.goal1, x * board_size)
+    return g
+
+
+cdef inline void wall_graph_block(WallGraph *g, int plane, int x, int y) noexcept nogil:
+    """
+    Remove the edge crossed by a wall segment at ``(x, y)`` of ``plane``.
+    """
+    cdef int i = x * g.board_size + y
+    if plane == 2:
+        bits_clear(&g.open_py, i)
+        bits_clear(&g.open_my, i + 1)
+    else:
+        bits_clear(&g.open_px, i)
+        bits_clear(&g.open_mx, i + g.board_size)
+
+
+cdef inline Bits wall_graph_step(WallGraph *g, Bits reach) noexcept nogil:
+    """
+    Return ``reach`` together with every cell one step away from it.
+    """
+    cdef Bits result = reach
+    result = bits_or(result, bits_shl(bits_and(reach, g.open_py), 1))
+    result = bits_or(result, bits_shr(bits_and(reach, g.open_my), 1))
+    result = bits_or(result, bits_shl(bits_and(reach, g.open_px), g.board_size))
+    result = bits_or(result, bits_shr(bits_and(reach, g.open_mx), g.board_size))
+    return result
+
+
+cdef inline bint wall_graph_reaches(WallGraph *g, int x, int y, Bits goal) noexcept nogil:
+    """
+    Check whether any cell of ``goal`` is reachable from ``(x, y)``.
+    """
+    cdef Bits reach = bits_cell(x, y, g.board_size)
+    cdef Bits expanded
+    while True:
+        if bits_any(bits_and(reach, goal)):
+            return True
+        expanded = wall_graph_step(g, reach)
+        if expanded.lo == reach.lo and expanded.hi == reach.hi:
+            return False
+        reach = expanded
+
+
+cdef inline bint wall_graph_paths_exist(
+    WallGraph *g, int pos0_x, int pos0_y, int pos1_x, int pos1_y
+) noexcept nogil:
+    """
+    Check that both agents can reach their goal rows.
+    """
+    return (
+        wall_graph_reaches(g, pos0_x, pos0_y, g.goal0)
+        and wall_graph_reaches(g, pos1_x, pos1_y, g.goal1)
+    )
+
+
+# A wall can only disconnect an agent from its goal row if it cuts every shortest
+# path, so in particular the one kept here. ``py`` holds the cells whose edge to
+# ``(x, y + 1)`` is on the path, and ``px`` the cells whose edge to ``(x + 1, y)`` is.
+ctypedef struct PathEdges:
+    Bits py
+    Bits px
+
+
+cdef inline void wall_graph_add_path(
+    WallGraph *g, int x, int y, Bits goal, PathEdges *path
+) noexcept nogil:
+    """
+    Add the edges of one shortest path from ``(x, y)`` to ``goal`` to ``path``. If
+    ``goal`` is unreachable, every edge is added, so that no wall is skipped.
+    """
+    cdef int bs = g.board_size
+    cdef int i = x * bs + y
+    cdef int d = 0
+    cdef Bits layers[128]
+    cdef Bits reach = goal
+    cdef Bits expanded
+    layers[0] = goal
+    while not bits_test(layers[d], i):
+        expanded = wall_graph_step(g, reach)
+        layers[d + 1] = bits_andnot(expanded, reach)
+        if not bits_any(layers[d + 1]):
+            path.py = bits_or(path.py, g.open_py)
+            path.px = bits_or(path.px, g.open_px)
+            return
+        reach = expanded
+        d += 1
+    while d > 0:
+        d -= 1
+        if bits_test(g.open_py, i) and bits_test(layers[d], i + 1):
+            bits_set(&path.py, i)
+            i += 1
+        elif bits_test(g.open_my, i) and bits_test(layers[d], i - 1):
+            bits_set(&path.py, i - 1)
+            i -= 1
+        elif bits_test(g.open_px, i) and bits_test(layers[d], i + bs):
+            bits_set(&path.px, i)
+            i += bs
+        else:
+            bits_set(&path.px, i - bs)
+            i -= bs
+
+
+cdef inline PathEdges wall_graph_shortest_paths(
+    WallGraph *g, int pos0_x, int pos0_y, int pos1_x, int pos1_y
+) noexcept nogil:
+    """
+    Return the edges of one shortest path to the goal row for each agent.
+    """
+    cdef PathEdges path
+    path.py.lo = path.py.hi = 0
+    path.px.lo = path.px.hi = 0
+    wall_graph_add_path(g, pos0_x, pos0_y, g.goal0, &path)
+    wall_graph_add_path(g, pos1_x, pos1_y, g.goal1, &path)
+    return path
+
+
+cdef inline bint wall_graph_on_path(PathEdges *path, int plane, int x, int y, int board_size) noexcept nogil:
+    """
+    Check whether the edge crossed by a wall segment at ``(x, y)`` of ``plane`` is
+    on ``path``.
+    """
+    if plane == 2:
+        return bits_test(path.py, x * board_size + y)
+    return bits_test(path.px, x * board_size + y)
+
+
+# Distance fields hold the number of steps from every cell to a goal row, ignoring
+# pawns. Cells which cannot reach it hold ``board_size * board_size``.
+
+cdef inline void wall_graph_distances(WallGraph *g, Bits goal, long [:,:] dist) noexcept nogil:
+    """
+    Fill ``dist`` by expanding from the goal row one layer at a time.
+    """
+    cdef int bs = g.board_size
+    cdef int i, d = 0
+    cdef Bits reach = goal
+    cdef Bits frontier = goal
+    cdef Bits expanded
+    for i in range(bs * bs):
+        dist[i // bs, i % bs] = bs * bs
+    while bits_any(frontier):
+        while bits_any(frontier):
+            i = bits_pop(&frontier)
+            dist[i // bs, i % bs] = d
+        expanded = wall_graph_step(g, reach)
+        frontier = bits_andnot(expanded, reach)
+        reach = expanded
+        d += 1
+
+
+cdef inline int _neighbors(WallGraph *g, int i, int *out) noexcept nogil:
+    cdef int n = 0
+    if bits_test(g.open_py, i):
+        out[n] = i + 1
+        n += 1
+    if bits_test(g.open_my, i):
+        out[n] = i - 1
+        n += 1
+    if bits_test(g.open_px, i):
+        out[n] = i + g.board_size
+        n += 1
+    if bits_test(g.open_mx, i):
+        out[n] = i - g.board_size
+        n += 1
+    return n
+
+
+cdef inline int _pop_nearest(Bits *pending, long [:,:] dist, int bs) noexcept nogil:
+    """
+    Remove the cell of ``pending`` with the smallest distance and return it.
+    """
+    cdef Bits rest = pending[0]
+    cdef int i, best = -1
+    while bits_any(rest):
+        i = bits_pop(&rest)
+        if best < 0 or dist[i // bs, i % bs] < dist[best // bs, best % bs]:
+            best = i
+    bits_clear(pending, best)
+    return best
+
+
+cdef inline void _seed_removed(
+    Bits removed, int offset, long [:,:] dist, int bs, Bits *pending
+) noexcept nogil:
+    """
+    Add the endpoints of removed edges which relied on the edge for their distance.
+    """
+    cdef int u, v
+    while bits_any(removed):
+        u = bits_pop(&removed)
+        v = u + offset
+        if dist[u // bs, u % bs] == dist[v // bs, v % bs] + 1:
+            bits_set(pending, u)
+        elif dist[v // bs, v % bs] == dist[u // bs, u % bs] + 1:
+            bits_set(pending, v)
+
+
+cdef inline void _seed_added(
+    Bits added, int offset, long [:,:] dist, int bs, Bits *pending
+) noexcept nogil:
+    """
+    Shorten the endpoints of added edges which the edge brings closer to the goal.
+    """
+    cdef int u, v
+    while bits_any(added):
+        u = bits_pop(&added)
+        v = u + offset
+        if dist[u // bs, u % bs] + 1 < dist[v // bs, v % bs]:
+            dist[v // bs, v % bs] = dist[u // bs, u % bs] + 1
+            bits_set(pending, v)
+        elif dist[v // bs, v % bs] + 1 < dist[u // bs, u % bs]:
+            dist[u // bs, u % bs] = dist[v // bs, v % bs] + 1
+            bits_set(pending, u)
+
+
+cdef inline void wall_graph_update_distances(
+    WallGraph *old, WallGraph *new, long [:,:] dist
+) noexcept nogil:
+    """
+    Update ``dist`` from the field of ``old`` to the field of ``new``, touching only
+    cells whose distance depends on a changed edge.
+
+    Removed edges are handled first, on the graph of edges kept in both. Cells are
+    visited in order of distance, and a cell is invalidated if it has no neighbor
+    one step closer which is still valid. Only the invalidated cells are then
+    recomputed from their valid neighbors. Added edges are handled last, by
+    relaxing distances outward from the edges which shorten a path.
+    """
+    cdef int bs = new.board_size
+    cdef int inf = bs * bs
+    cdef int i, j, k, n, d
+    cdef int neighbors[4]
+    cdef WallGraph kept = new[0]
+    cdef Bits pending, affected, rest
+    pending.lo = pending.hi = 0
+    affected.lo = affected.hi = 0
+    kept.open_py = bits_and(old.open_py, new.open_py)
+    kept.open_my = bits_and(old.open_my, new.open_my)
+    kept.open_px = bits_and(old.open_px, new.open_px)
+    kept.open_mx = bits_and(old.open_mx, new.open_mx)
+
+    _seed_removed(bits_andnot(old.open_py, new.open_py), 1, dist, bs, &pending)
+    _seed_removed(bits_andnot(old.open_px, new.open_px), bs, dist, bs, &pending)
+    while bits_any(pending):
+        i = _pop_nearest(&pending, dist, bs)
+        d = dist[i // bs, i % bs]
+        n = _neighbors(&kept, i, neighbors)
+        for k in range(n):
+            j = neighbors[k]
+            if dist[j // bs, j % bs] == d - 1 and not bits_test(affected, j):
+                break
+        else:
+            bits_set(&affected, i)
+            for k in range(n):
+                j = neighbors[k]
+                if dist[j // bs, j % bs] == d + 1:
+                    bits_set(&pending, j)
+
+    rest = affected
+    while bits_any(rest):
+        i = bits_pop(&rest)
+        dist[i // bs, i % bs] = inf
+        n = _neighbors(&kept, i, neighbors)
+        for k in range(n):
+            j = neighbors[k]
+            if not bits_test(affected, j) and dist[j // bs, j % bs] + 1 < dist[i // bs, i % bs]:
+                dist[i // bs, i % bs] = dist[j // bs, j % bs] + 1
+    while bits_any(affected):
+        i = _pop_nearest(&affected, dist, bs)
+        d = dist[i // bs, i % bs]
+        if d >= inf:
+            continue
+        n = _neighbors(&kept, i, neighbors)
+        for k in range(n):
+            j = neighbors[k]
+            if d + 1 < dist[j // bs, j % bs]:
+                dist[j // bs, j % bs] = d + 1
+
+    _seed_added(bits_andnot(new.open_py, old.open_py), 1, dist, bs, &pending)
+    _seed_added(bits_andnot(new.open_px, old.open_px), bs, dist, bs, &pending)
+    while bits_any(pending):
+        i = _pop_nearest(&pending, dist, bs)
+        d = dist[i // bs, i % bs]
+        n = _neighbors(new, i, neighbors)
+        for k in range(n):
+            j = neighbors[k]
+            if d + 1 < dist[j // bs, j % bs]:
+                dist[j // bs, j % bs] = d + 1
+                bits_set(&pending, j)
@@ -0,0 +1,283 @@
+"""
+Batched inference for neural agents. An :class:`InferenceBroker` collects the
+evaluation requests of many concurrent games or search threads, stacks their
+boards as seen by :meth:`perspective` into one batch, and runs a batched model on
+it from a background thread. A batch is run as soon as it is full, or when its
+oldest request has waited for ``max_wait`` seconds.
+
+Requesters block until their result is ready, so the broker pays off when there
+are about as many of them as the batch size, for example the threads of a
+:class:`~fights.runner.GameRunner` or of a
+:class:`~fights.search.parallel.TreeParallelMCTS`.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+BatchModel = Callable[[NDArray[Any]], Tuple[NDArray[np.float64], NDArray[np.float64]]]
+"""
+Called with boards stacked into an array of shape ``(B, C, W, H)``, returns the
+values of shape ``(B,)`` and the policies of shape ``(B, NUM_ACTIONS)`` of the
+agents seeing them. Policies are indexed by flat actions in the frame of the agent,
+like the boards.
+"""
+
+
+class BrokerStats(NamedTuple):
+    """
+    ``BrokerStats`` holds the counters of an :class:`InferenceBroker`.
+    """
+
+    requests: int
+    """
+    Number of requests answered.
+    """
+
+    batches: int
+    """
+    Number of batches run.
+    """
+
+    seconds: float
+    """
+    Wall clock time since the broker was started.
+    """
+
+    model_seconds: float
+    """
+    Time spent in the model.
+    """
+
+    mean_latency: float
+    """
+    Mean time from a request to its result, in seconds.
+    """
+
+    p99_latency: float
+    """
+    99th percentile of the time from a request to its result over the last
+    ``10000`` requests, in seconds.
+    """
+
+    @property
+    def mean_batch_size(self) -> float:
+        """
+        Mean number of requests per batch.
+        """
+        return self.requests / self.batches if self.batches else 0.0
+
+    @property
+    def requests_per_sec(self) -> float:
+        """
+        Number of requests answered per second.
+        """
+        return self.requests / self.seconds if self.seconds > 0 else 0.0
+
+
+class _Request(NamedTuple):
+    board: NDArray[Any]
+    future: Future
+    time: float
+
+
+def _deliver(
+    future: Future, result: Any = None, error: Optional[Exception] = None
+) -> None:
+    # A future completed by its requester must not stop the background thread.
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class InferenceBroker:
+    """
+    Broker running a batched model on the boards requested by many threads.
+
+    :arg model:
+        Batched model, see :data:`BatchModel`.
+
+    :arg max_batch_size:
+        Maximum number of boards per batch.
+
+    :arg max_wait:
+        Maximum time in seconds a request waits for the batch to fill up.
+
+    :arg agent_frame_actions:
+        ``AGENT_FRAME_ACTIONS`` of the environment, to translate the policies of
+        agent ``1`` back to absolute actions in :meth:`evaluate`. Policies are
+        returned as they are if not given.
+    """
+
+    def __init__(
+        self,
+        model: BatchModel,
+        max_batch_size: int = 256,
+        max_wait: float = 0.001,
+        agent_frame_actions: Optional[NDArray[np.intp]] = None,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError(f"invalid max_batch_size: {max_batch_size}")
+        if max_wait < 0:
+            raise ValueError(f"invalid max_wait: {max_wait}")
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.agent_frame_actions = agent_frame_actions
+        self._queue: Deque[_Request] = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._requests = 0
+        self._batches = 0
+        self._model_seconds = 0.0
+        self._total_latency = 0.0
+        self._latencies: Deque[float] = deque(maxlen=10000)
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> InferenceBroker:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Run the pending requests and stop the background thread. Requests submitted
+        afterwards raise a :obj:`RuntimeError`.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def submit(self, board: NDArray[Any]) -> Future:
+        """
+        Queue a board for the next batch.
+
+        :arg board:
+            Board of shape ``(C, W, H)`` as seen by the agent to evaluate for.
+
+        :returns:
+            A :class:`~concurrent.futures.Future` of the value and the policy of
+            the board.
+        """
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("cannot submit to a closed broker")
+            self._queue.append(_Request(board, future, time.perf_counter()))
+            self._condition.notify_all()
+        return future
+
+    def evaluate(self, state: Any, agent_id: int) -> Tuple[float, NDArray[np.float64]]:
+        """
+        Evaluate a state for an agent, waiting for the batch to run.
+
+        :arg state:
+            State to evaluate.
+
+        :arg agent_id:
+            ID of the agent to evaluate for.
+
+        :returns:
+            The value of the state for the agent, and its policy over flat actions
+            in absolute coordinates if ``agent_frame_actions`` was given.
+        """
+        value, policy = self.submit(state.perspective(agent_id)).result()
+        if agent_id == 1 and self.agent_frame_actions is not None:
+            policy = policy[self.agent_frame_actions]
+        return float(value), policy
+
+    def __call__(
+        self, state: Any, agent_id: int, actions: NDArray[np.intp]
+    ) -> Tuple[float, NDArray[np.float64]]:
+        """
+        Evaluate a state as an :data:`~fights.search.mcts.Evaluator`, with the
+        policy restricted to ``actions`` and normalized as priors.
+        """
+        value, policy = self.evaluate(state, agent_id)
+        priors = np.asarray(policy[actions], dtype=np.float64)
+        total = priors.sum()
+        if total > 0:
+            return value, priors / total
+        return value, np.full(len(actions), 1 / len(actions))
+
+    @property
+    def stats(self) -> BrokerStats:
+        """
+        Counters of the requests answered so far.
+        """
+        with self._condition:
+            latencies = np.array(self._latencies)
+            return BrokerStats(
+                requests=self._requests,
+                batches=self._batches,
+                seconds=time.perf_counter() - self._start,
+                model_seconds=self._model_seconds,
+                mean_latency=self._total_latency / max(self._requests, 1),
+                p99_latency=(
+                    float(np.percentile(latencies, 99)) if len(latencies) else 0.0
+                ),
+            )
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        with self._condition:
+            while True:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return None
+                while self._queue and len(self._queue) < self.max_batch_size:
+                    timeout = self._queue[0].time + self.max_wait - time.perf_counter()
+                    if timeout <= 0 or self._closed:
+                        break
+                    self._condition.wait(timeout)
+                batch: List[_Request] = []
+                while self._queue and len(batch) < self.max_batch_size:
+                    request = self._queue.popleft()
+                    # Requests cancelled by their requester are dropped, and the
+                    # others can no longer be cancelled.
+                    if request.future.set_running_or_notify_cancel():
+                        batch.append(request)
+                if batch:
+                    return batch
+
+    def _serve(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            start = time.perf_counter()
+            try:
+                values, policies = self.model(np.stack([r.board for r in batch]))
+                if len(values) != len(batch) or len(policies) != len(batch):
+                    raise ValueError(
+                        f"model returned {len(values)} values and {len(policies)} "
+                        f"policies for {len(batch)} boards"
+                    )
+            except Exception as error:
+                for request in batch:
+                    _deliver(request.future, error=error)
+                continue
+            end = time.perf_counter()
+            for request, value, policy in zip(batch, values, policies):
+                _deliver(request.future, (value, policy))
+            with self._condition:
+                self._requests += len(batch)
+                self._batches += 1
+                self._model_seconds += end - start
+                for request in batch:
+                    self._total_latency += end - request.time
+                    self._latencies.append(end - request.time)
@@ -0,0 +1,120 @@
+"""
+Play many games concurrently in one process, on a thread pool. States stay in the
+process and are never pickled. The environment kernels release the GIL while
+computing legal actions and stepping, so games overlap on multiple cores as long
+as the agents spend their time in them. With free-threaded CPython, the agents
+themselves run in parallel as well.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence
+
+from fights.base import BaseAgent, BaseEnv, BaseState
+
+
+class GameResult(NamedTuple):
+    """
+    ``GameResult`` is the result of a game played by :func:`play_game`.
+    """
+
+    state: BaseState
+    """
+    Final state of the game.
+    """
+
+    plies: int
+    """
+    Number of actions taken.
+    """
+
+    agent_id: int
+    """
+    ID of the agent which took the last action, or ``-1`` if no action was taken.
+    """
+
+
+def play_game(
+    env: BaseEnv[Any, Any],
+    agents: Sequence[BaseAgent[Any, Any]],
+    state: Optional[BaseState] = None,
+    max_plies: Optional[int] = None,
+) -> GameResult:
+    """
+    Play a game with ``agents[0]`` and ``agents[1]`` taking turns, starting with
+    ``agents[0]``.
+
+    :arg env:
+        Environment of the game.
+
+    :arg agents:
+        Agents with ID ``0`` and ``1``.
+
+    :arg state:
+        Initial state. ``env.initialize_state()`` is used if not given.
+
+    :arg max_plies:
+        Stop the game after this many actions, even if it is not done.
+
+    :returns:
+        A :obj:`GameResult` object.
+    """
+    if state is None:
+        state = env.initialize_state()
+    agent_id = 0
+    plies = 0
+    while not state.done and (max_plies is None or plies < max_plies):
+        state = env.step(state, agent_id, agents[agent_id](state))
+        agent_id = 1 - agent_id
+        plies += 1
+    return GameResult(state, plies, 1 - agent_id if plies else -1)
+
+
+class GameRunner:
+    """
+    Play games on a :class:`~concurrent.futures.ThreadPoolExecutor`.
+
+    :arg env:
+        Environment of the games. Environments do not keep per-game state, so a
+        single one is shared by all threads.
+
+    :arg make_agents:
+        Called with the index of each game, returns the two agents playing it.
+        Agents usually keep a random generator or a search tree, so every game
+        gets its own.
+
+    :arg max_workers:
+        Number of threads, passed to ``ThreadPoolExecutor``.
+
+    :arg max_plies:
+        Passed to :func:`play_game`.
+    """
+
+    def __init__(
+        self,
+        env: BaseEnv[Any, Any],
+        make_agents: Callable[[int], Sequence[BaseAgent[Any, Any]]],
+        max_workers: Optional[int] = None,
+        max_plies: Optional[int] = None,
+    ) -> None:
+        self.env = env
+        self.make_agents = make_agents
+        self.max_workers = max_workers
+        self.max_plies = max_plies
+
+    def _play(self, index: int) -> GameResult:
+        return play_game(self.env, self.make_agents(index), max_plies=self.max_plies)
+
+    def run(self, num_games: int) -> List[GameResult]:
+        """
+        Play games concurrently.
+
+        :arg num_games:
+            Number of games to play.
+
+        :returns:
+            The results of the games, in order of their index.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self._play, range(num_games)))
@@ -0,0 +1,18 @@
+from .alphabeta import (
+    WIN_VALUE,
+    AlphaBetaSearch,
+    Evaluation,
+    SearchResult,
+    distance_evaluation,
+    stone_evaluation,
+)
+from .mcts import MCTS, Evaluator, MCTSResult, RolloutEvaluator
+from .parallel import RootParallelAlphaBeta, RootParallelMCTS, TreeParallelMCTS
+from .transposition import (
+    BOUND_EXACT,
+    BOUND_LOWER,
+    BOUND_NONE,
+    BOUND_UPPER,
+    TranspositionTable,
+    TTEntry,
+)
@@ -0,0 +1,476 @@
+"""
+Alpha-beta search for any fights environment, in negamax form.
+
+The search deepens iteratively until a depth or time budget runs out, and searches
+every node after the first with a null window (principal variation search).
+Results are kept in a :class:`~fights.search.transposition.TranspositionTable`,
+whose best actions are searched first on the next iteration. The remaining
+actions are ordered by the killer and history heuristics, after the pawn moves
+which follow a shortest path to the goal.
+
+Environments need ``legal_actions(state, agent_id, encoding="indices")`` and a
+``step`` accepting flat action indices, like the built-in ones. Children are
+generated with ``expand`` when the environment has it.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from fights.base import BaseEnv
+
+from .transposition import BOUND_EXACT, BOUND_LOWER, BOUND_UPPER, TranspositionTable
+
+Evaluation = Callable[[Any, int], float]
+"""
+Called with a state which is not done and the ID of the agent to move, returns the
+value of the state for that agent. Values must stay well below :data:`WIN_VALUE`.
+"""
+
+WIN_VALUE = 1e6
+"""
+Value of a won game. A game won ``n`` plies from the root is worth
+``WIN_VALUE - n``, so shorter wins are preferred.
+"""
+
+_MAX_PLY = 1000
+_NULL_WINDOW = 1e-6
+_ORDER_TABLE = 3e12
+_ORDER_PATH = 2e12
+_ORDER_KILLER = 1e12
+
+
+def distance_evaluation(state: Any, agent_id: int) -> float:
+    """
+    Evaluate a Quoridor or Puoribor state by the race to the goal: the distance
+    of the opponent minus the distance of the agent, plus half a step for each
+    wall the agent has left over the opponent.
+
+    :arg state:
+        State to evaluate.
+
+    :arg agent_id:
+        ID of the agent to move.
+
+    :returns:
+        Value of the state for ``agent_id``.
+    """
+    walls = state.walls_remaining
+    return (
+        state.distance_to_goal(1 - agent_id)
+        - state.distance_to_goal(agent_id)
+        + 0.5 * float(walls[agent_id] - walls[1 - agent_id])
+    )
+
+
+def stone_evaluation(state: Any, agent_id: int) -> float:
+    """
+    Evaluate an Othello state by the difference of stones.
+
+    :arg state:
+        State to evaluate.
+
+    :arg agent_id:
+        ID of the agent to move.
+
+    :returns:
+        Value of the state for ``agent_id``.
+    """
+    board = state.board
+    return float(
+        np.count_nonzero(board[agent_id]) - np.count_nonzero(board[1 - agent_id])
+    )
+
+
+class SearchResult(NamedTuple):
+    """
+    ``SearchResult`` holds the outcome of :meth:`AlphaBetaSearch.search`.
+    """
+
+    action: int
+    """
+    Flat index of the best action found.
+    """
+
+    value: float
+    """
+    Value of the best action for the agent to move.
+    """
+
+    depth: int
+    """
+    Depth of the last completed iteration.
+    """
+
+    pv: List[int]
+    """
+    Principal variation, as flat action indices starting with :attr:`action`.
+    """
+
+    nodes: int
+    """
+    Number of nodes visited, including the ones of an unfinished last iteration.
+    """
+
+    iteration_nodes: List[int]
+    """
+    Number of nodes visited by each completed iteration, from depth ``1``.
+    """
+
+    seconds: float
+    """
+    Wall clock time spent searching.
+    """
+
+    iteration_actions: List[int]
+    """
+    Best action of each completed iteration, from depth ``1``.
+    """
+
+    iteration_values: List[float]
+    """
+    Value of the best action of each completed iteration, from depth ``1``.
+    """
+
+    @property
+    def nodes_per_sec(self) -> float:
+        """
+        Number of nodes visited per second.
+        """
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def effective_branching_factor(self) -> float:
+        """
+        Branching factor of a uniform tree as deep as the last completed iteration,
+        with as many nodes: ``iteration_nodes[-1] ** (1 / depth)``. A perfectly
+        ordered search of branching factor ``b`` approaches ``sqrt(b)``.
+        """
+        if not self.iteration_nodes:
+            return 0.0
+        return float(self.iteration_nodes[-1] ** (1 / len(self.iteration_nodes)))
+
+
+class _Timeout(Exception):
+    pass
+
+
+class AlphaBetaSearch:
+    """
+    Alpha-beta search engine. Its transposition table and history are kept between
+    searches, so a single engine should be reused through a game.
+
+    :arg env:
+        Environment to search in.
+
+    :arg evaluation:
+        Evaluation of the leaves. Defaults to :func:`distance_evaluation` for
+        states with ``distance_to_goal``, and to :func:`stone_evaluation` for the
+        others.
+
+    :arg max_depth:
+        Default depth limit of :meth:`search`.
+
+    :arg time_limit:
+        Default time budget of :meth:`search` in seconds, or ``None`` for no limit.
+
+    :arg table:
+        Transposition table to use. A table of ``2 ** 18`` buckets, holding flat
+        action indices, is created if not given.
+    """
+
+    def __init__(
+        self,
+        env: BaseEnv[Any, Any],
+        evaluation: Optional[Evaluation] = None,
+        max_depth: int = 64,
+        time_limit: Optional[float] = None,
+        table: Optional[TranspositionTable] = None,
+    ) -> None:
+        self.env = env
+        self.evaluation = evaluation
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.table = (
+            table if table is not None else TranspositionTable(1 << 18, action_size=1)
+        )
+        self.history = np.zeros((2, 0))
+        self.killers = np.full((_MAX_PLY, 2), -1, dtype=np.int_)
+        self.nodes = 0
+        self._deadline: Optional[float] = None
+        self._root_action = -1
+        self._root_actions: Optional[NDArray[np.intp]] = None
+
+    def search(
+        self,
+        state: Any,
+        agent_id: int,
+        max_depth: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        actions: Optional[Sequence[int]] = None,
+    ) -> SearchResult:
+        """
+        Search for the best action of an agent, deepening one ply at a time until
+        ``max_depth`` is reached or ``time_limit`` runs out. The first iteration
+        always completes.
+
+        :arg state:
+            State to search from, which must not be done.
+
+        :arg agent_id:
+            ID of the agent to move. (``0`` or ``1``)
+
+        :arg max_depth:
+            Depth limit, overriding the one of the engine.
+
+        :arg time_limit:
+            Time budget in seconds, overriding the one of the engine.
+
+        :arg actions:
+            Flat indices of the legal actions to consider at the root, or ``None``
+            for all of them.
+
+        :returns:
+            A :obj:`SearchResult` object.
+        """
+        if state.done:
+            raise ValueError("cannot search from a finished game")
+        max_depth = self.max_depth if max_depth is None else max_depth
+        time_limit = self.time_limit if time_limit is None else time_limit
+        if max_depth < 1:
+            raise ValueError(f"invalid max_depth: {max_depth}")
+        self._root_actions = None
+        if actions is not None:
+            env: Any = self.env
+            legal = env.legal_actions(state, agent_id, encoding="indices")
+            self._root_actions = np.asarray(actions, dtype=np.intp)
+            if (
+                not len(self._root_actions)
+                or not np.isin(self._root_actions, legal).all()
+            ):
+                raise ValueError(f"invalid root actions: {actions}")
+        if self.evaluation is None:
+            self.evaluation = (
+                distance_evaluation
+                if hasattr(state, "distance_to_goal")
+                else stone_evaluation
+            )
+
+        self.table.new_search()
+        self.history *= 0.5
+        self.killers[:] = -1
+        self.nodes = 0
+        start = time.perf_counter()
+        self._deadline = None
+
+        action, value, depth = -1, 0.0, 0
+        iteration_nodes: List[int] = []
+        iteration_actions: List[int] = []
+        iteration_values: List[float] = []
+        for iteration in range(1, max_depth + 1):
+            nodes = self.nodes
+            try:
+                value = self._search(state, agent_id, iteration, -np.inf, np.inf, 0)
+            except _Timeout:
+                break
+            action, depth = self._root_action, iteration
+            iteration_nodes.append(self.nodes - nodes)
+            iteration_actions.append(action)
+            iteration_values.append(value)
+            if time_limit is not None:
+                self._deadline = start + time_limit
+                if time.perf_counter() >= self._deadline:
+                    break
+            # A decided game will not change with more depth.
+            if abs(value) >= WIN_VALUE - _MAX_PLY:
+                break
+        self._deadline = None
+
+        return SearchResult(
+            action=action,
+            value=value,
+            depth=depth,
+            pv=self._principal_variation(state, agent_id, action, depth),
+            nodes=self.nodes,
+            iteration_nodes=iteration_nodes,
+            seconds=time.perf_counter() - start,
+            iteration_actions=iteration_actions,
+            iteration_values=iteration_values,
+        )
+
+    def _search(
+        self,
+        state: Any,
+        agent_id: int,
+        depth: int,
+        alpha: float,
+        beta: float,
+        ply: int,
+    ) -> float:
+        self.nodes += 1
+        if (
+            self._deadline is not None
+            and not self.nodes & 1023
+            and time.perf_counter() >= self._deadline
+        ):
+            raise _Timeout
+        if state.done:
+            return self._terminal_value(state, agent_id, ply)
+        if depth <= 0 or ply >= _MAX_PLY - 1:
+            assert self.evaluation is not None
+            return self.evaluation(state, agent_id)
+
+        key = state.hash ^ agent_id
+        entry = self.table.probe(key)
+        table_action = -1
+        if entry is not None:
+            if entry.action is not None:
+                table_action = int(entry.action[0])
+            if ply > 0:
+                cutoff = entry.cutoff(
+                    depth, _to_table(alpha, ply), _to_table(beta, ply)
+                )
+                if cutoff is not None:
+                    return _from_table(cutoff, ply)
+
+        actions, child = self._expand(state, agent_id)
+        if not len(actions):
+            assert self.evaluation is not None
+            return self.evaluation(state, agent_id)
+        order = self._order(state, agent_id, actions, table_action, ply)
+        if ply == 0 and self._root_actions is not None:
+            order = order[np.isin(actions[order], self._root_actions)]
+        original_alpha = alpha
+        best_value, best_action = -np.inf, -1
+        for n, index in enumerate(order):
+            child_state = child(index)
+            if n == 0:
+                value = -self._search(
+                    child_state, 1 - agent_id, depth - 1, -beta, -alpha, ply + 1
+                )
+            else:
+                value = -self._search(
+                    child_state,
+                    1 - agent_id,
+                    depth - 1,
+                    -alpha - _NULL_WINDOW,
+                    -alpha,
+                    ply + 1,
+                )
+                if alpha < value < beta:
+                    value = -self._search(
+                        child_state, 1 - agent_id, depth - 1, -beta, -value, ply + 1
+                    )
+            if value > best_value:
+                best_value, best_action = value, int(actions[index])
+                if ply == 0:
+                    self._root_action = best_action
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                self._reward_cutoff(agent_id, best_action, depth, ply)
+                break
+
+        if ply == 0 and self._root_actions is not None:
+            # The value only holds for some of the actions, so it is not stored.
+            return best_value
+        if best_value <= original_alpha:
+            bound = BOUND_UPPER
+        elif best_value >= beta:
+            bound = BOUND_LOWER
+        else:
+            bound = BOUND_EXACT
+        self.table.store(key, depth, bound, _to_table(best_value, ply), [best_action])
+        return best_value
+
+    def _terminal_value(self, state: Any, agent_id: int, ply: int) -> float:
+        if hasattr(state, "reward"):
+            return float(np.sign(state.reward[agent_id])) * (WIN_VALUE - ply)
+        # The agent who moved into a finished game won it.
+        return -(WIN_VALUE - ply)
+
+    def _expand(
+        self, state: Any, agent_id: int
+    ) -> Tuple[NDArray[np.intp], Callable[[int], Any]]:
+        env: Any = self.env
+        if hasattr(env, "expand"):
+            children = env.expand(state, agent_id)
+            return children.actions, children.state
+        actions = env.legal_actions(state, agent_id, encoding="indices")
+        return actions, lambda index: env.step(state, agent_id, actions[index])
+
+    def _order(
+        self,
+        state: Any,
+        agent_id: int,
+        actions: NDArray[np.intp],
+        table_action: int,
+        ply: int,
+    ) -> NDArray[np.intp]:
+        if self.history.shape[1] <= actions[-1]:
+            self.history = np.pad(
+                self.history,
+                ((0, 0), (0, int(actions[-1]) + 1 - self.history.shape[1])),
+            )
+        scores = self.history[agent_id, actions].copy()
+        scores[np.isin(actions, self.killers[ply])] += _ORDER_KILLER
+        if hasattr(state, "distance_to_goal"):
+            scores[self._path_moves(state, agent_id, actions)] += _ORDER_PATH
+        scores[actions == table_action] += _ORDER_TABLE
+        return np.argsort(-scores, kind="stable")
+
+    def _path_moves(
+        self, state: Any, agent_id: int, actions: NDArray[np.intp]
+    ) -> NDArray[np.bool_]:
+        # Pawn moves come first in the flat encoding, indexed by their target cell.
+        distance = state.distance_to_goal(agent_id)
+        width, height = state.board.shape[1:]
+        moves = actions < width * height
+        x, y = np.divmod(actions[moves], height)
+        path = np.zeros(len(actions), dtype=np.bool_)
+        path[moves] = state.distances[agent_id, x, y] < distance
+        return path
+
+    def _reward_cutoff(self, agent_id: int, action: int, depth: int, ply: int) -> None:
+        self.history[agent_id, action] += depth * depth
+        if self.killers[ply, 0] != action:
+            self.killers[ply, 1] = self.killers[ply, 0]
+            self.killers[ply, 0] = action
+
+    def _principal_variation(
+        self, state: Any, agent_id: int, action: int, depth: int
+    ) -> List[int]:
+        pv: List[int] = []
+        seen = set()
+        while action >= 0 and len(pv) < depth and not state.done:
+            pv.append(action)
+            seen.add(state.hash ^ agent_id)
+            state = self.env.step(state, agent_id, action)
+            agent_id = 1 - agent_id
+            key = state.hash ^ agent_id
+            entry = self.table.probe(key)
+            if key in seen or entry is None or entry.action is None:
+                break
+            action = int(entry.action[0])
+        return pv
+
+
+def _to_table(value: float, ply: int) -> float:
+    # Wins are stored relative to the node, so they can be reused at any ply.
+    if value >= WIN_VALUE - _MAX_PLY:
+        return value + ply
+    if value <= -(WIN_VALUE - _MAX_PLY):
+        return value - ply
+    return value
+
+
+def _from_table(value: float, ply: int) -> float:
+    if value >= WIN_VALUE - _MAX_PLY:
+        return value - ply
+    if value <= -(WIN_VALUE - _MAX_PLY):
+        return value + ply
+    return value
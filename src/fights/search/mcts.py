@@ -0,0 +1,517 @@
+"""
+Monte Carlo tree search for any fights environment.
+
+The tree lives in preallocated arrays indexed by node: the children of a node are
+stored next to each other, so a node only keeps the offset and the number of its
+children besides its visit count, value sum and prior. Selection and backup walk
+these arrays in Cython, and the subtree below the action actually played is kept
+for the next search.
+
+Leaves are valued by an :data:`Evaluator`, which defaults to random playouts run by
+the native ``rollout`` kernels of the environments (:class:`RolloutEvaluator`).
+Environments need ``legal_actions(state, agent_id, encoding="indices")`` and a
+``step`` accepting flat action indices, like the built-in ones.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from fights.base import BaseEnv
+from fights.envs import othello_bitboard, puoribor_cython, quoridor_cython
+
+from .mcts_cython import backup, select_leaf, subtree_order
+
+Evaluator = Callable[[Any, int, NDArray[np.intp]], Tuple[float, Optional[NDArray]]]
+"""
+Called with a state which is not done, the ID of the agent to move and the flat
+indices of its legal actions. Returns the value of the state for that agent,
+between ``-1`` and ``1``, and the prior probabilities of the actions, or ``None``
+for uniform priors.
+"""
+
+_MAX_DEPTH = 1024
+
+
+class RolloutEvaluator:
+    """
+    Value states by the outcome of uniformly random games played to the end, ``1``
+    for a win, ``-1`` for a loss and ``0`` for a draw or a game cut off after
+    ``max_plies``. Games are played by the ``rollout`` kernel of the environment,
+    so only Puoribor, Quoridor and 8x8 Othello are supported.
+
+    :arg env:
+        Environment of the states.
+
+    :arg num_rollouts:
+        Number of games played per state.
+
+    :arg max_plies:
+        Number of plies after which a game is cut off.
+
+    :arg seed:
+        Seed of the games. Every call draws a new seed from it.
+
+    :arg num_threads:
+        Number of threads of the kernel, ``0`` for the OpenMP default.
+    """
+
+    def __init__(
+        self,
+        env: BaseEnv[Any, Any],
+        num_rollouts: int = 1,
+        max_plies: int = 500,
+        seed: Optional[int] = None,
+        num_threads: int = 1,
+    ) -> None:
+        name = env.env_id[0]
+        if name == "othello" and getattr(env, "board_size", 8) != 8:
+            raise ValueError("rollouts require an 8x8 Othello board")
+        if name not in ("puoribor", "quoridor", "othello"):
+            raise ValueError(f"no rollout kernel for {name}")
+        self.name = name
+        self.board_size = getattr(env, "board_size", 9)
+        self.num_rollouts = num_rollouts
+        self.max_plies = max_plies
+        self.num_threads = num_threads
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(
+        self, state: Any, agent_id: int, actions: NDArray[np.intp]
+    ) -> Tuple[float, None]:
+        seed = int(self.rng.integers(1 << 63))
+        if self.name == "othello":
+            winners, _ = othello_bitboard.rollout(
+                state.board,
+                agent_id,
+                self.num_rollouts,
+                seed,
+                self.max_plies,
+                self.num_threads,
+            )
+        else:
+            kernel = puoribor_cython if self.name == "puoribor" else quoridor_cython
+            winners, _ = kernel.rollout(
+                state.board,
+                state.walls_remaining,
+                agent_id,
+                self.num_rollouts,
+                seed,
+                self.max_plies,
+                self.board_size,
+                self.num_threads,
+            )
+        wins = np.count_nonzero(winners == agent_id)
+        losses = np.count_nonzero(winners == 1 - agent_id)
+        return (wins - losses) / len(winners), None
+
+
+class MCTSResult(NamedTuple):
+    """
+    ``MCTSResult`` holds the outcome of :meth:`MCTS.search`.
+    """
+
+    action: int
+    """
+    Flat index of the most visited action.
+    """
+
+    value: float
+    """
+    Mean value of :attr:`action` for the agent to move, between ``-1`` and ``1``.
+    """
+
+    actions: NDArray[np.intp]
+    """
+    Flat indices of the legal actions at the root.
+    """
+
+    visits: NDArray[np.int_]
+    """
+    Visit count of each of :attr:`actions`.
+    """
+
+    simulations: int
+    """
+    Number of simulations run by this search.
+    """
+
+    tree_size: int
+    """
+    Number of nodes in the tree after the search.
+    """
+
+    reused: int
+    """
+    Number of visits of the root carried over from previous searches.
+    """
+
+    seconds: float
+    """
+    Wall clock time spent searching.
+    """
+
+    values: NDArray[np.float64]
+    """
+    Mean value of each of :attr:`actions` for the agent to move.
+    """
+
+    @property
+    def sims_per_sec(self) -> float:
+        """
+        Number of simulations run per second.
+        """
+        return self.simulations / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def policy(self) -> NDArray[np.float64]:
+        """
+        Visit counts of :attr:`actions` normalized to probabilities.
+        """
+        return self.visits / max(int(self.visits.sum()), 1)
+
+
+class MCTS:
+    """
+    Monte Carlo tree search engine. A node is expanded when it is first reached, and
+    its children are chosen by UCT, or by PUCT with the priors of the evaluator.
+    The tree is kept between searches, and :meth:`search` continues from the
+    matching node when given a state up to two plies below the last root. When the
+    tree is full, leaves are still evaluated but no longer expanded.
+
+    :arg env:
+        Environment to search in.
+
+    :arg evaluator:
+        Evaluator of the leaves, :class:`RolloutEvaluator` by default.
+
+    :arg exploration:
+        Exploration constant of the selection rule.
+
+    :arg selection:
+        ``"uct"`` or ``"puct"``.
+
+    :arg capacity:
+        Maximum number of nodes in the tree. It must at least hold the root and
+        its children.
+
+    :arg num_simulations:
+        Default simulation budget of :meth:`search`.
+
+    :arg time_limit:
+        Default time budget of :meth:`search` in seconds, or ``None`` for no limit.
+    """
+
+    def __init__(
+        self,
+        env: BaseEnv[Any, Any],
+        evaluator: Optional[Evaluator] = None,
+        exploration: float = 1.4,
+        selection: str = "uct",
+        capacity: int = 1 << 18,
+        num_simulations: Optional[int] = 1000,
+        time_limit: Optional[float] = None,
+    ) -> None:
+        if selection not in ("uct", "puct"):
+            raise ValueError(f"invalid selection: {selection}")
+        if capacity < 1:
+            raise ValueError(f"invalid capacity: {capacity}")
+        self.env = env
+        self.evaluator = evaluator if evaluator is not None else RolloutEvaluator(env)
+        self.exploration = exploration
+        self.puct = selection == "puct"
+        self.num_simulations = num_simulations
+        self.time_limit = time_limit
+        self.first_child = np.empty(capacity, dtype=np.int_)
+        self.num_children = np.empty(capacity, dtype=np.intc)
+        self.visits = np.empty(capacity, dtype=np.int_)
+        self.value_sums = np.empty(capacity, dtype=np.float64)
+        self.priors = np.empty(capacity, dtype=np.float64)
+        self.actions = np.empty(capacity, dtype=np.int_)
+        self.terminal_values = np.empty(capacity, dtype=np.float64)
+        self.states: Dict[int, Any] = {}
+        self._path = np.empty(_MAX_DEPTH, dtype=np.int_)
+        self.reset()
+
+    @property
+    def capacity(self) -> int:
+        """
+        Maximum number of nodes in the tree.
+        """
+        return len(self.first_child)
+
+    @property
+    def size(self) -> int:
+        """
+        Number of nodes in the tree.
+        """
+        return self._size
+
+    def reset(self, state: Any = None, agent_id: int = 0) -> None:
+        """
+        Drop the tree, and start a new one from ``state`` if given.
+
+        :arg state:
+            State of the new root.
+
+        :arg agent_id:
+            ID of the agent to move at the root.
+        """
+        self.states.clear()
+        self._size = 0
+        self.root_agent = agent_id
+        if state is not None:
+            self._new_nodes(1)
+            self.states[0] = state
+
+    def search(
+        self,
+        state: Any,
+        agent_id: int,
+        num_simulations: Optional[int] = None,
+        time_limit: Optional[float] = None,
+    ) -> MCTSResult:
+        """
+        Run simulations from a state until ``num_simulations`` have run or
+        ``time_limit`` runs out, whichever comes first. At least one simulation
+        is run.
+
+        :arg state:
+            State to search from, which must not be done.
+
+        :arg agent_id:
+            ID of the agent to move. (``0`` or ``1``)
+
+        :arg num_simulations:
+            Simulation budget, overriding the one of the engine.
+
+        :arg time_limit:
+            Time budget in seconds, overriding the one of the engine.
+
+        :returns:
+            A :obj:`MCTSResult` object.
+        """
+        if state.done:
+            raise ValueError("cannot search from a finished game")
+        num_simulations = (
+            self.num_simulations if num_simulations is None else num_simulations
+        )
+        time_limit = self.time_limit if time_limit is None else time_limit
+        if num_simulations is None and time_limit is None:
+            raise ValueError("either num_simulations or time_limit must be given")
+
+        self._find_root(state, agent_id)
+        if self.first_child[0] < 0:
+            env: Any = self.env
+            count = len(env.legal_actions(state, agent_id, encoding="indices"))
+            if 1 + count > self.capacity:
+                raise ValueError(
+                    f"capacity {self.capacity} cannot hold the root and its "
+                    f"{count} children"
+                )
+        reused = int(self.visits[0])
+        start = time.perf_counter()
+        deadline = None if time_limit is None else start + time_limit
+        simulations = self._run(num_simulations, deadline)
+        seconds = time.perf_counter() - start
+
+        first, count = int(self.first_child[0]), int(self.num_children[0])
+        children = slice(first, first + count)
+        visits = self.visits[children].copy()
+        values = self.value_sums[children] / np.maximum(visits, 1)
+        best = int(np.argmax(visits))
+        return MCTSResult(
+            action=int(self.actions[first + best]),
+            value=float(values[best]),
+            actions=self.actions[children].copy(),
+            visits=visits,
+            simulations=simulations,
+            tree_size=self._size,
+            reused=reused,
+            seconds=seconds,
+            values=values,
+        )
+
+    def advance(self, action: int) -> None:
+        """
+        Move the root to the child reached by ``action`` and free the rest of the
+        tree. The tree is dropped if the root has no such child.
+
+        :arg action:
+            Flat index of the action played at the root.
+        """
+        child = self._child(0, action) if self._size else -1
+        if child < 0:
+            self.reset(agent_id=1 - self.root_agent)
+            return
+        state = self._state(child, 0, self.root_agent)
+        self._compact(child)
+        self.root_agent = 1 - self.root_agent
+        self.states[0] = state
+
+    def _find_root(self, state: Any, agent_id: int) -> None:
+        if self._size:
+            path: Optional[List[int]] = None
+            if agent_id == self.root_agent and self._same(self.states[0], state):
+                path = []
+            else:
+                path = self._find(state, 1 if agent_id != self.root_agent else 2)
+            if path is not None:
+                for action in path:
+                    self.advance(action)
+                # Keep the caller's object as the root so its cached fields are reused.
+                self.states[0] = state
+                return
+        self.reset(state, agent_id)
+
+    def _find(self, state: Any, depth: int, node: int = 0) -> Optional[List[int]]:
+        # Nodes are expanded when first visited, so only expanded nodes are worth
+        # reusing, and those keep their state.
+        first, count = int(self.first_child[node]), int(self.num_children[node])
+        if first < 0:
+            return None
+        for child in range(first, first + count):
+            if child not in self.states:
+                continue
+            action = int(self.actions[child])
+            if depth == 1:
+                if self._same(self.states[child], state):
+                    return [action]
+            else:
+                path = self._find(state, depth - 1, child)
+                if path is not None:
+                    return [action] + path
+        return None
+
+    def _same(self, a: Any, b: Any) -> bool:
+        return a.hash == b.hash and np.array_equal(a.board, b.board)
+
+    def _run(self, num_simulations: Optional[int], deadline: Optional[float]) -> int:
+        simulations = 0
+        while True:
+            length = self._select(self._path)
+            value, state, actions = self._leaf(self._path, length)
+            if state is not None:
+                value, priors = self.evaluator(state, self._agent(length), actions)
+                self._expand(int(self._path[length - 1]), state, actions, priors)
+            backup(self._path, length, value, self.visits, self.value_sums)
+            simulations += 1
+            if num_simulations is not None and simulations >= num_simulations:
+                return simulations
+            if deadline is not None and time.perf_counter() >= deadline:
+                return simulations
+
+    def _select(self, path: NDArray[np.int_]) -> int:
+        return select_leaf(
+            0,
+            self.first_child,
+            self.num_children,
+            self.visits,
+            self.value_sums,
+            self.priors,
+            self.exploration,
+            self.puct,
+            path,
+        )
+
+    def _agent(self, length: int) -> int:
+        # The agent to move alternates every ply, skips included.
+        return self.root_agent ^ ((length - 1) & 1)
+
+    def _leaf(self, path: NDArray[np.int_], length: int) -> Tuple[float, Any, Any]:
+        """
+        Return the value of a finished game at the end of ``path``, or ``nan`` with
+        the state and the legal actions to evaluate.
+        """
+        node = int(path[length - 1])
+        value = float(self.terminal_values[node])
+        if not np.isnan(value):
+            return value, None, None
+        agent_id = self._agent(length)
+        parent = int(path[length - 2]) if length > 1 else -1
+        state = self._state(node, parent, 1 - agent_id)
+        if state.done:
+            if hasattr(state, "reward"):
+                value = float(np.sign(state.reward[agent_id]))
+            else:
+                # The agent who moved into a finished game won it.
+                value = -1.0
+            self.terminal_values[node] = value
+            return value, None, None
+        env: Any = self.env
+        return np.nan, state, env.legal_actions(state, agent_id, encoding="indices")
+
+    def _expand(
+        self,
+        node: int,
+        state: Any,
+        actions: NDArray[np.intp],
+        priors: Optional[NDArray],
+    ) -> None:
+        if self.first_child[node] < 0 and self._size + len(actions) <= self.capacity:
+            first = self._new_nodes(len(actions))
+            self.first_child[node] = first
+            self.num_children[node] = len(actions)
+            self.actions[first : first + len(actions)] = actions
+            self.priors[first : first + len(actions)] = (
+                1 / len(actions) if priors is None else priors
+            )
+            self.states[node] = state
+
+    def _state(self, node: int, parent: int, parent_agent: int) -> Any:
+        state = self.states.get(node)
+        if state is None:
+            state = self.env.step(
+                self.states[parent], parent_agent, int(self.actions[node])
+            )
+        return state
+
+    def _child(self, node: int, action: int) -> int:
+        first, count = int(self.first_child[node]), int(self.num_children[node])
+        if first < 0:
+            return -1
+        children = np.flatnonzero(self.actions[first : first + count] == action)
+        return first + int(children[0]) if len(children) else -1
+
+    def _new_nodes(self, count: int) -> int:
+        first = self._size
+        end = first + count
+        self.first_child[first:end] = -1
+        self.num_children[first:end] = 0
+        self.visits[first:end] = 0
+        self.value_sums[first:end] = 0
+        self.priors[first:end] = 0
+        self.actions[first:end] = -1
+        self.terminal_values[first:end] = np.nan
+        self._size = end
+        return first
+
+    def _compact(self, root: int) -> None:
+        order = np.empty(self._size, dtype=np.int_)
+        size = subtree_order(root, self.first_child, self.num_children, order)
+        order = order[:size]
+        relabel = np.full(self._size, -1, dtype=np.int_)
+        relabel[order] = np.arange(size)
+        first_child = self.first_child[order]
+        expanded = first_child >= 0
+        first_child[expanded] = relabel[first_child[expanded]]
+        self.first_child[:size] = first_child
+        for array in (
+            self.num_children,
+            self.visits,
+            self.value_sums,
+            self.priors,
+            self.actions,
+            self.terminal_values,
+        ):
+            array[:size] = array[order]
+        self.states = {
+            int(relabel[node]): state
+            for node, state in self.states.items()
+            if relabel[node] >= 0
+        }
+        self._size = size
@@ -0,0 +1,31 @@
+import numpy as np
+
+def select_leaf(
+    root: int,
+    first_child: np.ndarray,
+    num_children: np.ndarray,
+    visits: np.ndarray,
+    value_sums: np.ndarray,
+    priors: np.ndarray,
+    exploration: float,
+    puct: bool,
+    path: np.ndarray,
+) -> int: ...
+def backup(
+    path: np.ndarray,
+    length: int,
+    value: float,
+    visits: np.ndarray,
+    value_sums: np.ndarray,
+) -> None: ...
+def virtual_loss(
+    path: np.ndarray,
+    length: int,
+    count: int,
+    loss: float,
+    visits: np.ndarray,
+    value_sums: np.ndarray,
+) -> None: ...
+def subtree_order(
+    root: int, first_child: np.ndarray, num_children: np.ndarray, order: np.ndarray
+) -> int: ...
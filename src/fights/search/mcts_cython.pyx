@@ -0,0 +1,133 @@
+#cython: language_level=3, boundscheck=False, wraparound=False, initializedcheck=False, cdivision=True
+
+"""
+Tree walks of ``fights.search.mcts``. Nodes are rows of the arrays of
+``MCTS``, and the children of a node are the ``num_children[node]`` rows starting
+at ``first_child[node]``, which is ``-1`` until the node is expanded. The value sum
+of a node is seen by the agent who moved into it.
+"""
+
+from libc.math cimport INFINITY, log, sqrt
+
+
+def select_leaf(
+    long root,
+    const long [:] first_child,
+    const int [:] num_children,
+    const long [:] visits,
+    const double [:] value_sums,
+    const double [:] priors,
+    double exploration,
+    bint puct,
+    long [:] path,
+):
+    """
+    Walk from ``root`` to a node which is not expanded, picking the child with the
+    highest UCT score, or PUCT score if ``puct`` is set, at every step. The nodes
+    are written to ``path`` starting with ``root``, and their number is returned.
+    """
+    cdef int length
+    with nogil:
+        length = _select_leaf(
+            root, first_child, num_children, visits, value_sums, priors,
+            exploration, puct, path,
+        )
+    return length
+
+
+def backup(const long [:] path, int length, double value, long [:] visits, double [:] value_sums):
+    """
+    Add a visit and ``value`` to the nodes of ``path``, where ``value`` is seen by
+    the agent to move at its last node. The sign of the value flips every ply.
+    """
+    with nogil:
+        _backup(path, length, value, visits, value_sums)
+
+
+def virtual_loss(
+    const long [:] path, int length, int count, double loss, long [:] visits, double [:] value_sums
+):
+    """
+    Add ``count`` visits losing ``loss`` each to the nodes of ``path``, so the
+    other threads sharing the tree pick different paths while it is evaluated.
+    A negative ``count`` takes them back.
+    """
+    cdef int i
+    with nogil:
+        for i in range(length):
+            visits[path[i]] += count
+            value_sums[path[i]] -= count * loss
+
+
+cdef int _select_leaf(
+    long root,
+    const long [:] first_child,
+    const int [:] num_children,
+    const long [:] visits,
+    const double [:] value_sums,
+    const double [:] priors,
+    double exploration,
+    bint puct,
+    long [:] path,
+) noexcept nogil:
+    cdef long node = root, child, best
+    cdef int length = 1
+    cdef double score, best_score, scale
+    path[0] = root
+    while first_child[node] >= 0 and num_children[node] > 0 and length < path.shape[0]:
+        if puct:
+            scale = exploration * sqrt(<double>visits[node])
+        else:
+            scale = exploration * sqrt(log(<double>visits[node] + 1))
+        best = first_child[node]
+        best_score = -INFINITY
+        for child in range(first_child[node], first_child[node] + num_children[node]):
+            if puct:
+                score = scale * priors[child] / (1 + visits[child])
+                if visits[child]:
+                    score += value_sums[child] / visits[child]
+            elif visits[child]:
+                score = value_sums[child] / visits[child] + scale / sqrt(<double>visits[child])
+            else:
+                # Every child is tried once before any is tried twice.
+                best = child
+                break
+            if score > best_score:
+                best_score = score
+                best = child
+        node = best
+        path[length] = node
+        length += 1
+    return length
+
+
+cdef void _backup(
+    const long [:] path, int length, double value, long [:] visits, double [:] value_sums
+) noexcept nogil:
+    cdef int i
+    for i in range(length - 1, -1, -1):
+        value = -value
+        visits[path[i]] += 1
+        value_sums[path[i]] += value
+
+
+def subtree_order(long root, const long [:] first_child, const int [:] num_children, long [:] order):
+    """
+    Write the nodes of the subtree of ``root`` to ``order`` in breadth-first order,
+    which keeps the children of every node next to each other, and return their
+    number. Relabelling node ``order[i]`` as ``i`` packs the subtree at the start
+    of the arrays.
+    """
+    cdef Py_ssize_t head = 0, tail = 1
+    cdef long node, child
+    with nogil:
+        order[0] = root
+        while head < tail:
+            node = order[head]
+            head += 1
+            if first_child[node] < 0:
+                continue
+            for child in range(first_child[node], first_child[node] + num_children[node]):
+                order[tail] = child
+                tail += 1
+    return tail
@@ -0,0 +1,478 @@
+"""
+Parallel versions of the search engines.
+
+Root parallelism runs independent engines in worker processes and merges their
+results: :class:`RootParallelMCTS` adds up the root visit counts of one tree per
+worker, and :class:`RootParallelAlphaBeta` splits the root actions between the
+workers and keeps the best score. Workers are started once with the ``spawn``
+method and keep their engines, tables and trees between searches, so the
+environment, evaluators and states sent to them must be picklable.
+
+Tree parallelism shares one tree between threads: :class:`TreeParallelMCTS`
+selects and backs up under a lock and evaluates leaves outside of it, adding a
+virtual loss to the nodes of the paths being evaluated so the threads spread over
+the tree. It only scales with evaluators which release the GIL, like the native
+rollouts of :class:`~fights.search.mcts.RolloutEvaluator` or batched models.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from fights.base import BaseEnv
+
+from .alphabeta import AlphaBetaSearch, Evaluation, SearchResult
+from .mcts import _MAX_DEPTH, MCTS, Evaluator, MCTSResult, RolloutEvaluator
+from .mcts_cython import backup, virtual_loss
+
+
+def _count(count: Optional[int]) -> int:
+    return (os.cpu_count() or 1) if count is None else count
+
+
+def _serve(connection: Connection, build: Callable[..., Any], args: Tuple) -> None:
+    try:
+        engine, failure = build(*args), None
+    except Exception as error:
+        # Report the failure on every call rather than leaving the pipe broken.
+        engine, failure = None, error
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        method, method_args = message
+        try:
+            result = failure or getattr(engine, method)(*method_args)
+        except Exception as error:
+            result = error
+        connection.send(result)
+    connection.close()
+
+
+class _Workers:
+    """
+    Worker processes, each holding the engine built by ``build(*args, index)``.
+    """
+
+    def __init__(self, num_workers: int, build: Callable[..., Any], args: Tuple):
+        if num_workers < 1:
+            raise ValueError(f"invalid num_workers: {num_workers}")
+        context = multiprocessing.get_context("spawn")
+        self.connections: List[Connection] = []
+        self.processes: List[Any] = []
+        for index in range(num_workers):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(
+                target=_serve,
+                args=(worker_connection, build, args + (index,)),
+                daemon=True,
+            )
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def __len__(self) -> int:
+        return len(self.connections)
+
+    def call(self, method: str, args: Sequence[Tuple]) -> List[Any]:
+        """
+        Call ``method`` on the engines of the first ``len(args)`` workers at once,
+        with one tuple of arguments each, and return their results in order.
+        """
+        connections = self.connections[: len(args)]
+        for connection, method_args in zip(connections, args):
+            connection.send((method, method_args))
+        results = [connection.recv() for connection in connections]
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def close(self) -> None:
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections, self.processes = [], []
+
+
+def _build_mcts(
+    env: BaseEnv[Any, Any],
+    evaluator_factory: Optional[Callable[[int], Evaluator]],
+    seed: Optional[int],
+    options: dict,
+    index: int,
+) -> MCTS:
+    if evaluator_factory is not None:
+        evaluator = evaluator_factory(index)
+    else:
+        evaluator = RolloutEvaluator(env, seed=None if seed is None else seed + index)
+    return MCTS(env, evaluator, **options)
+
+
+def _build_alphabeta(
+    env: BaseEnv[Any, Any],
+    evaluation: Optional[Evaluation],
+    options: dict,
+    index: int,
+) -> AlphaBetaSearch:
+    return AlphaBetaSearch(env, evaluation, **options)
+
+
+class RootParallelMCTS:
+    """
+    Root-parallel Monte Carlo tree search. Every worker process grows its own tree
+    from the same state with its own random seed, and the visit counts and value
+    sums of the root actions are added up. Each tree is reused between moves like
+    the one of :class:`~fights.search.mcts.MCTS`.
+
+    :arg env:
+        Environment to search in.
+
+    :arg num_workers:
+        Number of worker processes, the number of CPUs by default.
+
+    :arg evaluator_factory:
+        Called in each worker with its index to create its evaluator. Defaults to
+        :class:`~fights.search.mcts.RolloutEvaluator`.
+
+    :arg seed:
+        Seed of the default evaluators. Worker ``i`` uses ``seed + i``.
+
+    :arg exploration:
+        Exploration constant of the selection rule.
+
+    :arg selection:
+        ``"uct"`` or ``"puct"``.
+
+    :arg capacity:
+        Maximum number of nodes in the tree of each worker.
+
+    :arg num_simulations:
+        Default simulation budget of each worker in :meth:`search`.
+
+    :arg time_limit:
+        Default time budget of :meth:`search` in seconds, or ``None`` for no limit.
+    """
+
+    def __init__(
+        self,
+        env: BaseEnv[Any, Any],
+        num_workers: Optional[int] = None,
+        evaluator_factory: Optional[Callable[[int], Evaluator]] = None,
+        seed: Optional[int] = None,
+        exploration: float = 1.4,
+        selection: str = "uct",
+        capacity: int = 1 << 18,
+        num_simulations: Optional[int] = 1000,
+        time_limit: Optional[float] = None,
+    ) -> None:
+        options = dict(
+            exploration=exploration,
+            selection=selection,
+            capacity=capacity,
+            num_simulations=num_simulations,
+            time_limit=time_limit,
+        )
+        self.env = env
+        self.workers = _Workers(
+            _count(num_workers),
+            _build_mcts,
+            (env, evaluator_factory, seed, options),
+        )
+
+    def __enter__(self) -> RootParallelMCTS:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop the worker processes.
+        """
+        self.workers.close()
+
+    def search(
+        self,
+        state: Any,
+        agent_id: int,
+        num_simulations: Optional[int] = None,
+        time_limit: Optional[float] = None,
+    ) -> MCTSResult:
+        """
+        Search from a state in every worker, like :meth:`MCTS.search
+        <fights.search.mcts.MCTS.search>`.
+
+        :arg state:
+            State to search from, which must not be done.
+
+        :arg agent_id:
+            ID of the agent to move. (``0`` or ``1``)
+
+        :arg num_simulations:
+            Simulation budget of each worker, overriding the one of the engine.
+
+        :arg time_limit:
+            Time budget in seconds, overriding the one of the engine.
+
+        :returns:
+            A :obj:`~fights.search.mcts.MCTSResult` object, whose counts are the
+            sums over the workers.
+        """
+        start = time.perf_counter()
+        args = (state, agent_id, num_simulations, time_limit)
+        results: List[MCTSResult] = self.workers.call(
+            "search", [args] * len(self.workers)
+        )
+        actions = np.unique(np.concatenate([result.actions for result in results]))
+        visits = np.zeros(len(actions), dtype=np.int_)
+        value_sums = np.zeros(len(actions))
+        for result in results:
+            index = np.searchsorted(actions, result.actions)
+            visits[index] += result.visits
+            value_sums[index] += result.values * result.visits
+        values = value_sums / np.maximum(visits, 1)
+        best = int(np.argmax(visits))
+        return MCTSResult(
+            action=int(actions[best]),
+            value=float(values[best]),
+            actions=actions,
+            visits=visits,
+            simulations=sum(result.simulations for result in results),
+            tree_size=sum(result.tree_size for result in results),
+            reused=sum(result.reused for result in results),
+            seconds=time.perf_counter() - start,
+            values=values,
+        )
+
+
+class RootParallelAlphaBeta:
+    """
+    Root-parallel alpha-beta search. The legal actions of the root are dealt to
+    the worker processes, which search them with their own
+    :class:`~fights.search.alphabeta.AlphaBetaSearch` and transposition table. The
+    best action is taken at the deepest iteration completed by every worker.
+
+    :arg env:
+        Environment to search in.
+
+    :arg num_workers:
+        Number of worker processes, the number of CPUs by default.
+
+    :arg evaluation:
+        Evaluation of the leaves, as in
+        :class:`~fights.search.alphabeta.AlphaBetaSearch`.
+
+    :arg max_depth:
+        Default depth limit of :meth:`search`.
+
+    :arg time_limit:
+        Default time budget of :meth:`search` in seconds, or ``None`` for no limit.
+    """
+
+    def __init__(
+        self,
+        env: BaseEnv[Any, Any],
+        num_workers: Optional[int] = None,
+        evaluation: Optional[Evaluation] = None,
+        max_depth: int = 64,
+        time_limit: Optional[float] = None,
+    ) -> None:
+        options = dict(max_depth=max_depth, time_limit=time_limit)
+        self.env = env
+        self.workers = _Workers(
+            _count(num_workers),
+            _build_alphabeta,
+            (env, evaluation, options),
+        )
+
+    def __enter__(self) -> RootParallelAlphaBeta:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop the worker processes.
+        """
+        self.workers.close()
+
+    def search(
+        self,
+        state: Any,
+        agent_id: int,
+        max_depth: Optional[int] = None,
+        time_limit: Optional[float] = None,
+    ) -> SearchResult:
+        """
+        Search for the best action of an agent, like :meth:`AlphaBetaSearch.search
+        <fights.search.alphabeta.AlphaBetaSearch.search>`.
+
+        :arg state:
+            State to search from, which must not be done.
+
+        :arg agent_id:
+            ID of the agent to move. (``0`` or ``1``)
+
+        :arg max_depth:
+            Depth limit, overriding the one of the engine.
+
+        :arg time_limit:
+            Time budget in seconds, overriding the one of the engine.
+
+        :returns:
+            A :obj:`~fights.search.alphabeta.SearchResult` object, whose node
+            counts are the sums over the workers.
+        """
+        if state.done:
+            raise ValueError("cannot search from a finished game")
+        start = time.perf_counter()
+        env: Any = self.env
+        legal = env.legal_actions(state, agent_id, encoding="indices")
+        args = [
+            (state, agent_id, max_depth, time_limit, legal[index :: len(self.workers)])
+            for index in range(min(len(self.workers), len(legal)))
+        ]
+        results: List[SearchResult] = self.workers.call("search", args)
+
+        depth = min(result.depth for result in results)
+        iteration_actions, iteration_values = [], []
+        for iteration in range(depth):
+            best = max(results, key=lambda result: result.iteration_values[iteration])
+            iteration_actions.append(best.iteration_actions[iteration])
+            iteration_values.append(best.iteration_values[iteration])
+        best = max(results, key=lambda result: result.iteration_values[depth - 1])
+        action = iteration_actions[-1]
+        return SearchResult(
+            action=action,
+            value=iteration_values[-1],
+            depth=depth,
+            pv=best.pv if best.depth == depth else [action],
+            nodes=sum(result.nodes for result in results),
+            iteration_nodes=[
+                sum(result.iteration_nodes[iteration] for result in results)
+                for iteration in range(depth)
+            ],
+            seconds=time.perf_counter() - start,
+            iteration_actions=iteration_actions,
+            iteration_values=iteration_values,
+        )
+
+
+class TreeParallelMCTS(MCTS):
+    """
+    Tree-parallel Monte Carlo tree search, with threads sharing the tree of an
+    :class:`~fights.search.mcts.MCTS`. The evaluator is called from several threads
+    at once and must be thread-safe.
+
+    :arg env:
+        Environment to search in.
+
+    :arg evaluator:
+        Evaluator of the leaves, :class:`~fights.search.mcts.RolloutEvaluator` by
+        default.
+
+    :arg num_threads:
+        Number of threads, the number of CPUs by default.
+
+    :arg virtual_loss:
+        Value lost by every node of a path while its leaf is evaluated.
+
+    Other arguments are those of :class:`~fights.search.mcts.MCTS`.
+    """
+
+    def __init__(
+        self,
+        env: BaseEnv[Any, Any],
+        evaluator: Optional[Evaluator] = None,
+        num_threads: Optional[int] = None,
+        virtual_loss: float = 1.0,
+        exploration: float = 1.4,
+        selection: str = "uct",
+        capacity: int = 1 << 18,
+        num_simulations: Optional[int] = 1000,
+        time_limit: Optional[float] = None,
+    ) -> None:
+        super().__init__(
+            env,
+            evaluator,
+            exploration=exploration,
+            selection=selection,
+            capacity=capacity,
+            num_simulations=num_simulations,
+            time_limit=time_limit,
+        )
+        self.num_threads = _count(num_threads)
+        if self.num_threads < 1:
+            raise ValueError(f"invalid num_threads: {num_threads}")
+        self.virtual_loss = virtual_loss
+        self._lock = threading.Lock()
+
+    def _run(self, num_simulations: Optional[int], deadline: Optional[float]) -> int:
+        started, finished = 0, 0
+        errors: List[Exception] = []
+
+        def done() -> bool:
+            if errors:
+                return True
+            if not started:
+                return False
+            if num_simulations is not None and started >= num_simulations:
+                return True
+            return deadline is not None and time.perf_counter() >= deadline
+
+        def work() -> None:
+            nonlocal started, finished
+            path: NDArray[np.int_] = np.empty(_MAX_DEPTH, dtype=np.int_)
+            try:
+                while True:
+                    with self._lock:
+                        if done():
+                            return
+                        started += 1
+                        length = self._select(path)
+                        self._virtual_loss(path, length, 1)
+                        value, state, actions = self._leaf(path, length)
+                    if state is not None:
+                        value, priors = self.evaluator(
+                            state, self._agent(length), actions
+                        )
+                    with self._lock:
+                        if state is not None:
+                            self._expand(int(path[length - 1]), state, actions, priors)
+                        self._virtual_loss(path, length, -1)
+                        backup(path, length, value, self.visits, self.value_sums)
+                        finished += 1
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=work) for _ in range(self.num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            # Virtual losses of the failed simulations are still in the tree.
+            self.reset()
+            raise errors[0]
+        return finished
+
+    def _virtual_loss(self, path: NDArray[np.int_], length: int, count: int) -> None:
+        virtual_loss(
+            path, length, count, self.virtual_loss, self.visits, self.value_sums
+        )
@@ -0,0 +1,239 @@
+"""
+Fixed-size transposition table keyed by the Zobrist ``hash`` of fights states.
+
+Every bucket holds two entries. The first one is depth-preferred, and keeps the
+deepest search result of the current generation. The second one is always
+replaced, and keeps the most recent result which did not fit in the first one.
+Call :meth:`TranspositionTable.new_search` before every search, so that entries
+left over from earlier moves are replaced first.
+
+States do not record which agent is to move. If the same position can be searched
+with either agent to move, mix it into the key, e.g. ``state.hash ^ agent_id``.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+BOUND_NONE = 0
+"""
+Bound type of an empty entry.
+"""
+
+BOUND_EXACT = 1
+"""
+Bound type of an exact value, searched with a full window.
+"""
+
+BOUND_LOWER = 2
+"""
+Bound type of a lower bound, from a search which failed high.
+"""
+
+BOUND_UPPER = 3
+"""
+Bound type of an upper bound, from a search which failed low.
+"""
+
+
+class TTEntry(NamedTuple):
+    """
+    ``TTEntry`` is a copy of a transposition table entry returned by
+    :meth:`TranspositionTable.probe`.
+    """
+
+    depth: int
+    """
+    Remaining search depth of the stored result.
+    """
+
+    bound: int
+    """
+    One of ``BOUND_EXACT``, ``BOUND_LOWER`` and ``BOUND_UPPER``.
+    """
+
+    value: float
+    """
+    Stored search value.
+    """
+
+    action: Optional[NDArray[np.int_]]
+    """
+    Best action found by the search, or ``None`` if it was not stored.
+    """
+
+    def cutoff(self, depth: int, alpha: float, beta: float) -> Optional[float]:
+        """
+        Check whether the entry makes searching the position unnecessary.
+
+        :arg depth:
+            Remaining depth of the search which probed the entry.
+
+        :arg alpha:
+            Lower bound of the search window.
+
+        :arg beta:
+            Upper bound of the search window.
+
+        :returns:
+            The value to return from the search, or ``None`` if the position has to
+            be searched.
+        """
+        if self.depth < depth:
+            return None
+        if self.bound == BOUND_EXACT:
+            return self.value
+        if self.bound == BOUND_LOWER and self.value >= beta:
+            return self.value
+        if self.bound == BOUND_UPPER and self.value <= alpha:
+            return self.value
+        return None
+
+
+class TranspositionTable:
+    """
+    Transposition table stored in preallocated numpy arrays.
+
+    :arg size:
+        Number of buckets. Rounded down to a power of two.
+
+    :arg action_size:
+        Length of the stored actions. (``3`` for Puoribor and Quoridor, ``2`` for
+        Othello)
+    """
+
+    def __init__(self, size: int = 1 << 20, action_size: int = 3) -> None:
+        if size < 1:
+            raise ValueError(f"invalid size: {size}")
+        buckets = 1 << (size.bit_length() - 1)
+        self.mask = buckets - 1
+        self.keys = np.zeros((buckets, 2), dtype=np.uint64)
+        self.depths = np.zeros((buckets, 2), dtype=np.int16)
+        self.bounds = np.zeros((buckets, 2), dtype=np.int8)
+        self.values = np.zeros((buckets, 2), dtype=np.float64)
+        self.actions = np.zeros((buckets, 2, action_size), dtype=np.int16)
+        self.has_action = np.zeros((buckets, 2), dtype=np.bool_)
+        self.generations = np.zeros((buckets, 2), dtype=np.uint8)
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.bounds))
+
+    @property
+    def capacity(self) -> int:
+        """
+        Total number of entries the table can hold.
+        """
+        return self.keys.size
+
+    def new_search(self) -> None:
+        """
+        Advance the generation counter. Entries stored before are kept and can
+        still be probed, but are replaced before the ones of the new search.
+        """
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the statistics.
+        """
+        self.bounds[:] = BOUND_NONE
+        self.has_action[:] = False
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, hash: int) -> Optional[TTEntry]:
+        """
+        Look up a position.
+
+        :arg hash:
+            Zobrist hash of the position, usually ``state.hash``.
+
+        :returns:
+            The stored entry, or ``None`` if the position is not in the table.
+        """
+        self.probes += 1
+        index = hash & self.mask
+        key = np.uint64(hash)
+        for slot in range(2):
+            if self.bounds[index, slot] and self.keys[index, slot] == key:
+                self.hits += 1
+                self.generations[index, slot] = self.generation
+                return TTEntry(
+                    int(self.depths[index, slot]),
+                    int(self.bounds[index, slot]),
+                    float(self.values[index, slot]),
+                    (
+                        np.array(self.actions[index, slot], dtype=np.int_)
+                        if self.has_action[index, slot]
+                        else None
+                    ),
+                )
+        return None
+
+    def store(
+        self,
+        hash: int,
+        depth: int,
+        bound: int,
+        value: float,
+        action: Optional[ArrayLike] = None,
+    ) -> None:
+        """
+        Store a search result.
+
+        :arg hash:
+            Zobrist hash of the position, usually ``state.hash``.
+
+        :arg depth:
+            Remaining depth of the search.
+
+        :arg bound:
+            One of ``BOUND_EXACT``, ``BOUND_LOWER`` and ``BOUND_UPPER``.
+
+        :arg value:
+            Search value.
+
+        :arg action:
+            Best action found, if any. When omitted, the best action already stored
+            for the same position is kept.
+        """
+        if bound not in (BOUND_EXACT, BOUND_LOWER, BOUND_UPPER):
+            raise ValueError(f"invalid bound: {bound}")
+
+        index = hash & self.mask
+        key = np.uint64(hash)
+        same = [
+            bool(self.bounds[index, i]) and self.keys[index, i] == key for i in (0, 1)
+        ]
+        if (
+            not self.bounds[index, 0]
+            or same[0]
+            or self.generations[index, 0] != self.generation
+            or depth >= self.depths[index, 0]
+        ):
+            slot = 0
+        else:
+            slot = 1
+
+        if action is not None:
+            self.actions[index, slot] = action
+            self.has_action[index, slot] = True
+        elif same[1 - slot]:
+            self.actions[index, slot] = self.actions[index, 1 - slot]
+            self.has_action[index, slot] = self.has_action[index, 1 - slot]
+        elif not same[slot]:
+            self.has_action[index, slot] = False
+        if same[1 - slot]:
+            self.bounds[index, 1 - slot] = BOUND_NONE
+        self.keys[index, slot] = key
+        self.depths[index, slot] = depth
+        self.bounds[index, slot] = bound
+        self.values[index, slot] = value
+        self.generations[index, slot] = self.generation
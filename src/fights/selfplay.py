@@ -0,0 +1,305 @@
+"""
+Play games across a :mod:`multiprocessing` pool for self-play data generation.
+Trajectories are written by the workers straight into
+:mod:`multiprocessing.shared_memory` arrays allocated by the parent, so nothing but
+game indices is pickled between processes. Requires Python 3.8 or later.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import random
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from fights.base import BaseAgent, BaseEnv
+from fights.envs import othello, puoribor, quoridor, resolve
+from fights.vector import OthelloVectorEnv, PuoriborVectorEnv, QuoridorVectorEnv
+
+AgentFactory = Callable[[int, int], BaseAgent[Any, Any]]
+"""
+Called with an agent ID and a seed, returns a new agent. Agent classes taking
+``(agent_id, seed)`` can be used as is. Factories are sent to the workers, so they
+must be picklable when the ``spawn`` start method is used.
+"""
+
+_ACTION_SIZES = {
+    vector_env_class.env_id[0]: vector_env_class.action_size
+    for vector_env_class in (PuoriborVectorEnv, QuoridorVectorEnv, OthelloVectorEnv)
+}
+
+_DECODERS = {
+    "othello": othello.decode_actions,
+    "puoribor": puoribor.decode_actions,
+    "quoridor": quoridor.decode_actions,
+}
+
+_Layout = Dict[str, Tuple[Tuple[int, ...], Any]]
+
+
+class SelfPlayResult(NamedTuple):
+    """
+    ``SelfPlayResult`` holds the trajectories of the games played by
+    :func:`run_selfplay`. Game ``i`` is stored at index ``i`` of every array, and
+    entries past its last ply are zero.
+    """
+
+    boards: NDArray[np.int8]
+    """
+    Boards of shape ``(num_games, max_plies + 1, C, W, H)``, where
+    ``boards[i, t]`` is the board of game ``i`` before ply ``t`` and
+    ``boards[i, plies[i]]`` is its final board.
+    """
+
+    walls_remaining: Optional[NDArray[np.int8]]
+    """
+    Remaining walls of shape ``(num_games, max_plies + 1, 2)``, laid out like
+    :attr:`boards`, or ``None`` for environments without walls.
+    """
+
+    actions: NDArray[np.int16]
+    """
+    Actions of shape ``(num_games, max_plies, action_size)``. Agent ``0`` takes the
+    even plies and agent ``1`` the odd ones.
+    """
+
+    plies: NDArray[np.int32]
+    """
+    Number of actions taken in each game, of shape ``(num_games,)``.
+    """
+
+    rewards: NDArray[np.int8]
+    """
+    Final rewards of shape ``(num_games, 2)``, which is ``1`` for the winner, ``-1``
+    for the loser and ``0`` for draws and games cut off at ``max_plies``.
+    """
+
+    seconds: float
+    """
+    Wall clock time spent playing the games.
+    """
+
+    @property
+    def games_per_sec(self) -> float:
+        """
+        Number of games played per second.
+        """
+        return len(self.plies) / self.seconds
+
+    @property
+    def plies_per_sec(self) -> float:
+        """
+        Number of actions taken per second.
+        """
+        return int(self.plies.sum()) / self.seconds
+
+
+def game_seeds(seed: int, index: int) -> Tuple[int, int]:
+    """
+    Derive the seeds of the two agents of a game. Seeds depend only on ``seed`` and
+    the index of the game, so results do not depend on the number of workers or on
+    which worker plays the game.
+
+    :arg seed:
+        Seed of the whole run.
+
+    :arg index:
+        Index of the game.
+
+    :returns:
+        Seeds of agent ``0`` and agent ``1``.
+    """
+    state = np.random.SeedSequence(seed, spawn_key=(index,)).generate_state(2)
+    return int(state[0]), int(state[1])
+
+
+# Per-process state of the workers, set up once by ``_init_worker``.
+_worker: Dict[str, Any] = {}
+
+
+def _attach(name: str, shape: Tuple[int, ...], dtype: Any) -> Tuple[Any, NDArray]:
+    from multiprocessing import shared_memory
+
+    # Workers share the resource tracker of the parent, which unlinks the block.
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _init_worker(
+    env_name: str,
+    agent_factories: Sequence[AgentFactory],
+    max_plies: int,
+    seed: int,
+    names: Dict[str, str],
+    layout: _Layout,
+) -> None:
+    env_class, _ = resolve(env_name)
+    _worker.update(
+        env=env_class(),
+        decode_actions=_DECODERS[env_name],
+        agent_factories=agent_factories,
+        max_plies=max_plies,
+        seed=seed,
+        blocks=[],
+        arrays={},
+    )
+    for key, name in names.items():
+        shm, array = _attach(name, *layout[key])
+        _worker["blocks"].append(shm)
+        _worker["arrays"][key] = array
+
+
+def _final_rewards(state: Any, agent_id: int) -> Tuple[int, int]:
+    if hasattr(state, "reward"):
+        return int(state.reward[0]), int(state.reward[1])
+    if state.done:
+        return (1, -1) if agent_id == 0 else (-1, 1)
+    return 0, 0
+
+
+def _play_game(index: int) -> int:
+    env: BaseEnv[Any, Any] = _worker["env"]
+    arrays: Dict[str, NDArray] = _worker["arrays"]
+    max_plies: int = _worker["max_plies"]
+    seeds = game_seeds(_worker["seed"], index)
+    # Agents drawing from the global generators are seeded as well.
+    random.seed(seeds[0])
+    np.random.seed(seeds[0])
+    agents = [
+        factory(agent_id, agent_seed)
+        for agent_id, (factory, agent_seed) in enumerate(
+            zip(_worker["agent_factories"], seeds)
+        )
+    ]
+
+    boards = arrays["boards"][index]
+    walls_remaining = arrays.get("walls_remaining")
+    actions = arrays["actions"][index]
+    state = env.initialize_state()
+    boards[0] = state.board
+    if walls_remaining is not None:
+        walls_remaining[index, 0] = state.walls_remaining
+    agent_id = 0
+    plies = 0
+    while not state.done and plies < max_plies:
+        action = np.asarray(agents[agent_id](state))
+        state = env.step(state, agent_id, action)
+        # Flat action indices are stored decoded, like the other actions.
+        actions[plies] = (
+            _worker["decode_actions"](action) if not action.ndim else action
+        )
+        plies += 1
+        boards[plies] = state.board
+        if walls_remaining is not None:
+            walls_remaining[index, plies] = state.walls_remaining
+        agent_id = 1 - agent_id
+
+    arrays["plies"][index] = plies
+    arrays["rewards"][index] = _final_rewards(state, 1 - agent_id)
+    return index
+
+
+def run_selfplay(
+    env_name: str,
+    agent_factories: Sequence[AgentFactory],
+    num_games: int,
+    num_workers: Optional[int] = None,
+    max_plies: int = 200,
+    seed: int = 0,
+    start_method: Optional[str] = None,
+) -> SelfPlayResult:
+    """
+    Play games on a :class:`multiprocessing.pool.Pool`, with ``agent_factories[0]``
+    and ``agent_factories[1]`` taking turns, starting with agent ``0``.
+
+    :arg env_name:
+        Name of the environment, resolved by :func:`fights.envs.resolve`.
+
+    :arg agent_factories:
+        Factories of agent ``0`` and agent ``1``, called once per game with the
+        agent ID and a seed from :func:`game_seeds`.
+
+    :arg num_games:
+        Number of games to play.
+
+    :arg num_workers:
+        Number of worker processes. Defaults to the number of CPUs.
+
+    :arg max_plies:
+        Stop a game after this many actions, even if it is not done.
+
+    :arg seed:
+        Seed of the run. The same seed plays the same games, regardless of
+        ``num_workers``.
+
+    :arg start_method:
+        Start method of the worker processes, passed to
+        :func:`multiprocessing.get_context`.
+
+    :returns:
+        A :obj:`SelfPlayResult` object.
+    """
+    from multiprocessing import shared_memory
+
+    env_class, _ = resolve(env_name)
+    if len(agent_factories) != 2:
+        raise ValueError("expected two agent factories")
+    if num_games < 1:
+        raise ValueError("num_games must be positive")
+    if max_plies < 0:
+        raise ValueError("max_plies must not be negative")
+
+    initial_state: Any = env_class().initialize_state()
+    layout: _Layout = {
+        "boards": ((num_games, max_plies + 1, *initial_state.board.shape), np.int8),
+        "actions": ((num_games, max_plies, _ACTION_SIZES[env_name]), np.int16),
+        "plies": ((num_games,), np.int32),
+        "rewards": ((num_games, 2), np.int8),
+    }
+    if hasattr(initial_state, "walls_remaining"):
+        layout["walls_remaining"] = ((num_games, max_plies + 1, 2), np.int8)
+
+    blocks: List[shared_memory.SharedMemory] = []
+    arrays: Dict[str, NDArray] = {}
+    try:
+        for key, (shape, dtype) in layout.items():
+            size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            blocks.append(shared_memory.SharedMemory(create=True, size=size))
+            arrays[key] = np.ndarray(shape, dtype=dtype, buffer=blocks[-1].buf)
+            arrays[key][...] = 0
+        names = {key: block.name for key, block in zip(layout, blocks)}
+
+        context = multiprocessing.get_context(start_method)
+        num_workers = min(num_workers or context.cpu_count(), num_games)
+        chunksize = max(1, num_games // (4 * num_workers))
+        start = time.time()
+        with context.Pool(
+            num_workers,
+            initializer=_init_worker,
+            initargs=(env_name, agent_factories, max_plies, seed, names, layout),
+        ) as pool:
+            for _ in pool.imap_unordered(_play_game, range(num_games), chunksize):
+                pass
+        seconds = time.time() - start
+
+        return SelfPlayResult(
+            boards=arrays["boards"].copy(),
+            walls_remaining=(
+                arrays["walls_remaining"].copy()
+                if "walls_remaining" in arrays
+                else None
+            ),
+            actions=arrays["actions"].copy(),
+            plies=arrays["plies"].copy(),
+            rewards=arrays["rewards"].copy(),
+            seconds=seconds,
+        )
+    finally:
+        # Drop the views first, closing a block fails while they are alive.
+        arrays.clear()
+        for block in blocks:
+            block.close()
+            block.unlink()
@@ -0,0 +1,404 @@
+"""
+Vectorized environments, which hold ``N`` games of the same kind in stacked arrays
+and step all of them with a single call into the Cython kernels. Agents move in
+turns, starting with agent ``0``. A game which is finished by a step is reset to
+its initial state right away, so every game of the batch is always running.
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from types import ModuleType
+from typing import Callable, NamedTuple, Tuple
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+from fights.base import BaseState
+from fights.envs import (
+    othello,
+    othello_bitboard,
+    puoribor,
+    puoribor_cython,
+    quoridor,
+    quoridor_cython,
+)
+from fights.envs.othello import OthelloEnv, OthelloState
+from fights.envs.puoribor import PuoriborEnv, PuoriborState
+from fights.envs.quoridor import QuoridorEnv, QuoridorState
+
+
+class VectorStep(NamedTuple):
+    """
+    ``VectorStep`` is the result of :meth:`VectorEnv.step` and
+    :meth:`VectorEnv.reset`.
+    """
+
+    boards: NDArray[np.int_]
+    """
+    Boards of all games, of shape ``(N, C, W, H)``. Games finished by the step are
+    already reset. Puoribor and Quoridor return the boards of the environment,
+    which the next step updates in place.
+    """
+
+    rewards: NDArray[np.int_]
+    """
+    Array of shape ``(N, 2)`` holding the reward of each agent, which is ``1`` for
+    the winner, ``-1`` for the loser and ``0`` otherwise.
+    """
+
+    dones: NDArray[np.bool_]
+    """
+    Array of shape ``(N,)``, ``True`` for the games finished by the step.
+    """
+
+    legal_actions: NDArray[np.int_]
+    """
+    One-hot encoded legal actions of the agent to move next in each game, of shape
+    ``(N, ...)`` where ``...`` is the shape of ``legal_actions`` of the environment
+    for a single agent.
+    """
+
+    agent_ids: NDArray[np.int_]
+    """
+    Array of shape ``(N,)`` holding the agent to move next in each game.
+    """
+
+
+class VectorEnv(ABC):
+    """
+    Base class of vectorized environments.
+
+    :arg num_envs:
+        Number of games in the batch.
+
+    :arg num_threads:
+        Number of threads stepping the games. ``0`` uses the OpenMP default, which
+        is usually the number of cores.
+    """
+
+    env_id: Tuple[str, int]
+    """
+    Identifier of the single game environment in the form of ``(name, version)``.
+    """
+
+    action_size: int
+    """
+    Length of a single action.
+    """
+
+    num_actions: int
+    """
+    Number of flat action indices of the environment.
+    """
+
+    _decode_actions: Callable[[ArrayLike], NDArray[np.int_]]
+
+    def __init__(self, num_envs: int, num_threads: int = 0) -> None:
+        if num_envs < 1:
+            raise ValueError(f"invalid num_envs: {num_envs}")
+        if num_threads < 0:
+            raise ValueError(f"invalid num_threads: {num_threads}")
+        self.num_envs = num_envs
+        self.num_threads = num_threads
+        self.agent_ids = np.zeros(num_envs, dtype=np.int_)
+
+    @abstractmethod
+    def reset(self) -> VectorStep:
+        """
+        Reset every game to its initial state.
+
+        :returns:
+            A :obj:`VectorStep` with zero rewards and no finished games.
+        """
+        ...
+
+    @abstractmethod
+    def step(self, actions: ArrayLike) -> VectorStep:
+        """
+        Let the agent to move in each game take an action. If any action is illegal,
+        no game is changed.
+
+        :arg actions:
+            Array of shape ``(N, action_size)``, where ``actions[i]`` is encoded in the
+            form of the action type of the environment, or array of shape ``(N,)``
+            holding flat action indices.
+
+        :returns:
+            A :obj:`VectorStep` for the batch after the actions.
+        """
+        ...
+
+    @abstractmethod
+    def state(self, index: int) -> BaseState:
+        """
+        Copy a single game out of the batch.
+
+        :arg index:
+            Index of the game.
+
+        :returns:
+            The state of the game, for the environment it belongs to.
+        """
+        ...
+
+    def _check_actions(self, actions: ArrayLike) -> NDArray[np.int_]:
+        actions_np = np.asarray(actions, dtype=np.int_)
+        if actions_np.shape == (self.num_envs,):
+            actions_np = self._decode_actions(actions_np)
+        if actions_np.shape != (self.num_envs, self.action_size):
+            raise ValueError(
+                f"expected actions of shape {(self.num_envs, self.action_size)}, got "
+                f"{actions_np.shape}"
+            )
+        return actions_np
+
+    def _check_codes(
+        self,
+        codes: NDArray[np.int_],
+        actions: NDArray[np.int_],
+        error_message: Callable[[int, int, NDArray[np.int_]], str],
+    ) -> None:
+        illegal = np.flatnonzero(codes)
+        if illegal.size:
+            index = int(illegal[0])
+            message = error_message(
+                int(codes[index]), int(self.agent_ids[index]), actions[index]
+            )
+            raise ValueError(f"game {index}: {message}")
+
+
+class _WallVectorEnv(VectorEnv):
+    """
+    Shared implementation of Puoribor and Quoridor, whose kernels take the same
+    arguments.
+    """
+
+    action_size = 3
+
+    def __init__(
+        self,
+        num_envs: int,
+        num_threads: int,
+        kernels: ModuleType,
+        initial_board: NDArray[np.int_],
+        initial_walls_remaining: NDArray[np.int_],
+        initial_legal_actions: NDArray[np.int_],
+    ) -> None:
+        super().__init__(num_envs, num_threads)
+        self._kernels = kernels
+        self.initial_board = initial_board
+        self.initial_walls_remaining = initial_walls_remaining
+        self.initial_legal_actions = initial_legal_actions
+        self.reset()
+
+    def reset(self) -> VectorStep:
+        n = self.num_envs
+        self.boards = np.repeat(self.initial_board[np.newaxis], n, axis=0)
+        self.walls_remaining = np.repeat(
+            self.initial_walls_remaining[np.newaxis], n, axis=0
+        )
+        self.agent_ids = np.zeros(n, dtype=np.int_)
+        self.legal_actions = np.repeat(
+            self.initial_legal_actions[np.newaxis], n, axis=0
+        )
+        return VectorStep(
+            self.boards,
+            np.zeros((n, 2), dtype=np.int_),
+            np.zeros(n, dtype=np.bool_),
+            self.legal_actions,
+            self.agent_ids,
+        )
+
+    def step(self, actions: ArrayLike) -> VectorStep:
+        actions_np = self._check_actions(actions)
+        codes = np.zeros(self.num_envs, dtype=np.int_)
+        dones = np.zeros(self.num_envs, dtype=np.int_)
+        rewards = np.zeros((self.num_envs, 2), dtype=np.int_)
+        legal_actions = np.zeros_like(self.legal_actions)
+        # The kernel checks every action before stepping any game, so the batch is
+        # stepped in place and left as it was if an action is illegal.
+        self._kernels.vector_step(
+            self.boards,
+            self.walls_remaining,
+            self.agent_ids,
+            actions_np,
+            self.initial_board,
+            self.initial_walls_remaining,
+            self.initial_board.shape[-1],
+            codes,
+            dones,
+            rewards,
+            legal_actions,
+            self.num_threads,
+        )
+        self._check_codes(codes, actions_np, self._kernels.error_message)
+
+        self.legal_actions = legal_actions
+        return VectorStep(
+            self.boards,
+            rewards,
+            dones.astype(np.bool_),
+            legal_actions,
+            self.agent_ids,
+        )
+
+
+class PuoriborVectorEnv(_WallVectorEnv):
+    """
+    Batch of Puoribor games. Boards are stacked to ``(N, 6, 9, 9)``, remaining walls
+    to ``(N, 2)`` and legal actions to ``(N, 4, 9, 9)``.
+
+    :arg num_envs:
+        Number of games in the batch.
+
+    :arg num_threads:
+        Number of threads stepping the games. ``0`` uses the OpenMP default, which
+        is usually the number of cores.
+    """
+
+    env_id = PuoriborEnv.env_id
+    num_actions = puoribor.NUM_ACTIONS
+    _decode_actions = staticmethod(puoribor.decode_actions)
+
+    def __init__(self, num_envs: int, num_threads: int = 0) -> None:
+        self.env = PuoriborEnv()
+        initial_state = self.env.initialize_state()
+        super().__init__(
+            num_envs,
+            num_threads,
+            puoribor_cython,
+            initial_state.board,
+            initial_state.walls_remaining,
+            self.env.legal_actions(initial_state, 0),
+        )
+
+    def state(self, index: int) -> PuoriborState:
+        return PuoriborState(
+            board=np.copy(self.boards[index]),
+            walls_remaining=np.copy(self.walls_remaining[index]),
+        )
+
+
+class QuoridorVectorEnv(_WallVectorEnv):
+    """
+    Batch of Quoridor games. Boards are stacked to ``(N, 4, 9, 9)``, remaining walls
+    to ``(N, 2)`` and legal actions to ``(N, 3, 9, 9)``.
+
+    :arg num_envs:
+        Number of games in the batch.
+
+    :arg num_threads:
+        Number of threads stepping the games. ``0`` uses the OpenMP default, which
+        is usually the number of cores.
+    """
+
+    env_id = QuoridorEnv.env_id
+    num_actions = quoridor.NUM_ACTIONS
+    _decode_actions = staticmethod(quoridor.decode_actions)
+
+    def __init__(self, num_envs: int, num_threads: int = 0) -> None:
+        self.env = QuoridorEnv()
+        initial_state = self.env.initialize_state()
+        super().__init__(
+            num_envs,
+            num_threads,
+            quoridor_cython,
+            initial_state.board,
+            initial_state.walls_remaining,
+            self.env.legal_actions(initial_state, 0),
+        )
+
+    def state(self, index: int) -> QuoridorState:
+        return QuoridorState(
+            board=np.copy(self.boards[index]),
+            walls_remaining=np.copy(self.walls_remaining[index]),
+        )
+
+
+class OthelloVectorEnv(VectorEnv):
+    """
+    Batch of Othello games, stepped with the bitboard kernels. Boards are stacked to
+    ``(N, 2, 8, 8)`` and the legal actions of both agents to ``(N, 2, 8, 8)``. The
+    returned legal actions are the ``(N, 8, 8)`` planes of the agents to move.
+
+    :arg num_envs:
+        Number of games in the batch.
+
+    :arg num_threads:
+        Number of threads stepping the games. ``0`` uses the OpenMP default, which
+        is usually the number of cores.
+    """
+
+    env_id = OthelloEnv.env_id
+    action_size = 2
+    num_actions = othello.NUM_ACTIONS
+    _decode_actions = staticmethod(othello.decode_actions)
+
+    def __init__(self, num_envs: int, num_threads: int = 0) -> None:
+        super().__init__(num_envs, num_threads)
+        self.env = OthelloEnv()
+        initial_state = self.env.initialize_state()
+        self.initial_board = initial_state.board
+        self.initial_legal_actions = initial_state.legal_actions
+        self.reset()
+
+    def reset(self) -> VectorStep:
+        n = self.num_envs
+        self.boards = np.repeat(self.initial_board[np.newaxis], n, axis=0)
+        self.agent_ids = np.zeros(n, dtype=np.int_)
+        self.legal_actions = np.repeat(
+            self.initial_legal_actions[np.newaxis], n, axis=0
+        )
+        return VectorStep(
+            self.boards,
+            np.zeros((n, 2), dtype=np.int_),
+            np.zeros(n, dtype=np.bool_),
+            self.legal_actions[np.arange(n), self.agent_ids],
+            self.agent_ids,
+        )
+
+    def step(self, actions: ArrayLike) -> VectorStep:
+        actions_np = self._check_actions(actions)
+        boards = np.copy(self.boards)
+        legal_actions = np.copy(self.legal_actions)
+        agent_ids = np.copy(self.agent_ids)
+        codes = np.zeros(self.num_envs, dtype=np.int_)
+        dones = np.zeros(self.num_envs, dtype=np.int_)
+        rewards = np.zeros((self.num_envs, 2), dtype=np.int_)
+        othello_bitboard.vector_step(
+            boards,
+            legal_actions,
+            agent_ids,
+            actions_np,
+            self.initial_board,
+            codes,
+            dones,
+            rewards,
+            self.num_threads,
+        )
+        self._check_codes(
+            codes,
+            actions_np,
+            lambda code, agent_id, action: othello_bitboard.error_message(
+                code, agent_id, action[0], action[1]
+            ),
+        )
+
+        self.boards = boards
+        self.legal_actions = legal_actions
+        self.agent_ids = agent_ids
+        return VectorStep(
+            boards,
+            rewards,
+            dones.astype(np.bool_),
+            legal_actions[np.arange(self.num_envs), agent_ids],
+            agent_ids,
+        )
+
+    def state(self, index: int) -> OthelloState:
+        return OthelloState(
+            board=np.copy(self.boards[index]),
+            legal_actions=np.copy(self.legal_actions[index]),
+            reward=np.zeros(2, dtype=np.int_),
+        )
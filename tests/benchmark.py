@@ -1,6 +1,7 @@
 """
 Quoridor Environment Benchmark
 """
+
 import time
 
 import numpy as np
@@ -0,0 +1,49 @@
+"""
+Alpha-Beta Search Benchmark
+"""
+
+import numpy as np
+
+from fights.envs.othello import OthelloEnv
+from fights.envs.puoribor import PuoriborEnv
+from fights.envs.quoridor import QuoridorEnv
+from fights.search import AlphaBetaSearch
+
+
+def search_game(env, time_limit: float, num_plies: int, seed: int = 0) -> str:
+    """
+    Search the first plies of a game, playing a random action instead of the best
+    one every other ply on average so the positions vary.
+    """
+    engine = AlphaBetaSearch(env, time_limit=time_limit)
+    rng = np.random.default_rng(seed)
+    state = env.initialize_state()
+    agent_id = 0
+    depths, ebfs, rates = [], [], []
+    for _ in range(num_plies):
+        result = engine.search(state, agent_id)
+        depths.append(result.depth)
+        ebfs.append(result.effective_branching_factor)
+        rates.append(result.nodes_per_sec)
+        action = result.action
+        if rng.random() < 0.5:
+            actions = env.legal_actions(state, agent_id, encoding="indices")
+            action = actions[rng.integers(len(actions))]
+        state = env.step(state, agent_id, action)
+        agent_id = 1 - agent_id
+        if state.done:
+            break
+    return (
+        f"depth {np.mean(depths):.1f}, {np.mean(rates):.0f} nodes/sec, "
+        f"effective branching factor {np.mean(ebfs):.1f}"
+    )
+
+
+def run(time_limit: float = 2.0, num_plies: int = 6):
+    for env in (PuoriborEnv(), QuoridorEnv(), OthelloEnv(backend="bitboard")):
+        stats = search_game(env, time_limit, num_plies)
+        print(f"{env.env_id[0]} {time_limit:.1f}s/move: {stats}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,51 @@
+"""
+Child Expansion Benchmark
+"""
+
+import time
+from typing import Any, List
+
+import numpy as np
+
+from fights.envs.othello import OthelloEnv
+from fights.envs.puoribor import PuoriborEnv
+from fights.envs.quoridor import QuoridorEnv
+
+
+def sample_positions(env, num_positions: int, seed: int = 0) -> List[Any]:
+    rng = np.random.default_rng(seed)
+    positions: List[Any] = []
+    while len(positions) < num_positions:
+        state = env.initialize_state()
+        agent_id = 0
+        while not state.done and len(positions) < num_positions:
+            positions.append((state, agent_id))
+            indices = env.legal_actions(state, agent_id, encoding="indices")
+            state = env.step(state, agent_id, indices[rng.integers(len(indices))])
+            agent_id = 1 - agent_id
+    return positions
+
+
+def run():
+    for env in (PuoriborEnv(), QuoridorEnv(), OthelloEnv(backend="bitboard")):
+        name = env.env_id[0]
+        positions = sample_positions(env, 200)
+
+        start = time.time()
+        num_children = 0
+        for state, agent_id in positions:
+            for action in env.legal_actions(state, agent_id, encoding="indices"):
+                env.step(state, agent_id, action)
+                num_children += 1
+        step = num_children / (time.time() - start)
+        print(f"{name} step per action: {step:.0f} children/sec")
+
+        start = time.time()
+        for state, agent_id in positions:
+            env.expand(state, agent_id)
+        rate = num_children / (time.time() - start)
+        print(f"{name} expand: {rate:.0f} children/sec ({rate / step:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
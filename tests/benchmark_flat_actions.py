@@ -0,0 +1,60 @@
+"""
+Flat Action Sampling Benchmark
+"""
+
+import time
+
+import numpy as np
+
+from fights.envs.puoribor import PuoriborEnv
+from fights.envs.quoridor import QuoridorEnv
+
+
+def grid_plies(env, num_plies: int, seed: int = 0) -> float:
+    """
+    Sample with ``np.argwhere`` on the one-hot legal actions, like ``RandomAgent``
+    of ``tests/benchmark.py``.
+    """
+    rng = np.random.default_rng(seed)
+    state = env.initialize_state()
+    agent_id = 0
+    start = time.time()
+    for _ in range(num_plies):
+        actions = np.argwhere(env.legal_actions(state, agent_id))
+        state = env.step(state, agent_id, actions[rng.integers(len(actions))])
+        agent_id = 1 - agent_id
+        if state.done:
+            state = env.initialize_state()
+            agent_id = 0
+    return num_plies / (time.time() - start)
+
+
+def flat_plies(env, num_plies: int, seed: int = 0) -> float:
+    """
+    Sample a flat index from the legal indices and step with it directly.
+    """
+    rng = np.random.default_rng(seed)
+    state = env.initialize_state()
+    agent_id = 0
+    start = time.time()
+    for _ in range(num_plies):
+        indices = env.legal_actions(state, agent_id, encoding="indices")
+        state = env.step(state, agent_id, indices[rng.integers(len(indices))])
+        agent_id = 1 - agent_id
+        if state.done:
+            state = env.initialize_state()
+            agent_id = 0
+    return num_plies / (time.time() - start)
+
+
+def run():
+    for env in (PuoriborEnv(), QuoridorEnv()):
+        name = env.env_id[0]
+        grid = grid_plies(env, 5000)
+        flat = flat_plies(env, 5000)
+        print(f"{name} argwhere: {grid:.0f} plies/sec")
+        print(f"{name} flat indices: {flat:.0f} plies/sec ({flat / grid:.2f}x)")
+
+
+if __name__ == "__main__":
+    run()
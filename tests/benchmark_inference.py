@@ -0,0 +1,85 @@
+"""
+Batched Inference Benchmark
+
+Concurrent games evaluate every position with a numpy model through an
+``InferenceBroker``, for a few batch sizes. A batch size of ``1`` evaluates one
+state at a time, like a ``BaseAgent`` calling the model directly.
+"""
+
+import threading
+
+import numpy as np
+
+from fights.envs import quoridor
+from fights.envs.quoridor import QuoridorEnv
+from fights.inference import InferenceBroker
+
+
+class MLPModel:
+    """
+    Two-layer perceptron with a softmax policy head and a tanh value head.
+    """
+
+    def __init__(self, hidden: int = 512, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        size = 4 * 9 * 9
+        self.w1 = rng.normal(size=(size, hidden)).astype(np.float32) / np.sqrt(size)
+        self.w_policy = rng.normal(size=(hidden, quoridor.NUM_ACTIONS)).astype(
+            np.float32
+        )
+        self.w_value = rng.normal(size=hidden).astype(np.float32) / hidden
+
+    def __call__(self, boards):
+        x = np.maximum(boards.reshape(len(boards), -1).astype(np.float32) @ self.w1, 0)
+        logits = x @ self.w_policy
+        policies = np.exp(logits - logits.max(axis=1, keepdims=True))
+        policies /= policies.sum(axis=1, keepdims=True)
+        return np.tanh(x @ self.w_value), policies
+
+
+def play(env, broker: InferenceBroker, num_plies: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    state = env.initialize_state()
+    agent_id = 0
+    for _ in range(num_plies):
+        if state.done:
+            state = env.initialize_state()
+            agent_id = 0
+        _, policy = broker.evaluate(state, agent_id)
+        actions = env.legal_actions(state, agent_id, encoding="indices")
+        priors = policy[actions] / policy[actions].sum()
+        state = env.step(state, agent_id, rng.choice(actions, p=priors))
+        agent_id = 1 - agent_id
+
+
+def run(num_games: int = 256, num_plies: int = 20):
+    env = QuoridorEnv()
+    model = MLPModel()
+    for max_batch_size in (1, 16, 64, 256):
+        broker = InferenceBroker(
+            model,
+            max_batch_size=max_batch_size,
+            max_wait=0.002,
+            agent_frame_actions=quoridor.AGENT_FRAME_ACTIONS,
+        )
+        threads = [
+            threading.Thread(target=play, args=(env, broker, num_plies, seed))
+            for seed in range(num_games)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        broker.close()
+        stats = broker.stats
+        print(
+            f"max batch {max_batch_size}: {stats.requests_per_sec:.0f} requests/sec, "
+            f"mean batch {stats.mean_batch_size:.1f}, "
+            f"latency {1000 * stats.mean_latency:.1f}ms "
+            f"(p99 {1000 * stats.p99_latency:.1f}ms), "
+            f"{100 * stats.model_seconds / stats.seconds:.0f}% in the model"
+        )
+
+
+if __name__ == "__main__":
+    run()
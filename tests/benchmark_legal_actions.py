@@ -0,0 +1,76 @@
+"""
+Puoribor Legal Actions Benchmark
+"""
+
+import time
+
+import numpy as np
+
+from fights.envs import puoribor
+from fights.envs.puoribor_cython import fast_step
+
+
+def legal_actions_by_stepping(
+    state: puoribor.PuoriborState, agent_id: int
+) -> np.ndarray:
+    """
+    Reference implementation which tries every wall and rotation with ``fast_step``.
+    """
+    env = puoribor.PuoriborEnv()
+    legal_actions_np = env.legal_actions(state, agent_id)
+    legal_actions_np[1:] = 0
+    for action_type in range(1, 4):
+        bound = env.board_size - (3 if action_type == 3 else 1)
+        for x in range(bound):
+            for y in range(bound):
+                try:
+                    fast_step(
+                        state.board,
+                        state.walls_remaining,
+                        agent_id,
+                        np.array([action_type, x, y], dtype=np.int_),
+                        env.board_size,
+                    )
+                except ValueError:
+                    ...
+                else:
+                    legal_actions_np[action_type, x, y] = 1
+    return legal_actions_np
+
+
+def sample_states(num_games: int, seed: int = 0):
+    env = puoribor.PuoriborEnv()
+    rng = np.random.default_rng(seed)
+    states = []
+    for _ in range(num_games):
+        state = env.initialize_state()
+        agent_id = 0
+        while not state.done:
+            states.append((state, agent_id))
+            legal_actions_np = env.legal_actions(state, agent_id)
+            action = rng.choice(np.argwhere(legal_actions_np == 1))
+            state = env.step(state, agent_id, action)
+            agent_id = 1 - agent_id
+    return states
+
+
+def run():
+    env = puoribor.PuoriborEnv()
+    states = sample_states(10)
+    print(f"{len(states)} states")
+
+    start = time.time()
+    for state, agent_id in states:
+        legal_actions_by_stepping(state, agent_id)
+    reference = time.time() - start
+    print(f"stepping each candidate: {reference} sec")
+
+    start = time.time()
+    for state, agent_id in states:
+        env.legal_actions(state, agent_id)
+    elapsed = time.time() - start
+    print(f"legal_actions: {elapsed} sec ({reference / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
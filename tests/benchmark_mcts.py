@@ -0,0 +1,43 @@
+"""
+Monte Carlo Tree Search Benchmark
+"""
+
+import numpy as np
+
+from fights.envs.othello import OthelloEnv
+from fights.envs.puoribor import PuoriborEnv
+from fights.envs.quoridor import QuoridorEnv
+from fights.search import MCTS, RolloutEvaluator
+
+
+def search_game(env, num_simulations: int, num_plies: int, seed: int = 0) -> str:
+    """
+    Play the first plies of a game with the engine on both sides, keeping the tree
+    between moves.
+    """
+    engine = MCTS(env, RolloutEvaluator(env, seed=seed))
+    state = env.initialize_state()
+    agent_id = 0
+    rates, reused = [], []
+    for _ in range(num_plies):
+        result = engine.search(state, agent_id, num_simulations)
+        rates.append(result.sims_per_sec)
+        reused.append(result.reused / (result.reused + num_simulations))
+        state = env.step(state, agent_id, result.action)
+        agent_id = 1 - agent_id
+        if state.done:
+            break
+    return (
+        f"{np.mean(rates):.0f} simulations/sec, "
+        f"{100 * np.mean(reused[1:]):.0f}% of the visits reused"
+    )
+
+
+def run(num_simulations: int = 2000, num_plies: int = 8):
+    for env in (PuoriborEnv(), QuoridorEnv(), OthelloEnv(backend="bitboard")):
+        stats = search_game(env, num_simulations, num_plies)
+        print(f"{env.env_id[0]} {num_simulations} simulations/move: {stats}")
+
+
+if __name__ == "__main__":
+    run()
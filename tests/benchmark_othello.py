@@ -0,0 +1,67 @@
+"""
+Othello Backend Benchmark
+"""
+
+import time
+
+import numpy as np
+
+from fights.envs import othello, othello_bitboard
+
+
+def random_games(env: othello.OthelloEnv, num_games: int, seed: int = 0) -> int:
+    rng = np.random.default_rng(seed)
+    plies = 0
+    for _ in range(num_games):
+        state = env.initialize_state()
+        agent_id = 0
+        while not state.done:
+            legal_actions = np.argwhere(state.legal_actions[agent_id])
+            action = legal_actions[rng.integers(len(legal_actions))]
+            state = env.step(state, agent_id, action)
+            agent_id = 1 - agent_id
+            plies += 1
+    return plies
+
+
+def search_playouts(env: othello.OthelloEnv, num_games: int) -> int:
+    search_state = env.search_state(env.initialize_state())
+    plies = 0
+    for _ in range(num_games):
+        agent_id = 0
+        while not search_state.done:
+            if isinstance(search_state, othello_bitboard.OthelloBitboardSearchState):
+                mask = search_state.legal_masks[agent_id]
+                cell = (mask & -mask).bit_length() - 1
+                search_state.apply(agent_id, cell // 8, cell % 8)
+            else:
+                legal_actions = np.argwhere(search_state.legal_actions[agent_id])
+                search_state.apply(agent_id, *legal_actions[0])
+            agent_id = 1 - agent_id
+        plies += search_state.ply
+        while search_state.ply:
+            search_state.undo()
+    return plies
+
+
+def run():
+    for backend in ("cython", "bitboard"):
+        env = othello.OthelloEnv(backend=backend)
+        start = time.time()
+        plies = random_games(env, 200)
+        elapsed = time.time() - start
+        print(f"{backend}: {plies / elapsed:.0f} steps/sec")
+        start = time.time()
+        plies = search_playouts(env, 200)
+        elapsed = time.time() - start
+        print(f"{backend} search state: {plies / elapsed:.0f} apply+undo/sec")
+
+    black, white = othello.OthelloEnv().initialize_state().to_bitboard()
+    start = time.time()
+    nodes = othello_bitboard.perft(black, white, 0, 9)
+    elapsed = time.time() - start
+    print(f"bitboard perft(9): {nodes} nodes, {nodes / elapsed:.0f} nodes/sec")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,92 @@
+"""
+Parallel Search Benchmark
+
+Plays the parallel engines against the serial ones at the same time per move, and
+reports the Elo difference per core. The scaling is bounded by the number of CPUs
+of the machine.
+"""
+
+import os
+
+import numpy as np
+
+from fights.envs.othello import OthelloEnv
+from fights.search import (
+    MCTS,
+    AlphaBetaSearch,
+    RolloutEvaluator,
+    RootParallelAlphaBeta,
+    RootParallelMCTS,
+    TreeParallelMCTS,
+)
+
+
+def play(env, engines, time_limit: float, seed: int) -> float:
+    """
+    Play a game between ``engines[0]`` and ``engines[1]``, after a few random
+    opening plies, and return the score of ``engines[0]``.
+    """
+    rng = np.random.default_rng(seed)
+    state = env.initialize_state()
+    agent_id = 0
+    for ply in range(200):
+        if state.done:
+            break
+        if ply < 4:
+            actions = env.legal_actions(state, agent_id, encoding="indices")
+            action = actions[rng.integers(len(actions))]
+        else:
+            action = engines[agent_id].search(state, agent_id, time_limit=time_limit)
+            action = action.action
+        state = env.step(state, agent_id, action)
+        agent_id = 1 - agent_id
+    return (np.sign(state.reward[0]) + 1) / 2
+
+
+def match(env, engine, serial, time_limit: float, num_games: int) -> float:
+    """
+    Play ``num_games`` games with alternating colors and return the Elo difference
+    of ``engine`` over ``serial``.
+    """
+    score = 0.0
+    for game in range(num_games):
+        if game % 2:
+            score += 1 - play(env, (serial, engine), time_limit, game // 2)
+        else:
+            score += play(env, (engine, serial), time_limit, game // 2)
+    # Clip the score so a clean sweep gives a finite difference.
+    score = np.clip(score / num_games, 0.5 / num_games, 1 - 0.5 / num_games)
+    return 400 * np.log10(score / (1 - score))
+
+
+def run(time_limit: float = 0.1, num_games: int = 10):
+    env = OthelloEnv(backend="bitboard")
+    print(f"{os.cpu_count()} CPUs, {time_limit:.2f}s/move, {num_games} games/match")
+    for cores in (2, 4):
+        serial_mcts = MCTS(env, RolloutEvaluator(env, seed=0), num_simulations=None)
+        serial_alphabeta = AlphaBetaSearch(env)
+        engines = {
+            "root-parallel MCTS": (
+                RootParallelMCTS(env, cores, seed=1, num_simulations=None),
+                serial_mcts,
+            ),
+            "tree-parallel MCTS": (
+                TreeParallelMCTS(
+                    env, RolloutEvaluator(env, seed=1), cores, num_simulations=None
+                ),
+                serial_mcts,
+            ),
+            "root-parallel alpha-beta": (
+                RootParallelAlphaBeta(env, cores),
+                serial_alphabeta,
+            ),
+        }
+        for name, (engine, serial) in engines.items():
+            elo = match(env, engine, serial, time_limit, num_games)
+            print(f"{name} x{cores}: {elo:+.0f} Elo, {elo / cores:+.0f} Elo/core")
+            if hasattr(engine, "close"):
+                engine.close()
+
+
+if __name__ == "__main__":
+    run()
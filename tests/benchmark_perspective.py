@@ -0,0 +1,59 @@
+"""
+Perspective Benchmark
+"""
+
+import time
+from dataclasses import replace
+from typing import List
+
+import numpy as np
+
+from fights.envs import puoribor, quoridor
+
+
+def sample_boards(env, num_boards: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    boards: List[np.ndarray] = []
+    while len(boards) < num_boards:
+        state = env.initialize_state()
+        agent_id = 0
+        while not state.done and len(boards) < num_boards:
+            legal_actions = np.argwhere(env.legal_actions(state, agent_id))
+            action = legal_actions[rng.integers(len(legal_actions))]
+            state = env.step(state, agent_id, action)
+            boards.append(state.board)
+            agent_id = 1 - agent_id
+    return np.stack(boards)
+
+
+def run():
+    for module, env in (
+        (puoribor, puoribor.PuoriborEnv()),
+        (quoridor, quoridor.QuoridorEnv()),
+    ):
+        name = env.env_id[0]
+        boards = sample_boards(env, 1024)
+        initial_state = env.initialize_state()
+        states = [replace(initial_state, board=board) for board in boards]
+
+        start = time.time()
+        for state in states:
+            state.perspective(1)
+        single = len(states) / (time.time() - start)
+        print(f"{name} perspective: {single:.0f} boards/sec")
+
+        for dtype in (np.int_, np.int8):
+            batch = boards.astype(dtype)
+            out = np.empty_like(batch)
+            start = time.time()
+            for _ in range(10):
+                module.rotate_boards(batch, out=out)
+            rate = 10 * len(boards) / (time.time() - start)
+            print(
+                f"{name} rotate_boards x{len(boards)} {np.dtype(dtype)}: "
+                f"{rate:.0f} boards/sec ({rate / single:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,63 @@
+"""
+Rollout Benchmark
+"""
+
+import time
+
+import numpy as np
+
+from fights.envs import othello_bitboard, puoribor_cython, quoridor_cython
+from fights.envs.othello import OthelloEnv
+from fights.envs.puoribor import PuoriborEnv
+from fights.envs.quoridor import QuoridorEnv
+
+
+def python_games(env, num_games: int, max_plies: int, seed: int = 0) -> float:
+    """
+    Play random games through ``env.step``, like ``RandomAgent`` of
+    ``tests/benchmark.py``.
+    """
+    rng = np.random.default_rng(seed)
+    start = time.time()
+    for _ in range(num_games):
+        state = env.initialize_state()
+        agent_id = 0
+        for _ in range(max_plies):
+            actions = np.argwhere(env.legal_actions(state, agent_id))
+            state = env.step(state, agent_id, actions[rng.integers(len(actions))])
+            agent_id = 1 - agent_id
+            if state.done:
+                break
+    return num_games / (time.time() - start)
+
+
+def run():
+    max_plies = 1000
+    for env, rollout in (
+        (PuoriborEnv(), puoribor_cython.rollout),
+        (QuoridorEnv(), quoridor_cython.rollout),
+        (OthelloEnv(), othello_bitboard.rollout),
+    ):
+        name = env.env_id[0]
+        state = env.initialize_state()
+        num_games = 8000 if name == "othello" else 1000
+        args = (state.board,)
+        if hasattr(state, "walls_remaining"):
+            args += (state.walls_remaining,)
+        python = python_games(env, 50, max_plies)
+        print(f"{name} python: {python:.0f} games/sec")
+        for num_threads in (1, 0):
+            start = time.time()
+            _, lengths = rollout(
+                *args, 0, num_games, 0, max_plies, num_threads=num_threads
+            )
+            elapsed = time.time() - start
+            rate = num_games / elapsed
+            print(
+                f"{name} rollout threads={num_threads or 'all'}: {rate:.0f} games/sec, "
+                f"{lengths.sum() / elapsed:.0f} plies/sec ({rate / python:.0f}x)"
+            )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,51 @@
+"""
+Thread Pool Game Runner Benchmark
+"""
+
+import os
+import time
+
+import numpy as np
+
+from fights.base import BaseAgent
+from fights.envs.puoribor import PuoriborEnv
+from fights.runner import GameRunner
+
+
+class RandomAgent(BaseAgent):
+    env_id = PuoriborEnv.env_id  # type: ignore
+
+    def __init__(self, agent_id: int, env: PuoriborEnv, seed: int = 0) -> None:
+        self.agent_id = agent_id  # type: ignore
+        self.env = env
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, state):
+        actions = np.argwhere(self.env.legal_actions(state, self.agent_id))
+        return actions[self.rng.integers(len(actions))]
+
+
+def run():
+    env = PuoriborEnv()
+
+    def make_agents(index):
+        return [RandomAgent(i, env, seed=2 * index + i) for i in range(2)]
+
+    num_games = 64
+    base = None
+    workers = 1
+    while workers <= 2 * (os.cpu_count() or 1):
+        runner = GameRunner(env, make_agents, max_workers=workers, max_plies=200)
+        start = time.time()
+        plies = sum(result.plies for result in runner.run(num_games))
+        elapsed = time.time() - start
+        base = base or num_games / elapsed
+        print(
+            f"{workers} threads: {num_games / elapsed:.1f} games/sec, "
+            f"{plies / elapsed:.0f} plies/sec ({num_games / elapsed / base:.1f}x)"
+        )
+        workers *= 2
+
+
+if __name__ == "__main__":
+    run()
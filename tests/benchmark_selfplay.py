@@ -0,0 +1,49 @@
+"""
+Self-Play Process Pool Benchmark
+"""
+
+import os
+
+import numpy as np
+
+from fights.base import BaseAgent
+from fights.envs.puoribor import PuoriborEnv
+from fights.selfplay import run_selfplay
+
+
+class RandomAgent(BaseAgent):
+    env_id = PuoriborEnv.env_id  # type: ignore
+
+    def __init__(self, agent_id: int, seed: int = 0) -> None:
+        self.agent_id = agent_id  # type: ignore
+        self.env = PuoriborEnv()
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, state):
+        actions = np.argwhere(self.env.legal_actions(state, self.agent_id))
+        return actions[self.rng.integers(len(actions))]
+
+
+def run():
+    num_games = 64
+    base = None
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        result = run_selfplay(
+            "puoribor",
+            [RandomAgent, RandomAgent],
+            num_games,
+            num_workers=workers,
+            max_plies=200,
+        )
+        base = base or result.games_per_sec
+        print(
+            f"{workers} processes: {result.games_per_sec:.1f} games/sec, "
+            f"{result.plies_per_sec:.0f} plies/sec "
+            f"({result.games_per_sec / base:.1f}x)"
+        )
+        workers *= 2
+
+
+if __name__ == "__main__":
+    run()
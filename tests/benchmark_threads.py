@@ -0,0 +1,98 @@
+"""
+Batch Kernel Thread Scaling Benchmark
+"""
+
+import os
+import time
+
+import numpy as np
+
+from fights.envs import puoribor_cython, quoridor_cython
+from fights.vector import OthelloVectorEnv, PuoriborVectorEnv, QuoridorVectorEnv
+
+
+def sample(rng: np.random.Generator, legal_actions: np.ndarray) -> np.ndarray:
+    flat = legal_actions.reshape(len(legal_actions), -1)
+    index = np.argmax(rng.random(flat.shape) * flat, axis=1)
+    return np.stack(np.unravel_index(index, legal_actions.shape[1:]), axis=1)
+
+
+def thread_counts():
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != os.cpu_count():
+        counts.append(os.cpu_count() or 1)
+    return counts
+
+
+def random_batch(vector_env_class, num_envs: int, plies: int, seed: int = 0):
+    """
+    Play random plies on a batch, so that the boards have walls on them.
+    """
+    rng = np.random.default_rng(seed)
+    vector_env = vector_env_class(num_envs)
+    result = vector_env.reset()
+    for _ in range(plies):
+        result = vector_env.step(sample(rng, result.legal_actions))
+    return vector_env
+
+
+def run():
+    num_envs = 4096
+    for vector_env_class, kernels in (
+        (PuoriborVectorEnv, puoribor_cython),
+        (QuoridorVectorEnv, quoridor_cython),
+    ):
+        name = vector_env_class.env_id[0]
+        vector_env = random_batch(vector_env_class, num_envs, 20)
+        legal_actions = np.zeros_like(vector_env.legal_actions)
+        paths = np.zeros(num_envs, dtype=np.int_)
+        base = {}
+        for num_threads in thread_counts():
+            start = time.time()
+            for _ in range(10):
+                legal_actions[:] = 0
+                kernels.batch_legal_actions(
+                    vector_env.boards,
+                    vector_env.walls_remaining,
+                    vector_env.agent_ids,
+                    vector_env.env.board_size,
+                    legal_actions,
+                    num_threads,
+                )
+            masks = 10 * num_envs / (time.time() - start)
+            start = time.time()
+            for _ in range(100):
+                kernels.batch_check_paths(
+                    vector_env.boards, vector_env.env.board_size, paths, num_threads
+                )
+            checks = 100 * num_envs / (time.time() - start)
+            base.setdefault("masks", masks)
+            base.setdefault("checks", checks)
+            print(
+                f"{name} x{num_threads} threads: "
+                f"{masks:.0f} masks/sec ({masks / base['masks']:.1f}x), "
+                f"{checks:.0f} path checks/sec ({checks / base['checks']:.1f}x)"
+            )
+
+    for vector_env_class in (PuoriborVectorEnv, QuoridorVectorEnv, OthelloVectorEnv):
+        name = vector_env_class.env_id[0]
+        single = None
+        for num_threads in thread_counts():
+            rng = np.random.default_rng(0)
+            vector_env = vector_env_class(num_envs, num_threads)
+            result = vector_env.reset()
+            start = time.time()
+            for _ in range(20):
+                result = vector_env.step(sample(rng, result.legal_actions))
+            steps = 20 * num_envs / (time.time() - start)
+            single = single or steps
+            print(
+                f"{name} vector step x{num_threads} threads: {steps:.0f} steps/sec "
+                f"({steps / single:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,64 @@
+"""
+Vector Environment Benchmark
+"""
+
+import time
+
+import numpy as np
+
+from fights.vector import OthelloVectorEnv, PuoriborVectorEnv, QuoridorVectorEnv
+
+
+def sample(rng: np.random.Generator, legal_actions: np.ndarray) -> np.ndarray:
+    """
+    Pick a uniformly random legal action in every game of the batch.
+    """
+    flat = legal_actions.reshape(len(legal_actions), -1)
+    index = np.argmax(rng.random(flat.shape) * flat, axis=1)
+    return np.stack(np.unravel_index(index, legal_actions.shape[1:]), axis=1)
+
+
+def vector_steps(vector_env, num_steps: int, seed: int = 0) -> float:
+    rng = np.random.default_rng(seed)
+    result = vector_env.reset()
+    start = time.time()
+    for _ in range(num_steps):
+        result = vector_env.step(sample(rng, result.legal_actions))
+    return vector_env.num_envs * num_steps / (time.time() - start)
+
+
+def single_steps(vector_env, num_steps: int, seed: int = 0) -> float:
+    rng = np.random.default_rng(seed)
+    env = vector_env.env
+    state = env.initialize_state()
+    agent_id = 0
+    start = time.time()
+    for _ in range(num_steps):
+        if vector_env.env_id[0] == "othello":
+            legal_actions = state.legal_actions[agent_id]
+        else:
+            legal_actions = env.legal_actions(state, agent_id)
+        action = sample(rng, legal_actions[np.newaxis])[0]
+        state = env.step(state, agent_id, action)
+        agent_id = 1 - agent_id
+        if state.done:
+            state = env.initialize_state()
+            agent_id = 0
+    return num_steps / (time.time() - start)
+
+
+def run():
+    for vector_env_class in (PuoriborVectorEnv, QuoridorVectorEnv, OthelloVectorEnv):
+        name = vector_env_class.env_id[0]
+        single = single_steps(vector_env_class(1), 5000)
+        print(f"{name} single: {single:.0f} steps/sec")
+        for num_envs in (16, 256, 1024):
+            vector = vector_steps(vector_env_class(num_envs), 100)
+            print(
+                f"{name} vector x{num_envs}: {vector:.0f} steps/sec "
+                f"({vector / single:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    run()
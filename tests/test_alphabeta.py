@@ -0,0 +1,161 @@
+import unittest
+
+import numpy as np
+
+from fights.envs.othello import OthelloEnv
+from fights.envs.quoridor import QuoridorEnv, QuoridorState
+from fights.search import WIN_VALUE, AlphaBetaSearch, stone_evaluation
+
+
+def negamax(env, state, agent_id, depth, ply=0):
+    if state.done:
+        return np.sign(state.reward[agent_id]) * (WIN_VALUE - ply)
+    if depth == 0:
+        return stone_evaluation(state, agent_id)
+    return max(
+        -negamax(
+            env, env.step(state, agent_id, action), 1 - agent_id, depth - 1, ply + 1
+        )
+        for action in env.legal_actions(state, agent_id, encoding="indices")
+    )
+
+
+class StepOnlyEnv:
+    """
+    Othello without ``expand``, to search through ``legal_actions`` and ``step``.
+    """
+
+    def __init__(self):
+        self.env = OthelloEnv()
+
+    def legal_actions(self, state, agent_id, encoding):
+        return self.env.legal_actions(state, agent_id, encoding=encoding)
+
+    def step(self, state, agent_id, action):
+        return self.env.step(state, agent_id, action)
+
+
+class TestAlphaBeta(unittest.TestCase):
+    def _positions(self, env, count, seed=0):
+        rng = np.random.default_rng(seed)
+        state = env.initialize_state()
+        agent_id = 0
+        positions = []
+        while not state.done and len(positions) < count:
+            positions.append((state, agent_id))
+            actions = env.legal_actions(state, agent_id, encoding="indices")
+            state = env.step(state, agent_id, actions[rng.integers(len(actions))])
+            agent_id = 1 - agent_id
+        return positions
+
+    def test_minimax_value(self):
+        env = OthelloEnv(backend="bitboard")
+        engine = AlphaBetaSearch(env)
+        for state, agent_id in self._positions(env, 40)[::8]:
+            for depth in (1, 2, 3):
+                result = engine.search(state, agent_id, max_depth=depth)
+                expected = negamax(env, state, agent_id, depth)
+                self.assertEqual(result.value, expected)
+                self.assertEqual(result.depth, depth)
+                child = env.step(state, agent_id, result.action)
+                self.assertEqual(
+                    -negamax(env, child, 1 - agent_id, depth - 1), expected
+                )
+
+        step_only = AlphaBetaSearch(StepOnlyEnv())  # type: ignore
+        state, agent_id = self._positions(env, 10)[-1]
+        self.assertEqual(
+            step_only.search(state, agent_id, max_depth=3).value,
+            negamax(env, state, agent_id, 3),
+        )
+
+    def test_win(self):
+        env = QuoridorEnv()
+        board = env.initialize_state().board.copy()
+        board[0] = 0
+        board[0, 2, 7] = 1
+        state = QuoridorState(board, np.array([10, 10]))
+        result = AlphaBetaSearch(env).search(state, 0, max_depth=4)
+        self.assertEqual(result.value, WIN_VALUE - 1)
+        # Deeper iterations cannot change a won game.
+        self.assertEqual(result.depth, 1)
+        self.assertEqual(result.pv, [result.action])
+        self.assertTrue(env.step(state, 0, result.action).done)
+
+        # Without walls, agent 1 cannot stop the pawn and loses on the next ply.
+        state = QuoridorState(board, np.array([10, 0]))
+        result = AlphaBetaSearch(env).search(state, 1, max_depth=4)
+        self.assertEqual(result.value, -(WIN_VALUE - 2))
+        self.assertEqual(result.depth, 2)
+
+    def test_stats(self):
+        env = QuoridorEnv()
+        engine = AlphaBetaSearch(env, max_depth=2)
+        state = env.initialize_state()
+        result = engine.search(state, 0)
+        self.assertEqual(result.depth, 2)
+        self.assertEqual(len(result.iteration_nodes), 2)
+        self.assertEqual(sum(result.iteration_nodes), result.nodes)
+        self.assertGreater(result.nodes_per_sec, 0)
+        self.assertGreater(result.effective_branching_factor, 1)
+        self.assertEqual(result.pv[0], result.action)
+        agent_id = 0
+        for action in result.pv:
+            state = env.step(state, agent_id, action)
+            agent_id = 1 - agent_id
+        # The pawn steps from (4, 0) towards its goal.
+        self.assertEqual(engine.search(env.initialize_state(), 0, 1).action, 4 * 9 + 1)
+
+        calls = []
+
+        def evaluation(state, agent_id):
+            calls.append(agent_id)
+            return 0.0
+
+        AlphaBetaSearch(env, evaluation).search(env.initialize_state(), 1, 1)
+        self.assertTrue(calls)
+        self.assertEqual(set(calls), {0})
+
+    def test_time_limit(self):
+        env = QuoridorEnv()
+        result = AlphaBetaSearch(env).search(env.initialize_state(), 0, time_limit=0.2)
+        self.assertGreaterEqual(result.depth, 1)
+        self.assertLess(result.seconds, 1.0)
+        self.assertGreater(result.nodes, sum(result.iteration_nodes))
+
+    def test_root_actions(self):
+        env = OthelloEnv(backend="bitboard")
+        engine = AlphaBetaSearch(env)
+        state, agent_id = self._positions(env, 12)[-1]
+        actions = env.legal_actions(state, agent_id, encoding="indices")
+        for subset in (actions[:1], actions[1::2]):
+            result = engine.search(state, agent_id, max_depth=3, actions=subset)
+            self.assertIn(result.action, subset)
+            self.assertEqual(result.iteration_actions[-1], result.action)
+            self.assertEqual(result.iteration_values[-1], result.value)
+            expected = max(
+                -negamax(env, env.step(state, agent_id, action), 1 - agent_id, 2)
+                for action in subset
+            )
+            self.assertEqual(result.value, expected)
+        # The full search is not affected by the restricted ones.
+        self.assertEqual(
+            engine.search(state, agent_id, max_depth=3).value,
+            negamax(env, state, agent_id, 3),
+        )
+        for subset in ([], [actions[0], 64]):
+            self.assertRaises(
+                ValueError, engine.search, state, agent_id, 3, None, subset
+            )
+
+    def test_invalid(self):
+        env = QuoridorEnv()
+        engine = AlphaBetaSearch(env)
+        self.assertRaises(ValueError, engine.search, env.initialize_state(), 0, 0)
+        state = env.initialize_state()
+        state.done = True
+        self.assertRaises(ValueError, engine.search, state, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
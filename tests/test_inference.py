@@ -0,0 +1,183 @@
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from fights.base import BaseAgent
+from fights.envs import quoridor
+from fights.envs.quoridor import QuoridorEnv
+from fights.inference import InferenceBroker
+from fights.runner import GameRunner
+from fights.search import TreeParallelMCTS
+
+
+class LinearModel:
+    """
+    Softmax policy and tanh value of linear functions of the board.
+    """
+
+    def __init__(self, seed=0):
+        rng = np.random.default_rng(seed)
+        size = 4 * 9 * 9
+        self.policy_weights = rng.normal(size=(size, quoridor.NUM_ACTIONS))
+        self.value_weights = rng.normal(size=size) / size
+        self.batch_sizes = []
+
+    def __call__(self, boards):
+        self.batch_sizes.append(len(boards))
+        x = boards.reshape(len(boards), -1).astype(np.float64)
+        logits = x @ self.policy_weights
+        policies = np.exp(logits - logits.max(axis=1, keepdims=True))
+        policies /= policies.sum(axis=1, keepdims=True)
+        return np.tanh(x @ self.value_weights), policies
+
+
+class NeuralAgent(BaseAgent):
+    env_id = ("quoridor", 0)  # type: ignore
+
+    def __init__(self, agent_id, env, broker):
+        self.agent_id = agent_id
+        self.env = env
+        self.broker = broker
+
+    def __call__(self, state):
+        _, policy = self.broker.evaluate(state, self.agent_id)
+        actions = self.env.legal_actions(state, self.agent_id, encoding="indices")
+        return actions[np.argmax(policy[actions])]
+
+
+class TestInferenceBroker(unittest.TestCase):
+    def setUp(self) -> None:
+        self.env = QuoridorEnv()
+        self.model = LinearModel()
+
+    def test_evaluate(self):
+        state = self.env.step(self.env.initialize_state(), 0, 4 * 9 + 1)
+        with InferenceBroker(
+            self.model, agent_frame_actions=quoridor.AGENT_FRAME_ACTIONS
+        ) as broker:
+            for agent_id in (0, 1):
+                value, policy = broker.evaluate(state, agent_id)
+                values, policies = LinearModel()(state.perspective(agent_id)[None])
+                self.assertAlmostEqual(value, values[0])
+                policy = quoridor.legal_actions_to_agent_frame(
+                    policy.reshape(3, 9, 9), agent_id
+                ).reshape(-1)
+                np.testing.assert_allclose(policy, policies[0])
+
+            actions = self.env.legal_actions(state, 1, encoding="indices")
+            value, priors = broker(state, 1, actions)
+            self.assertAlmostEqual(priors.sum(), 1)
+            _, policy = broker.evaluate(state, 1)
+            np.testing.assert_allclose(priors, policy[actions] / policy[actions].sum())
+        self.assertRaises(RuntimeError, broker.submit, state.board)
+
+    def test_batching(self):
+        states = [self.env.initialize_state()]
+        for action in (4 * 9 + 1, 4 * 9 + 7, 3 * 9 + 1):
+            states.append(self.env.step(states[-1], (len(states) - 1) % 2, action))
+        results = {}
+
+        def request(index):
+            results[index] = broker.evaluate(states[index % len(states)], index % 2)
+
+        broker = InferenceBroker(self.model, max_batch_size=8, max_wait=1.0)
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        broker.close()
+        # Full batches run at once, and the rest after waiting.
+        self.assertEqual(self.model.batch_sizes, [8, 8, 4])
+        for index, (value, _) in results.items():
+            board = states[index % len(states)].perspective(index % 2)
+            self.assertAlmostEqual(value, LinearModel()(board[None])[0][0])
+        stats = broker.stats
+        self.assertEqual(stats.requests, 20)
+        self.assertEqual(stats.batches, 3)
+        self.assertAlmostEqual(stats.mean_batch_size, 20 / 3)
+        self.assertGreater(stats.requests_per_sec, 0)
+        self.assertGreaterEqual(stats.p99_latency, stats.mean_latency * 0.5)
+        self.assertGreaterEqual(stats.seconds, stats.model_seconds)
+
+        # A lone request runs once the wait is over.
+        with InferenceBroker(self.model, max_wait=0.05) as broker:
+            start = time.perf_counter()
+            broker.evaluate(states[0], 0)
+            self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+            self.assertLess(broker.stats.mean_latency, 1.0)
+
+    def test_games(self):
+        with InferenceBroker(
+            self.model,
+            max_batch_size=4,
+            max_wait=0.5,
+            agent_frame_actions=quoridor.AGENT_FRAME_ACTIONS,
+        ) as broker:
+
+            def make_agents(index):
+                return [
+                    NeuralAgent(0, self.env, broker),
+                    NeuralAgent(1, self.env, broker),
+                ]
+
+            results = GameRunner(self.env, make_agents, 4, max_plies=10).run(4)
+            self.assertEqual([result.plies for result in results], [10] * 4)
+            self.assertEqual(broker.stats.requests, 40)
+            self.assertLess(broker.stats.batches, 40)
+
+            engine = TreeParallelMCTS(self.env, broker, num_threads=4, selection="puct")
+            result = engine.search(self.env.initialize_state(), 0, num_simulations=100)
+            self.assertEqual(result.simulations, 100)
+
+    def test_errors(self):
+        def failing_model(boards):
+            raise RuntimeError("model failed")
+
+        def short_model(boards):
+            return np.zeros(1), np.zeros((1, quoridor.NUM_ACTIONS))
+
+        state = self.env.initialize_state()
+        for model, error in ((failing_model, RuntimeError), (short_model, ValueError)):
+            with InferenceBroker(model, max_batch_size=2, max_wait=0.0) as broker:
+                futures = [broker.submit(state.board), broker.submit(state.board)]
+                for future in futures:
+                    self.assertRaises(error, future.result)
+            # The broker keeps serving after a failed batch.
+        with InferenceBroker(self.model) as broker:
+            broker.evaluate(state, 0)
+
+        # Cancelled requests are dropped, and requests completed by their
+        # requester are skipped, without stopping the broker.
+        model = LinearModel()
+        with InferenceBroker(model, max_batch_size=4, max_wait=0.05) as broker:
+            cancelled = broker.submit(state.board)
+            self.assertTrue(cancelled.cancel())
+            value, _ = broker.submit(state.board).result(timeout=5.0)
+            self.assertEqual(model.batch_sizes, [1])
+
+        release = threading.Event()
+
+        def blocking_model(boards):
+            release.wait(5.0)
+            return model(boards)
+
+        with InferenceBroker(blocking_model, max_wait=0.0) as broker:
+            future = broker.submit(state.board)
+            while not future.running():
+                time.sleep(0.001)
+            self.assertFalse(future.cancel())
+            future.set_result(None)
+            release.set()
+            self.assertAlmostEqual(
+                broker.submit(state.board).result(timeout=5.0)[0], value
+            )
+            self.assertIsNone(future.result())
+        self.assertRaises(ValueError, InferenceBroker, self.model, 0)
+        self.assertRaises(ValueError, InferenceBroker, self.model, 1, -1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
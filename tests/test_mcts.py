@@ -0,0 +1,170 @@
+import unittest
+
+import numpy as np
+
+from fights.envs.othello import OthelloEnv
+from fights.envs.puoribor import PuoriborEnv
+from fights.envs.quoridor import QuoridorEnv, QuoridorState
+from fights.search import MCTS, RolloutEvaluator
+from fights.search.mcts_cython import backup, select_leaf
+
+
+class TestMCTS(unittest.TestCase):
+    def check_tree(self, engine):
+        size = engine.size
+        first = engine.first_child[:size]
+        count = engine.num_children[:size]
+        visits = engine.visits[:size]
+        for node in np.flatnonzero(first >= 0):
+            children = slice(first[node], first[node] + count[node])
+            # Every visit of an expanded node after the first one went to a child.
+            self.assertEqual(visits[node], 1 + visits[children].sum())
+            self.assertAlmostEqual(engine.priors[children].sum(), 1)
+            self.assertIn(node, engine.states)
+
+    def test_kernels(self):
+        # Root 0 with children 1 to 3, and child 1 with children 4 and 5.
+        first_child = np.array([1, 4, -1, -1, -1, -1])
+        num_children = np.array([3, 2, 0, 0, 0, 0], dtype=np.intc)
+        visits = np.array([4, 2, 1, 0, 0, 0])
+        value_sums = np.array([0.0, 1.0, -1.0, 0.0, 0.0, 0.0])
+        priors = np.array([0.0, 0.2, 0.2, 0.6, 0.5, 0.5])
+        path = np.empty(8, dtype=np.int_)
+
+        args = (first_child, num_children, visits, value_sums, priors)
+        # UCT tries the unvisited child first.
+        self.assertEqual(select_leaf(0, *args, 1.0, False, path), 2)
+        np.testing.assert_array_equal(path[:2], [0, 3])
+        # PUCT follows the prior of the unvisited child unless the value of the
+        # visited one outweighs it.
+        self.assertEqual(select_leaf(0, *args, 1.0, True, path), 2)
+        np.testing.assert_array_equal(path[:2], [0, 3])
+        self.assertEqual(select_leaf(0, *args, 0.1, True, path), 3)
+        np.testing.assert_array_equal(path[:3], [0, 1, 4])
+
+        backup(path, 3, 1.0, visits, value_sums)
+        np.testing.assert_array_equal(visits, [5, 3, 1, 0, 1, 0])
+        np.testing.assert_array_equal(value_sums, [-1.0, 2.0, -1.0, 0.0, -1.0, 0.0])
+        self.assertEqual(select_leaf(2, *args, 1.0, True, path), 1)
+
+    def test_win(self):
+        env = QuoridorEnv()
+        board = env.initialize_state().board.copy()
+        board[0] = 0
+        board[0, 2, 7] = 1
+        state = QuoridorState(board, np.array([10, 10]))
+        engine = MCTS(env, RolloutEvaluator(env, seed=0))
+        result = engine.search(state, 0, num_simulations=2000)
+        self.assertEqual(result.action, 2 * 9 + 8)
+        self.assertEqual(result.value, 1)
+        self.assertEqual(result.visits.sum(), 2000 - 1)
+        self.assertEqual(result.simulations, 2000)
+        self.assertGreater(result.sims_per_sec, 0)
+        np.testing.assert_array_equal(
+            result.actions, env.legal_actions(state, 0, encoding="indices")
+        )
+        self.assertAlmostEqual(result.policy.sum(), 1)
+        self.check_tree(engine)
+
+    def test_reuse(self):
+        env = OthelloEnv(backend="bitboard")
+        engine = MCTS(env, RolloutEvaluator(env, seed=0), num_simulations=300)
+        state = env.initialize_state()
+        agent_id = 0
+        result = engine.search(state, agent_id)
+        self.assertEqual(result.reused, 0)
+        for _ in range(4):
+            state = env.step(state, agent_id, result.action)
+            agent_id = 1 - agent_id
+            result = engine.search(state, agent_id)
+            self.assertEqual(result.reused, result.visits.sum() + 1 - 300)
+            self.check_tree(engine)
+
+        # Two plies later, the grandchild is found as well.
+        visits = engine.visits[0]
+        state = env.step(state, agent_id, result.action)
+        actions = env.legal_actions(state, 1 - agent_id, encoding="indices")
+        first = engine.first_child[engine._child(0, result.action)]
+        self.assertGreaterEqual(first, 0)
+        state = env.step(state, 1 - agent_id, actions[0])
+        reused = engine.search(state, agent_id).reused
+        self.assertGreater(reused, 0)
+        self.assertLess(reused, visits)
+        self.check_tree(engine)
+
+        # An unrelated state starts a new tree.
+        result = engine.search(env.initialize_state(), 1)
+        self.assertEqual(result.reused, 0)
+        self.assertEqual(engine.root_agent, 1)
+
+        engine.advance(result.action)
+        self.assertEqual(engine.root_agent, 0)
+        self.assertEqual(engine.visits[0], result.visits.max())
+        self.check_tree(engine)
+        engine.advance(-1)
+        self.assertEqual(engine.size, 0)
+
+    def test_advance_unvisited(self):
+        for env in (PuoriborEnv(), OthelloEnv(backend="bitboard")):
+            engine = MCTS(env, RolloutEvaluator(env, seed=0))
+            state = env.initialize_state()
+            result = engine.search(state, 0, num_simulations=3)
+            action = int(result.actions[result.visits == 0][-1])
+            engine.advance(action)
+            self.assertEqual(engine.root_agent, 1)
+            expected = env.step(state, 0, action)
+            np.testing.assert_array_equal(engine.states[0].board, expected.board)
+            self.assertEqual(engine.states[0].hash, expected.hash)
+            self.assertEqual(engine.search(expected, 1, 10).simulations, 10)
+
+    def test_capacity(self):
+        env = QuoridorEnv()
+        engine = MCTS(env, RolloutEvaluator(env, seed=0), capacity=1000)
+        result = engine.search(env.initialize_state(), 0, num_simulations=500)
+        self.assertLessEqual(engine.size, 1000)
+        self.assertEqual(result.simulations, 500)
+        self.check_tree(engine)
+
+        # The root and its children must fit.
+        engine = MCTS(PuoriborEnv(), capacity=50)
+        with self.assertRaisesRegex(ValueError, "capacity"):
+            engine.search(PuoriborEnv().initialize_state(), 0, 10)
+
+    def test_evaluator(self):
+        env = QuoridorEnv()
+        state = env.initialize_state()
+        calls = []
+
+        def evaluator(state, agent_id, actions):
+            calls.append(agent_id)
+            priors = np.zeros(len(actions))
+            priors[-1] = 1
+            return 0.0, priors
+
+        engine = MCTS(env, evaluator, selection="puct")
+        result = engine.search(state, 1, num_simulations=50)
+        self.assertEqual(result.action, result.actions[-1])
+        self.assertEqual(result.visits[-1], 49)
+        self.assertEqual(set(calls), {0, 1})
+
+        result = engine.search(state, 0, time_limit=0.1, num_simulations=None)
+        self.assertEqual(result.action, result.actions[-1])
+        self.assertGreater(result.simulations, 1)
+        self.assertLess(result.seconds, 1.0)
+
+    def test_invalid(self):
+        env = QuoridorEnv()
+        self.assertRaises(ValueError, MCTS, env, selection="ucb")
+        self.assertRaises(ValueError, MCTS, env, capacity=0)
+        othello = OthelloEnv()
+        othello.board_size = 6
+        self.assertRaises(ValueError, RolloutEvaluator, othello)
+        engine = MCTS(env, num_simulations=None)
+        self.assertRaises(ValueError, engine.search, env.initialize_state(), 0)
+        state = env.initialize_state()
+        state.done = True
+        self.assertRaises(ValueError, engine.search, state, 0, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,18 @@
 import unittest
+from dataclasses import replace
 
 import numpy as np
 
-from fights.envs.othello import OthelloEnv
+from fights.envs.othello import (
+    ACTIONS,
+    NUM_ACTIONS,
+    OthelloEnv,
+    decode_actions,
+    encode_actions,
+    from_agent_frame,
+    legal_actions_to_agent_frame,
+    to_agent_frame,
+)
 
 
 class TestOthelloEnv(unittest.TestCase):
@@ -912,6 +922,188 @@ class TestOthelloEnv(unittest.TestCase):
         )
         return expected_boards
 
+    def test_try_step(self):
+        state = self.env.step(self.initial_state, 0, [2, 3])
+        for agent_id in [0, 1, 2]:
+            for r in range(-1, OthelloEnv.board_size + 1):
+                for c in range(-1, OthelloEnv.board_size + 1):
+                    try:
+                        expected = self.env.step(state, agent_id, [r, c])
+                    except ValueError:
+                        expected = None
+                    next_state = self.env.try_step(state, agent_id, [r, c])
+                    self.assertEqual(
+                        self.env.is_legal(state, agent_id, [r, c]), bool(expected)
+                    )
+                    if expected is None:
+                        self.assertIsNone(next_state)
+                    else:
+                        np.testing.assert_array_equal(next_state.board, expected.board)
+                        np.testing.assert_array_equal(
+                            next_state.legal_actions, expected.legal_actions
+                        )
+
+    def test_compact_boards(self):
+        rng = np.random.default_rng(0)
+        states = [self.env.initialize_state(dtype) for dtype in (np.int8, np.uint8)]
+        state = self.initial_state
+        agent_id = 0
+        while not state.done:
+            candidates = np.argwhere(state.legal_actions[agent_id])
+            action = candidates[rng.integers(len(candidates))]
+            state = self.env.step(state, agent_id, action)
+            for index, compact in enumerate(states):
+                self.assertTrue(self.env.is_legal(compact, agent_id, action))
+                compact = states[index] = self.env.step(compact, agent_id, action)
+                self.assertEqual(compact, state)
+                self.assertEqual(compact.board.dtype, compact.legal_actions.dtype)
+            agent_id = 1 - agent_id
+        self.assertEqual(states[0].board.dtype, np.int8)
+        self.assertEqual(states[1].to_bitboard(), state.to_bitboard())
+        self.assertRaises(ValueError, self.env.initialize_state, np.float32)
+
+    def test_out_arrays(self):
+        rng = np.random.default_rng(0)
+        board = self.initial_state.board
+        buffers = [(np.empty_like(board), np.empty_like(board)) for _ in range(2)]
+        perspective = np.empty_like(board)
+        state = reused = self.initial_state
+        agent_id = 0
+        ply = 0
+        while not state.done:
+            candidates = np.argwhere(state.legal_actions[agent_id])
+            action = candidates[rng.integers(len(candidates))]
+            state = self.env.step(state, agent_id, action)
+            out = buffers[ply % 2]
+            reused = self.env.step(reused, agent_id, action, out=out)
+            self.assertIs(reused.board, out[0])
+            self.assertIs(reused.legal_actions, out[1])
+            self.assertEqual(reused, state)
+            np.testing.assert_array_equal(reused.reward, state.reward)
+            for perspective_id in (0, 1):
+                self.assertIs(
+                    reused.perspective(perspective_id, out=perspective), perspective
+                )
+                np.testing.assert_array_equal(
+                    perspective, state.perspective(perspective_id)
+                )
+            agent_id = 1 - agent_id
+            ply += 1
+        self.assertIsNone(self.env.try_step(reused, agent_id, [0, 0], out=out))
+
+    def test_agent_frame(self):
+        rng = np.random.default_rng(0)
+        state = self.initial_state
+        agent_id = 0
+        while not state.done:
+            rotated = replace(
+                state,
+                board=state.board[::-1, ::-1, ::-1].copy(),
+                legal_actions=state.legal_actions[::-1].copy(),
+            )
+            rotated_legal_actions = [
+                [self.env.is_legal(rotated, 1 - agent_id, [r, c]) for c in range(8)]
+                for r in range(8)
+            ]
+            legal_actions = state.legal_actions[agent_id]
+            np.testing.assert_array_equal(
+                legal_actions_to_agent_frame(legal_actions, 1), rotated_legal_actions
+            )
+            candidates = np.argwhere(legal_actions)
+            action = candidates[rng.integers(len(candidates))]
+            agent_action = to_agent_frame(action, 1)
+            np.testing.assert_array_equal(from_agent_frame(agent_action, 1), action)
+            state = self.env.step(state, agent_id, action)
+            rotated = self.env.step(rotated, 1 - agent_id, agent_action)
+            np.testing.assert_array_equal(state.board[::-1, ::-1, ::-1], rotated.board)
+            agent_id = 1 - agent_id
+        np.testing.assert_array_equal(
+            to_agent_frame([[3, 3], [0, 1]], 1), [[3, 3], [7, 6]]
+        )
+
+    def test_flat_actions(self):
+        np.testing.assert_array_equal(encode_actions(ACTIONS), np.arange(NUM_ACTIONS))
+        np.testing.assert_array_equal(decode_actions(np.arange(NUM_ACTIONS)), ACTIONS)
+        self.assertRaises(ValueError, decode_actions, NUM_ACTIONS)
+        self.assertRaises(ValueError, decode_actions, [0, -1])
+        rng = np.random.default_rng(0)
+        state = self.initial_state
+        agent_id = 0
+        for _ in range(40):
+            legal_actions = self.env.legal_actions(state, agent_id)
+            mask = self.env.legal_actions(state, agent_id, encoding="mask")
+            indices = self.env.legal_actions(state, agent_id, encoding="indices")
+            self.assertEqual(mask.dtype, np.bool_)
+            np.testing.assert_array_equal(mask, legal_actions.reshape(-1) != 0)
+            np.testing.assert_array_equal(indices, np.flatnonzero(mask))
+            np.testing.assert_array_equal(ACTIONS[indices], np.argwhere(legal_actions))
+            index = indices[rng.integers(len(indices))]
+            self.assertTrue(self.env.is_legal(state, agent_id, index))
+            self.assertIsNone(self.env.try_step(state, agent_id, NUM_ACTIONS))
+            self.assertFalse(self.env.is_legal(state, agent_id, -1))
+            next_state = self.env.step(state, agent_id, index)
+            self.assertEqual(next_state, self.env.step(state, agent_id, ACTIONS[index]))
+            state = next_state
+            if state.done:
+                break
+            agent_id = 1 - agent_id
+        self.assertRaises(
+            ValueError, self.env.legal_actions, state, agent_id, encoding="sparse"
+        )
+
+    def test_expand(self):
+        # This seed plays games with a skip.
+        rng = np.random.default_rng(5)
+        skips = 0
+        for dtype in (np.int_, np.uint8):
+            state = self.env.initialize_state(dtype)
+            agent_id = 0
+            while not state.done:
+                children = self.env.expand(state, agent_id)
+                np.testing.assert_array_equal(
+                    children.actions,
+                    self.env.legal_actions(state, agent_id, encoding="indices"),
+                )
+                self.assertEqual(children.boards.dtype, dtype)
+                for index, action in enumerate(children.actions):
+                    child = children.state(index)
+                    expected = self.env.step(state, agent_id, action)
+                    self.assertEqual(child, expected)
+                    np.testing.assert_array_equal(child.reward, expected.reward)
+                    self.assertEqual(child.hash, child.rehash())
+                skips += children.actions[0] == 27
+                state = children.state(rng.integers(len(children.actions)))
+                agent_id = 1 - agent_id
+        self.assertGreater(skips, 0)
+
+
+class TestOthelloBitboardEnv(TestOthelloEnv):
+    def setUp(self):
+        self.env = OthelloEnv(backend="bitboard")
+        self.initial_state = self.env.initialize_state()
+
+    def test_backend(self):
+        self.assertRaisesRegex(
+            ValueError, "invalid backend", lambda: OthelloEnv(backend="planes")
+        )
+        rng = np.random.default_rng(0)
+        reference = OthelloEnv()
+        state = self.initial_state
+        agent_id = 0
+        while not state.done:
+            for r in range(-1, 9):
+                for c in range(-1, 9):
+                    self.assertEqual(
+                        self.env.is_legal(state, agent_id, [r, c]),
+                        reference.is_legal(state, agent_id, [r, c]),
+                    )
+            legal_actions = np.argwhere(state.legal_actions[agent_id])
+            action = legal_actions[rng.integers(len(legal_actions))]
+            next_state = self.env.step(state, agent_id, action)
+            self.assertEqual(next_state, reference.step(state, agent_id, action))
+            state = next_state
+            agent_id = 1 - agent_id
+
 
 if __name__ == "__main__":
     unittest.main()
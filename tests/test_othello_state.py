@@ -1,7 +1,9 @@
 import unittest
+from copy import deepcopy
 
 import numpy as np
 
+from fights.envs import othello_bitboard
 from fights.envs.othello import OthelloEnv, OthelloState
 
 
@@ -31,6 +33,126 @@ class TestOthelloState(unittest.TestCase):
             rotated_board,
         )
 
+    def test_search_state(self):
+        rng = np.random.default_rng(0)
+        search_state = self.env.search_state(self.initial_state)
+        states = [self.initial_state]
+        agent_id = 0
+        while not states[-1].done:
+            legal_actions = np.argwhere(states[-1].legal_actions[agent_id])
+            action = legal_actions[rng.integers(len(legal_actions))]
+            self.assertEqual(search_state.apply(agent_id, *action), 0)
+            states.append(self.env.step(states[-1], agent_id, action))
+            np.testing.assert_array_equal(search_state.board, states[-1].board)
+            np.testing.assert_array_equal(
+                search_state.legal_actions, states[-1].legal_actions
+            )
+            np.testing.assert_array_equal(search_state.reward, states[-1].reward)
+            self.assertEqual(search_state.done, states[-1].done)
+            self.assertEqual(search_state.hash, states[-1].hash)
+            agent_id = 1 - agent_id
+
+        self.assertNotEqual(search_state.apply(agent_id, 0, 8), 0)
+        for state in reversed(states[:-1]):
+            search_state.undo()
+            np.testing.assert_array_equal(search_state.board, state.board)
+            np.testing.assert_array_equal(
+                search_state.legal_actions, state.legal_actions
+            )
+            np.testing.assert_array_equal(search_state.reward, state.reward)
+            self.assertEqual(search_state.done, state.done)
+            self.assertEqual(search_state.hash, state.hash)
+        self.assertRaises(IndexError, search_state.undo)
+
+    def test_hash(self):
+        rng = np.random.default_rng(1)
+        state = self.initial_state
+        seen = {state: state}
+        agent_id = 0
+        while not state.done:
+            legal_actions = np.argwhere(state.legal_actions[agent_id])
+            action = legal_actions[rng.integers(len(legal_actions))]
+            state = self.env.step(state, agent_id, action)
+            hash = state.hash
+            self.assertEqual(state.rehash(), hash)
+            np.testing.assert_array_equal(
+                seen.setdefault(state, state).board, state.board
+            )
+            agent_id = 1 - agent_id
+
+        copied = deepcopy(state)
+        self.assertEqual(copied, state)
+        self.assertIn(copied, seen)
+        copied.board[0] = 0
+        self.assertNotEqual(copied.rehash(), state.hash)
+        self.assertNotEqual(copied, state)
+
+    def test_bitboard(self):
+        black, white = self.initial_state.to_bitboard()
+        self.assertEqual((black, white), (1 << 28 | 1 << 35, 1 << 27 | 1 << 36))
+        self.assertEqual(OthelloState.from_bitboard(black, white), self.initial_state)
+        self.assertEqual(
+            [othello_bitboard.perft(black, white, 0, depth) for depth in range(1, 7)],
+            [4, 12, 56, 244, 1396, 8200],
+        )
+
+        state = OthelloState.from_bitboard(black | white, 0)
+        self.assertTrue(state.done)
+        np.testing.assert_array_equal(state.reward, [1, -1])
+
+    def test_rollout(self):
+        board = self.initial_state.board
+        winners, lengths = othello_bitboard.rollout(board, 0, 64, 1, 200)
+        self.assertTrue(np.isin(winners, [-1, 0, 1]).all())
+        self.assertTrue(((lengths >= 60) & (lengths < 200)).all())
+        for dtype, num_threads in ((np.uint8, 2), (np.int_, 0)):
+            results = othello_bitboard.rollout(
+                board.astype(dtype), 0, 64, 1, 200, num_threads=num_threads
+            )
+            np.testing.assert_array_equal(results[0], winners)
+            np.testing.assert_array_equal(results[1], lengths)
+        winners, lengths = othello_bitboard.rollout(board, 0, 4, 1, 10)
+        np.testing.assert_array_equal(winners, -1)
+        np.testing.assert_array_equal(lengths, 10)
+
+        # Play until a few cells are left and compare the winners against the exact
+        # distribution of uniformly random play.
+        rng = np.random.default_rng(0)
+        state = self.initial_state
+        agent_id = 0
+        while state.board.sum() < 60:
+            legal_actions = np.argwhere(state.legal_actions[agent_id])
+            action = legal_actions[rng.integers(len(legal_actions))]
+            state = self.env.step(state, agent_id, action)
+            agent_id = 1 - agent_id
+
+        def distribution(state, agent_id):
+            if state.done:
+                # Indexed by winner + 1, where a draw is winner -1.
+                return np.eye(3)[int(np.sign(state.reward[0])) % 3]
+            legal_actions = np.argwhere(state.legal_actions[agent_id])
+            return np.mean(
+                [
+                    distribution(self.env.step(state, agent_id, action), 1 - agent_id)
+                    for action in legal_actions
+                ],
+                axis=0,
+            )
+
+        expected = distribution(state, agent_id)
+        winners, _ = othello_bitboard.rollout(state.board, agent_id, 4000, 2, 200)
+        for winner, probability in zip((-1, 0, 1), expected):
+            deviation = 4 * np.sqrt(probability * (1 - probability) / len(winners))
+            self.assertAlmostEqual(
+                (winners == winner).mean(), probability, delta=deviation + 1e-9
+            )
+
+
+class TestOthelloBitboardState(TestOthelloState):
+    def setUp(self) -> None:
+        self.env = OthelloEnv(backend="bitboard")
+        self.initial_state = self.env.initialize_state()
+
 
 if __name__ == "__main__":
     unittest.main()
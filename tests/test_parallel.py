@@ -0,0 +1,128 @@
+import unittest
+
+import numpy as np
+
+from fights.envs.othello import OthelloEnv
+from fights.envs.quoridor import QuoridorEnv, QuoridorState
+from fights.search import (
+    AlphaBetaSearch,
+    RootParallelAlphaBeta,
+    RootParallelMCTS,
+    TreeParallelMCTS,
+)
+
+
+def even_evaluator(state, agent_id, actions):
+    return 0.0, None
+
+
+def failing_evaluator(state, agent_id, actions):
+    raise RuntimeError("evaluator failed")
+
+
+def failing_factory(index):
+    return failing_evaluator
+
+
+class TestParallel(unittest.TestCase):
+    def _position(self, env, num_plies, seed=0):
+        rng = np.random.default_rng(seed)
+        state = env.initialize_state()
+        agent_id = 0
+        for _ in range(num_plies):
+            actions = env.legal_actions(state, agent_id, encoding="indices")
+            state = env.step(state, agent_id, actions[rng.integers(len(actions))])
+            agent_id = 1 - agent_id
+        return state, agent_id
+
+    def test_root_parallel_mcts(self):
+        env = OthelloEnv(backend="bitboard")
+        state = env.initialize_state()
+        with RootParallelMCTS(env, num_workers=2, seed=0) as engine:
+            result = engine.search(state, 0, num_simulations=100)
+            self.assertEqual(result.simulations, 200)
+            self.assertEqual(result.reused, 0)
+            # The first simulation of each tree expands its root.
+            self.assertEqual(result.visits.sum(), 2 * 99)
+            np.testing.assert_array_equal(
+                result.actions, env.legal_actions(state, 0, encoding="indices")
+            )
+            self.assertEqual(result.action, result.actions[np.argmax(result.visits)])
+            self.assertTrue((np.abs(result.values) <= 1).all())
+
+            state = env.step(state, 0, result.action)
+            actions = env.legal_actions(state, 1, encoding="indices")
+            state = env.step(state, 1, actions[0])
+            result = engine.search(state, 0, num_simulations=100)
+            self.assertGreater(result.reused, 0)
+            state.done = True
+            self.assertRaises(ValueError, engine.search, state, 0)
+
+        engine = RootParallelMCTS(env, num_workers=1, evaluator_factory=failing_factory)
+        self.assertRaises(RuntimeError, engine.search, env.initialize_state(), 0)
+        engine.close()
+        engine = RootParallelMCTS(
+            env, num_workers=1, evaluator_factory=failing_evaluator  # type: ignore
+        )
+        self.assertRaises(TypeError, engine.search, env.initialize_state(), 0)
+        engine.close()
+
+    def test_root_parallel_alphabeta(self):
+        env = OthelloEnv(backend="bitboard")
+        serial = AlphaBetaSearch(env)
+        with RootParallelAlphaBeta(env, num_workers=3) as engine:
+            for num_plies in (0, 9, 20):
+                state, agent_id = self._position(env, num_plies)
+                result = engine.search(state, agent_id, max_depth=4)
+                expected = serial.search(state, agent_id, max_depth=4)
+                self.assertEqual(result.depth, 4)
+                self.assertEqual(result.iteration_values, expected.iteration_values)
+                self.assertEqual(result.value, expected.value)
+                self.assertEqual(result.pv[0], result.action)
+                self.assertEqual(sum(result.iteration_nodes), result.nodes)
+                child = env.step(state, agent_id, result.action)
+                self.assertEqual(
+                    -serial.search(child, 1 - agent_id, max_depth=3).value,
+                    expected.value,
+                )
+
+            result = engine.search(env.initialize_state(), 0, time_limit=0.2)
+            self.assertGreaterEqual(result.depth, 1)
+            self.assertEqual(len(result.iteration_values), result.depth)
+            self.assertRaises(ValueError, engine.search, state, agent_id, 0)
+
+    def test_tree_parallel_mcts(self):
+        env = QuoridorEnv()
+        board = env.initialize_state().board.copy()
+        board[0] = 0
+        board[0, 2, 7] = 1
+        state = QuoridorState(board, np.array([10, 10]))
+        # Random playouts win almost every game from here, so only the exact
+        # win stands out when every other leaf is even.
+        engine = TreeParallelMCTS(env, even_evaluator, num_threads=4)
+        result = engine.search(state, 0, num_simulations=1000)
+        self.assertEqual(result.action, 2 * 9 + 8)
+        self.assertEqual(result.value, 1)
+        self.assertEqual(result.simulations, 1000)
+        # Every virtual loss was taken back.
+        self.assertEqual(engine.visits[0], 1000)
+        size = engine.size
+        first = engine.first_child[:size]
+        for node in np.flatnonzero(first >= 0):
+            children = slice(first[node], first[node] + engine.num_children[node])
+            self.assertGreaterEqual(
+                engine.visits[node], 1 + engine.visits[children].sum()
+            )
+        self.assertTrue((engine.visits[:size] >= 0).all())
+
+        result = engine.search(env.initialize_state(), 1, time_limit=0.2)
+        self.assertGreater(result.simulations, 1)
+        self.assertLess(result.seconds, 1.0)
+
+        engine = TreeParallelMCTS(env, failing_evaluator, num_threads=2)
+        self.assertRaises(RuntimeError, engine.search, env.initialize_state(), 0)
+        self.assertEqual(engine.size, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,19 @@ from copy import deepcopy
 
 import numpy as np
 
-from fights.envs.puoribor import PuoriborEnv, PuoriborState
+from fights.envs.puoribor import (
+    ACTIONS,
+    NUM_ACTIONS,
+    PuoriborEnv,
+    PuoriborState,
+    decode_actions,
+    encode_actions,
+    from_agent_frame,
+    legal_actions_from_agent_frame,
+    legal_actions_to_agent_frame,
+    rotate_boards,
+    to_agent_frame,
+)
 
 
 class TestPuoriborEnv(unittest.TestCase):
@@ -503,6 +515,230 @@ class TestPuoriborEnv(unittest.TestCase):
             + 6 * 6,
         )
 
+    def test_legal_actions(self):
+        rng = np.random.default_rng(0)
+        state = self.initial_state
+        agent_id = 0
+        for _ in range(40):
+            legal_actions = self.env.legal_actions(state, agent_id)
+            expected = np.zeros_like(legal_actions)
+            for action in self._get_all_actions(state, agent_id):
+                expected[tuple(action)] = 1
+            np.testing.assert_array_equal(legal_actions, expected)
+
+            candidates = np.argwhere(legal_actions == 1)
+            walls = candidates[candidates[:, 0] > 0]
+            if len(walls) and rng.random() < 0.7:
+                state = self.env.step(state, agent_id, rng.choice(walls))
+            else:
+                state = self.env.step(state, agent_id, rng.choice(candidates))
+            if state.done:
+                break
+            agent_id = 1 - agent_id
+
+    def test_try_step(self):
+        state = self.env.step(self.initial_state, 0, [1, 4, 0])
+        state = self.env.step(state, 1, [2, 5, 0])
+        for action_type in range(5):
+            for coordinate_x in range(-1, PuoriborEnv.board_size + 1):
+                for coordinate_y in range(-1, PuoriborEnv.board_size + 1):
+                    action = [action_type, coordinate_x, coordinate_y]
+                    try:
+                        expected = self.env.step(state, 0, action)
+                    except ValueError:
+                        expected = None
+                    next_state = self.env.try_step(state, 0, action)
+                    self.assertEqual(
+                        self.env.is_legal(state, 0, action), bool(expected)
+                    )
+                    if expected is None:
+                        self.assertIsNone(next_state)
+                    else:
+                        np.testing.assert_array_equal(next_state.board, expected.board)
+                        np.testing.assert_array_equal(
+                            next_state.walls_remaining, expected.walls_remaining
+                        )
+                        self.assertEqual(next_state.done, expected.done)
+        self.assertFalse(self.env.is_legal(state, 2, [0, 4, 1]))
+
+    def test_compact_boards(self):
+        rng = np.random.default_rng(0)
+        dtypes = (np.int8, np.uint8)
+        states = [self.env.initialize_state(dtype) for dtype in dtypes]
+        state = self.initial_state
+        agent_id = 0
+        for _ in range(60):
+            legal_actions = self.env.legal_actions(state, agent_id)
+            candidates = np.argwhere(legal_actions)
+            action = candidates[rng.integers(len(candidates))]
+            state = self.env.step(state, agent_id, action)
+            for index, (dtype, compact) in enumerate(zip(dtypes, states)):
+                np.testing.assert_array_equal(
+                    self.env.legal_actions(compact, agent_id), legal_actions
+                )
+                compact = states[index] = self.env.step(compact, agent_id, action)
+                self.assertEqual(compact, state)
+                self.assertEqual(compact.board.dtype, dtype)
+                self.assertEqual(compact.distance_to_goal(0), state.distance_to_goal(0))
+                np.testing.assert_array_equal(
+                    compact.perspective(1), state.perspective(1)
+                )
+            if state.done:
+                break
+            agent_id = 1 - agent_id
+        self.assertRaises(ValueError, self.env.initialize_state, np.float32)
+
+    def test_out_arrays(self):
+        rng = np.random.default_rng(0)
+        buffers = [
+            (np.empty_like(self.initial_state.board), np.empty(2, dtype=np.int_))
+            for _ in range(2)
+        ]
+        mask = np.empty((4, 9, 9), dtype=np.bool_)
+        perspective = np.empty_like(self.initial_state.board)
+        state = reused = self.initial_state
+        agent_id = 0
+        for ply in range(60):
+            legal_actions = self.env.legal_actions(state, agent_id)
+            self.assertIs(self.env.legal_actions(reused, agent_id, out=mask), mask)
+            np.testing.assert_array_equal(mask, legal_actions)
+            candidates = np.argwhere(legal_actions)
+            action = candidates[rng.integers(len(candidates))]
+            state = self.env.step(state, agent_id, action)
+            out = buffers[ply % 2]
+            reused = self.env.step(reused, agent_id, action, out=out)
+            self.assertIs(reused.board, out[0])
+            self.assertEqual(reused, state)
+            for perspective_id in (0, 1):
+                self.assertIs(
+                    reused.perspective(perspective_id, out=perspective), perspective
+                )
+                np.testing.assert_array_equal(
+                    perspective, state.perspective(perspective_id)
+                )
+            if state.done:
+                break
+            agent_id = 1 - agent_id
+        self.assertIsNone(self.env.try_step(reused, agent_id, [0, -1, 0], out=out))
+
+        # Actions failing the path check leave the buffers untouched as well.
+        block_path = self.env.step(self.initial_state, 0, [1, 4, 0])
+        block_path = self.env.step(block_path, 1, [2, 5, 0])
+        board, walls_remaining = out[0].copy(), out[1].copy()
+        self.assertIsNone(self.env.try_step(block_path, 0, [2, 3, 0], out=out))
+        np.testing.assert_array_equal(out[0], board)
+        np.testing.assert_array_equal(out[1], walls_remaining)
+        block_path = self.env.step(self.initial_state, 0, [2, 5, 2])
+        block_path = self.env.step(block_path, 1, [1, 4, 3])
+        block_path = self.env.step(block_path, 0, [1, 4, 1])
+        self.assertIsNone(self.env.try_step(block_path, 1, [3, 4, 0], out=out))
+        np.testing.assert_array_equal(out[0], board)
+        np.testing.assert_array_equal(out[1], walls_remaining)
+
+    def test_agent_frame(self):
+        rng = np.random.default_rng(0)
+        state = self.initial_state
+        agent_id = 0
+        for _ in range(60):
+            rotated = PuoriborState(
+                board=rotate_boards(state.board),
+                walls_remaining=state.walls_remaining[::-1].copy(),
+            )
+            legal_actions = self.env.legal_actions(state, agent_id)
+            rotated_legal_actions = self.env.legal_actions(rotated, 1 - agent_id)
+            np.testing.assert_array_equal(
+                legal_actions_to_agent_frame(legal_actions, 1), rotated_legal_actions
+            )
+            np.testing.assert_array_equal(
+                legal_actions_from_agent_frame(rotated_legal_actions, 1), legal_actions
+            )
+            candidates = np.argwhere(legal_actions)
+            action = candidates[rng.integers(len(candidates))]
+            agent_action = to_agent_frame(action, 1)
+            np.testing.assert_array_equal(from_agent_frame(agent_action, 1), action)
+            np.testing.assert_array_equal(to_agent_frame(action, 0), action)
+            state = self.env.step(state, agent_id, action)
+            rotated = self.env.step(rotated, 1 - agent_id, agent_action)
+            np.testing.assert_array_equal(rotate_boards(state.board), rotated.board)
+            if state.done:
+                break
+            agent_id = 1 - agent_id
+
+        actions = np.array([[0, 1, 2], [1, 3, 4], [2, 0, 0]])
+        agent_ids = np.array([0, 1, 1])
+        translated = to_agent_frame(actions, agent_ids)
+        np.testing.assert_array_equal(translated[0], actions[0])
+        np.testing.assert_array_equal(translated[1:], to_agent_frame(actions[1:], 1))
+        masks = np.stack([legal_actions] * 3)
+        translated = legal_actions_to_agent_frame(masks, agent_ids)
+        np.testing.assert_array_equal(translated[0], legal_actions)
+        np.testing.assert_array_equal(
+            translated[2], legal_actions_to_agent_frame(legal_actions, 1)
+        )
+
+    def test_flat_actions(self):
+        np.testing.assert_array_equal(encode_actions(ACTIONS), np.arange(NUM_ACTIONS))
+        np.testing.assert_array_equal(decode_actions(np.arange(NUM_ACTIONS)), ACTIONS)
+        self.assertRaises(ValueError, decode_actions, NUM_ACTIONS)
+        self.assertRaises(ValueError, decode_actions, [0, -1])
+        rng = np.random.default_rng(0)
+        state = self.initial_state
+        agent_id = 0
+        for _ in range(40):
+            legal_actions = self.env.legal_actions(state, agent_id)
+            mask = self.env.legal_actions(state, agent_id, encoding="mask")
+            indices = self.env.legal_actions(state, agent_id, encoding="indices")
+            self.assertEqual(mask.dtype, np.bool_)
+            np.testing.assert_array_equal(mask, legal_actions.reshape(-1) != 0)
+            np.testing.assert_array_equal(indices, np.flatnonzero(mask))
+            np.testing.assert_array_equal(ACTIONS[indices], np.argwhere(legal_actions))
+            index = indices[rng.integers(len(indices))]
+            self.assertTrue(self.env.is_legal(state, agent_id, index))
+            self.assertIsNone(self.env.try_step(state, agent_id, NUM_ACTIONS))
+            self.assertFalse(self.env.is_legal(state, agent_id, -1))
+            next_state = self.env.step(state, agent_id, index)
+            self.assertEqual(next_state, self.env.step(state, agent_id, ACTIONS[index]))
+            state = next_state
+            if state.done:
+                break
+            agent_id = 1 - agent_id
+        self.assertRaises(
+            ValueError, self.env.legal_actions, state, agent_id, encoding="sparse"
+        )
+        out = np.empty(NUM_ACTIONS, dtype=np.int_)
+        self.assertIs(
+            self.env.legal_actions(state, agent_id, out=out, encoding="mask"), out
+        )
+        np.testing.assert_array_equal(
+            out, self.env.legal_actions(state, agent_id).reshape(-1)
+        )
+
+    def test_expand(self):
+        rng = np.random.default_rng(0)
+        state = self.env.initialize_state(np.int8)
+        agent_id = 0
+        for _ in range(30):
+            children = self.env.expand(state, agent_id)
+            np.testing.assert_array_equal(
+                children.actions,
+                self.env.legal_actions(state, agent_id, encoding="indices"),
+            )
+            self.assertEqual(children.boards.shape, (len(children.actions), 6, 9, 9))
+            self.assertEqual(children.boards.dtype, np.int8)
+            for index, action in enumerate(children.actions):
+                child = children.state(index)
+                self.assertEqual(child, self.env.step(state, agent_id, action))
+                self.assertEqual(child.hash, child.rehash())
+            walls = children.actions[children.actions >= 81]
+            if len(walls) and rng.random() < 0.5:
+                index = rng.choice(np.flatnonzero(children.actions >= 81))
+            else:
+                index = rng.integers(len(children.actions))
+            state = children.state(index)
+            if state.done:
+                break
+            agent_id = 1 - agent_id
+
 
 if __name__ == "__main__":
     unittest.main()
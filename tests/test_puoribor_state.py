@@ -1,8 +1,10 @@
 import unittest
+from copy import deepcopy
 
 import numpy as np
 
-from fights.envs.puoribor import PuoriborEnv, PuoriborState
+from fights.envs.puoribor import ACTIONS, PuoriborEnv, PuoriborState, rotate_boards
+from fights.envs.puoribor_cython import distance_fields, rollout
 
 
 class TestPuoriborState(unittest.TestCase):
@@ -45,6 +47,153 @@ class TestPuoriborState(unittest.TestCase):
         rotated_state = self.env.step(rotated_state, 0, [2, 4, 2])
         np.testing.assert_array_equal(rotated_board[2:], rotated_state.board[2:])
 
+    def test_rotate_boards(self):
+        rng = np.random.default_rng(0)
+        states = []
+        state = self.initial_state
+        agent_id = 0
+        while not state.done and len(states) < 24:
+            legal_actions = np.argwhere(self.env.legal_actions(state, agent_id))
+            state = self.env.step(
+                state, agent_id, legal_actions[rng.integers(len(legal_actions))]
+            )
+            states.append(state)
+            agent_id = 1 - agent_id
+        boards = np.stack([state.board for state in states]).reshape(
+            4, -1, *state.board.shape
+        )
+        rotated = rotate_boards(boards)
+        self.assertEqual(rotated.shape, boards.shape)
+        for index, state in enumerate(states):
+            np.testing.assert_array_equal(
+                rotated.reshape(-1, *state.board.shape)[index], state.perspective(1)
+            )
+        np.testing.assert_array_equal(rotate_boards(rotated), boards)
+        out = np.empty(boards.shape, dtype=np.uint8)
+        self.assertIs(rotate_boards(boards.astype(np.uint8), out=out), out)
+        np.testing.assert_array_equal(out, rotated)
+
+    def test_search_state(self):
+        rng = np.random.default_rng(0)
+        search_state = self.env.search_state(self.initial_state)
+        states = [self.initial_state]
+        agent_id = 0
+        while not states[-1].done and len(states) < 60:
+            legal_actions = np.argwhere(self.env.legal_actions(states[-1], agent_id))
+            action = legal_actions[rng.integers(len(legal_actions))]
+            self.assertEqual(search_state.apply(agent_id, *action), 0)
+            states.append(self.env.step(states[-1], agent_id, action))
+            np.testing.assert_array_equal(search_state.board, states[-1].board)
+            np.testing.assert_array_equal(
+                search_state.walls_remaining, states[-1].walls_remaining
+            )
+            self.assertEqual(search_state.done, states[-1].done)
+            self.assertEqual(search_state.hash, states[-1].hash)
+            agent_id = 1 - agent_id
+
+        self.assertNotEqual(search_state.apply(agent_id, 0, -1, 0), 0)
+        self.assertEqual(search_state.ply, len(states) - 1)
+        for state in reversed(states[:-1]):
+            search_state.undo()
+            np.testing.assert_array_equal(search_state.board, state.board)
+            np.testing.assert_array_equal(
+                search_state.walls_remaining, state.walls_remaining
+            )
+            self.assertEqual(search_state.done, state.done)
+            self.assertEqual(search_state.hash, state.hash)
+        self.assertRaises(IndexError, search_state.undo)
+        np.testing.assert_array_equal(
+            search_state.to_state().board, self.initial_state.board
+        )
+
+    def test_hash(self):
+        rng = np.random.default_rng(1)
+        state = self.initial_state
+        seen = {state: state}
+        agent_id = 0
+        for _ in range(60):
+            if state.done:
+                break
+            legal_actions = np.argwhere(self.env.legal_actions(state, agent_id))
+            action = legal_actions[rng.integers(len(legal_actions))]
+            state = self.env.step(state, agent_id, action)
+            hash = state.hash
+            self.assertEqual(state.rehash(), hash)
+            np.testing.assert_array_equal(
+                seen.setdefault(state, state).board, state.board
+            )
+            agent_id = 1 - agent_id
+
+        copied = deepcopy(state)
+        self.assertEqual(copied, state)
+        self.assertIn(copied, seen)
+        copied.board[0] = 0
+        self.assertNotEqual(copied.rehash(), state.hash)
+        self.assertNotEqual(copied, state)
+
+    def test_distances(self):
+        state = self.initial_state
+        self.assertIsNone(state.distances)
+        self.assertEqual(state.distance_to_goal(0), 8)
+        self.assertEqual(state.distance_to_goal(1), 8)
+
+        rng = np.random.default_rng(2)
+        agent_id = 0
+        for _ in range(60):
+            if state.done:
+                break
+            legal_actions = np.argwhere(self.env.legal_actions(state, agent_id))
+            walls = legal_actions[legal_actions[:, 0] > 0]
+            if len(walls) and rng.random() < 0.7:
+                legal_actions = walls
+            action = legal_actions[rng.integers(len(legal_actions))]
+            if agent_id == 0:
+                state = self.env.step(state, agent_id, action)
+            else:
+                state = self.env.try_step(state, agent_id, action)
+            np.testing.assert_array_equal(
+                state.distances, distance_fields(state.board, self.env.board_size)
+            )
+            agent_id = 1 - agent_id
+        self.assertIsNone(PuoriborState(state.board, state.walls_remaining).distances)
+
+    def test_rollout(self):
+        state = self.initial_state
+        winners, lengths = rollout(state.board, state.walls_remaining, 0, 64, 1, 500)
+        self.assertTrue(np.isin(winners, [-1, 0, 1]).all())
+        self.assertTrue(((lengths > 0) & (lengths <= 500)).all())
+        np.testing.assert_array_equal(lengths[winners == -1], 500)
+        for board, num_threads in ((state.board.astype(np.int8), 2), (state.board, 0)):
+            results = rollout(
+                board, state.walls_remaining, 0, 64, 1, 500, num_threads=num_threads
+            )
+            np.testing.assert_array_equal(results[0], winners)
+            np.testing.assert_array_equal(results[1], lengths)
+        results = rollout(state.board, state.walls_remaining, 0, 64, 2, 500)
+        self.assertTrue((results[1] != lengths).any())
+
+        # Agent 0 is a step away from its goal, so one random action wins with the
+        # share of winning actions among the legal ones.
+        board = state.board.copy()
+        board[0] = 0
+        board[0, 2, 7] = 1
+        state = PuoriborState(board, state.walls_remaining.copy())
+        indices = self.env.legal_actions(state, 0, encoding="indices")
+        wins = sum(self.env.step(state, 0, ACTIONS[index]).done for index in indices)
+        winners, lengths = rollout(board, state.walls_remaining, 0, 4000, 3, 1)
+        np.testing.assert_array_equal(lengths, 1)
+        self.assertTrue(np.isin(winners, [-1, 0]).all())
+        expected = wins / len(indices)
+        deviation = 4 * np.sqrt(expected * (1 - expected) / len(winners))
+        self.assertAlmostEqual((winners == 0).mean(), expected, delta=deviation)
+
+        # Games starting after a win are over before the first action.
+        board[0] = 0
+        board[0, 2, 8] = 1
+        winners, lengths = rollout(board, state.walls_remaining, 1, 4, 3, 500)
+        np.testing.assert_array_equal(winners, 0)
+        np.testing.assert_array_equal(lengths, 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+
+from fights.base import BaseAgent
+from fights.envs.othello import OthelloEnv
+from fights.envs.quoridor import QuoridorEnv
+from fights.runner import GameRunner, play_game
+
+
+class RandomAgent(BaseAgent):
+    env_id = ("quoridor", 0)  # type: ignore
+
+    def __init__(self, agent_id, env=None, seed=0):
+        self.agent_id = agent_id
+        self.env = env
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, state):
+        if self.env is None:
+            legal_actions = state.legal_actions[self.agent_id]
+        else:
+            legal_actions = self.env.legal_actions(state, self.agent_id)
+        actions = np.argwhere(legal_actions)
+        return actions[self.rng.integers(len(actions))]
+
+
+class TestGameRunner(unittest.TestCase):
+    def test_othello(self):
+        env = OthelloEnv()
+
+        def make_agents(index):
+            return [RandomAgent(0, seed=index), RandomAgent(1, seed=index + 100)]
+
+        results = GameRunner(env, make_agents, max_workers=4).run(8)
+        self.assertEqual(len(results), 8)
+        for index, result in enumerate(results):
+            self.assertTrue(result.state.done)
+            self.assertEqual(result, play_game(env, make_agents(index)))
+
+    def test_max_plies(self):
+        env = QuoridorEnv()
+
+        def make_agents(index):
+            return [RandomAgent(i, env, seed=index) for i in range(2)]
+
+        results = GameRunner(env, make_agents, max_workers=2, max_plies=5).run(3)
+        for result in results:
+            self.assertEqual(result.plies, 5)
+            self.assertEqual(result.agent_id, 0)
+            self.assertFalse(result.state.done)
+        self.assertEqual(play_game(env, make_agents(0), max_plies=0).agent_id, -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
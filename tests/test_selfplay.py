@@ -0,0 +1,125 @@
+import sys
+import unittest
+
+import numpy as np
+
+from fights.base import BaseAgent
+from fights.envs.othello import OthelloEnv
+from fights.envs.puoribor import PuoriborEnv, PuoriborState
+from fights.envs.quoridor import QuoridorEnv, QuoridorState
+
+ENVS = {PuoriborState: PuoriborEnv(), QuoridorState: QuoridorEnv()}
+
+
+class RandomAgent(BaseAgent):
+    env_id = ("puoribor", 0)  # type: ignore
+
+    def __init__(self, agent_id, seed=0):
+        self.agent_id = agent_id
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, state):
+        if hasattr(state, "legal_actions"):
+            legal_actions = state.legal_actions[self.agent_id]
+        else:
+            legal_actions = ENVS[type(state)].legal_actions(state, self.agent_id)
+        actions = np.argwhere(legal_actions)
+        return actions[self.rng.integers(len(actions))]
+
+
+class FlatRandomAgent(RandomAgent):
+    """
+    Random agent returning flat action indices.
+    """
+
+    def __call__(self, state):
+        env = ENVS.get(type(state), OthelloEnv())
+        actions = env.legal_actions(state, self.agent_id, encoding="indices")
+        return actions[self.rng.integers(len(actions))]
+
+
+@unittest.skipIf(sys.version_info < (3, 8), "requires multiprocessing.shared_memory")
+class TestSelfPlay(unittest.TestCase):
+    def _replay(self, env, result):
+        for index, plies in enumerate(result.plies):
+            state = env.initialize_state()
+            for ply in range(plies):
+                np.testing.assert_array_equal(result.boards[index, ply], state.board)
+                state = env.step(state, ply % 2, result.actions[index, ply])
+            np.testing.assert_array_equal(result.boards[index, plies], state.board)
+            self.assertFalse(result.boards[index, plies + 1 :].any())
+            self.assertFalse(result.actions[index, plies:].any())
+
+    def test_puoribor(self):
+        from fights.selfplay import run_selfplay
+
+        result = run_selfplay(
+            "puoribor", [RandomAgent, RandomAgent], 6, num_workers=2, max_plies=40
+        )
+        self.assertEqual(result.boards.shape, (6, 41, 6, 9, 9))
+        self.assertEqual(result.actions.shape, (6, 40, 3))
+        assert result.walls_remaining is not None
+        self.assertTrue((result.walls_remaining[:, 0] == 10).all())
+        self._replay(PuoriborEnv(), result)
+        for plies, rewards in zip(result.plies, result.rewards):
+            if plies < 40:
+                winner = (plies - 1) % 2
+                self.assertEqual(rewards[winner], 1)
+                self.assertEqual(rewards[1 - winner], -1)
+        self.assertGreater(result.games_per_sec, 0)
+
+    def test_othello(self):
+        from fights.selfplay import run_selfplay
+
+        result = run_selfplay("othello", [RandomAgent, RandomAgent], 4, max_plies=100)
+        self.assertIsNone(result.walls_remaining)
+        self.assertTrue((result.plies < 100).all())
+        self.assertTrue((result.rewards.sum(axis=1) == 0).all())
+        self._replay(OthelloEnv(), result)
+
+    def test_flat_actions(self):
+        from fights.selfplay import run_selfplay
+
+        for name, env in (
+            ("puoribor", PuoriborEnv()),
+            ("quoridor", QuoridorEnv()),
+            ("othello", OthelloEnv()),
+        ):
+            result = run_selfplay(
+                name, [FlatRandomAgent, RandomAgent], 2, num_workers=1, max_plies=30
+            )
+            self._replay(env, result)
+
+    def test_seeding(self):
+        from fights.selfplay import game_seeds, run_selfplay
+
+        results = [
+            run_selfplay(
+                "quoridor",
+                [RandomAgent, RandomAgent],
+                5,
+                num_workers=num_workers,
+                max_plies=20,
+                seed=7,
+            )
+            for num_workers in (1, 3)
+        ]
+        for key in ("boards", "walls_remaining", "actions", "plies", "rewards"):
+            np.testing.assert_array_equal(
+                getattr(results[0], key), getattr(results[1], key)
+            )
+        self.assertEqual(game_seeds(7, 3), game_seeds(7, 3))
+        self.assertNotEqual(game_seeds(7, 3), game_seeds(7, 4))
+        self.assertNotEqual(game_seeds(7, 3), game_seeds(8, 3))
+
+    def test_invalid(self):
+        from fights.selfplay import run_selfplay
+
+        with self.assertRaises(ValueError):
+            run_selfplay("chess", [RandomAgent, RandomAgent], 1)
+        with self.assertRaises(ValueError):
+            run_selfplay("othello", [RandomAgent], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
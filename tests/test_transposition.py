@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+
+from fights.envs.puoribor import PuoriborEnv
+from fights.search import (
+    BOUND_EXACT,
+    BOUND_LOWER,
+    BOUND_UPPER,
+    TranspositionTable,
+)
+
+
+class TestTranspositionTable(unittest.TestCase):
+    def setUp(self):
+        self.table = TranspositionTable(size=16)
+
+    def test_store_and_probe(self):
+        state = PuoriborEnv().initialize_state()
+        self.assertIsNone(self.table.probe(state.hash))
+        self.table.store(state.hash, 3, BOUND_EXACT, 1.5, [0, 4, 1])
+        entry = self.table.probe(state.hash)
+        self.assertEqual(entry.depth, 3)
+        self.assertEqual(entry.bound, BOUND_EXACT)
+        self.assertEqual(entry.value, 1.5)
+        np.testing.assert_array_equal(entry.action, [0, 4, 1])
+        self.assertEqual((self.table.probes, self.table.hits), (2, 1))
+
+        self.table.store(state.hash, 4, BOUND_LOWER, 2.0)
+        entry = self.table.probe(state.hash)
+        self.assertEqual(entry.depth, 4)
+        np.testing.assert_array_equal(entry.action, [0, 4, 1])
+        self.assertEqual(len(self.table), 1)
+
+    def test_replacement(self):
+        self.table.store(0x10, 5, BOUND_EXACT, 1.0)
+        self.table.store(0x20, 2, BOUND_EXACT, 2.0)
+        self.table.store(0x30, 3, BOUND_EXACT, 3.0)
+        # The deep entry stays, the always-replace slot holds the latest one.
+        self.assertEqual(self.table.probe(0x10).value, 1.0)
+        self.assertIsNone(self.table.probe(0x20))
+        self.assertEqual(self.table.probe(0x30).value, 3.0)
+
+        self.table.store(0x40, 6, BOUND_EXACT, 4.0)
+        self.assertIsNone(self.table.probe(0x10))
+        self.assertEqual(self.table.probe(0x40).value, 4.0)
+
+        # Deep entries of an old search give way to the new one.
+        self.table.new_search()
+        self.table.store(0x50, 1, BOUND_EXACT, 5.0)
+        self.assertIsNone(self.table.probe(0x40))
+        self.assertEqual(self.table.probe(0x50).value, 5.0)
+
+        # An entry promoted to the depth-preferred slot is not kept twice.
+        self.table.store(0x30, 0, BOUND_EXACT, 6.0)
+        self.assertEqual(self.table.probe(0x30).value, 6.0)
+        self.assertEqual(len(self.table), 2)
+        self.table.store(0x30, 2, BOUND_EXACT, 7.0)
+        self.assertEqual(self.table.probe(0x30).value, 7.0)
+        self.assertIsNone(self.table.probe(0x50))
+        self.assertEqual(len(self.table), 1)
+
+        self.table.clear()
+        self.assertEqual(len(self.table), 0)
+        self.assertIsNone(self.table.probe(0x30))
+
+    def test_cutoff(self):
+        self.table.store(1, 3, BOUND_EXACT, 0.0)
+        self.table.store(2, 3, BOUND_LOWER, 5.0)
+        self.table.store(3, 3, BOUND_UPPER, -5.0)
+        self.assertEqual(self.table.probe(1).cutoff(3, -1.0, 1.0), 0.0)
+        self.assertIsNone(self.table.probe(1).cutoff(4, -1.0, 1.0))
+        self.assertEqual(self.table.probe(2).cutoff(2, -1.0, 1.0), 5.0)
+        self.assertIsNone(self.table.probe(2).cutoff(2, -1.0, 10.0))
+        self.assertEqual(self.table.probe(3).cutoff(2, -1.0, 1.0), -5.0)
+        self.assertIsNone(self.table.probe(3).cutoff(2, -10.0, 1.0))
+        self.assertRaises(ValueError, lambda: self.table.store(1, 1, 0, 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+
+import numpy as np
+
+from fights.envs import puoribor_cython, quoridor, quoridor_cython
+from fights.vector import OthelloVectorEnv, PuoriborVectorEnv, QuoridorVectorEnv
+
+
+class TestVectorEnv(unittest.TestCase):
+    def _run(self, vector_env, plies, legal_actions):
+        """
+        Play random legal actions in every game, and compare each step with the
+        single game environment.
+        """
+        rng = np.random.default_rng(0)
+        env = vector_env.env
+        states = [vector_env.state(i) for i in range(vector_env.num_envs)]
+        result = vector_env.reset()
+        finished = 0
+        for _ in range(plies):
+            actions = []
+            for i in range(vector_env.num_envs):
+                legal = np.argwhere(result.legal_actions[i])
+                actions.append(legal[rng.integers(len(legal))])
+            agent_ids = np.copy(result.agent_ids)
+            result = vector_env.step(actions)
+            for i, state in enumerate(states):
+                state = env.step(state, agent_ids[i], actions[i])
+                self.assertEqual(result.dones[i], state.done)
+                if state.done:
+                    finished += 1
+                    self.assertEqual(result.rewards[i].sum(), 0)
+                    self.assertEqual(result.agent_ids[i], 0)
+                    state = env.initialize_state()
+                np.testing.assert_array_equal(result.boards[i], state.board)
+                np.testing.assert_array_equal(
+                    result.legal_actions[i],
+                    legal_actions(state, result.agent_ids[i]),
+                )
+                states[i] = state
+        return finished
+
+    def test_puoribor(self):
+        vector_env = PuoriborVectorEnv(4)
+        self._run(vector_env, 100, vector_env.env.legal_actions)
+        self._check_batch_kernels(vector_env, puoribor_cython)
+
+    def test_quoridor(self):
+        vector_env = QuoridorVectorEnv(4, num_threads=2)
+        self._run(vector_env, 100, vector_env.env.legal_actions)
+        self._check_batch_kernels(vector_env, quoridor_cython)
+
+    def test_othello(self):
+        finished = self._run(
+            OthelloVectorEnv(4),
+            80,
+            lambda state, agent_id: state.legal_actions[agent_id],
+        )
+        self.assertGreater(finished, 0)
+
+    def _check_batch_kernels(self, vector_env, kernels):
+        legal_actions = np.zeros_like(vector_env.legal_actions)
+        kernels.batch_legal_actions(
+            vector_env.boards,
+            vector_env.walls_remaining,
+            vector_env.agent_ids,
+            vector_env.env.board_size,
+            legal_actions,
+            2,
+        )
+        np.testing.assert_array_equal(legal_actions, vector_env.legal_actions)
+
+        boards = np.copy(vector_env.boards)
+        boards[0, 2, :, 0] = 1
+        paths = np.zeros(vector_env.num_envs, dtype=np.int_)
+        kernels.batch_check_paths(boards, vector_env.env.board_size, paths)
+        np.testing.assert_array_equal(paths, [0] + [1] * (vector_env.num_envs - 1))
+
+    def test_auto_reset(self):
+        vector_env = QuoridorVectorEnv(2)
+        vector_env.boards[1, 0] = 0
+        vector_env.boards[1, 0, 3, 7] = 1
+        result = vector_env.step([[0, 4, 1], [0, 3, 8]])
+        np.testing.assert_array_equal(result.dones, [False, True])
+        np.testing.assert_array_equal(result.rewards, [[0, 0], [1, -1]])
+        np.testing.assert_array_equal(result.agent_ids, [1, 0])
+        np.testing.assert_array_equal(result.boards[1], vector_env.initial_board)
+        np.testing.assert_array_equal(
+            result.legal_actions[1], vector_env.initial_legal_actions
+        )
+
+    def test_illegal_action(self):
+        vector_env = PuoriborVectorEnv(2)
+        boards = vector_env.boards
+        with self.assertRaisesRegex(ValueError, "^game 1: "):
+            vector_env.step([[0, 4, 1], [0, 0, 0]])
+        self.assertIs(vector_env.boards, boards)
+
+        # Actions failing the path check leave every game unchanged as well.
+        env = vector_env.env
+        state = env.step(env.initialize_state(), 0, [1, 4, 0])
+        state = env.step(state, 1, [2, 5, 0])
+        vector_env.boards[1] = state.board
+        vector_env.walls_remaining[1] = state.walls_remaining
+        expected = [np.copy(vector_env.boards), np.copy(vector_env.walls_remaining)]
+        with self.assertRaisesRegex(ValueError, "^game 1: .*blocking all paths"):
+            vector_env.step([[0, 4, 1], [2, 3, 0]])
+        np.testing.assert_array_equal(vector_env.boards, expected[0])
+        np.testing.assert_array_equal(vector_env.walls_remaining, expected[1])
+        np.testing.assert_array_equal(vector_env.agent_ids, [0, 0])
+        self.assertRaises(ValueError, lambda: vector_env.step([[0, 4, 1]]))
+        self.assertRaises(ValueError, lambda: vector_env.step([0, -1]))
+
+    def test_flat_actions(self):
+        flat_env = QuoridorVectorEnv(3)
+        vector_env = QuoridorVectorEnv(3)
+        rng = np.random.default_rng(0)
+        result = flat_env.reset()
+        vector_env.reset()
+        for _ in range(20):
+            indices = [
+                rng.choice(np.flatnonzero(legal_actions))
+                for legal_actions in result.legal_actions
+            ]
+            result = flat_env.step(indices)
+            expected = vector_env.step(quoridor.ACTIONS[indices])
+            np.testing.assert_array_equal(result.boards, expected.boards)
+
+
+if __name__ == "__main__":
+    unittest.main()